@@ -0,0 +1,264 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline benchmarks of the client against in-process fake nodes.
+
+Each operation is timed call by call, sequentially ("sync"), from a pool of
+threads sharing one client ("threads") and from asyncio tasks sharing one
+:class:`~glitter_sdk.AsyncGlitterClient` ("async", when aiohttp is
+installed). The report gives the throughput, the latency percentiles and
+the per-call overhead of the SDK: the median latency minus the delay the
+fake node adds to each reply. The nodes run in the same process, so the
+overhead includes their own handling time; compare runs of the same
+machine rather than absolute values. The same goes for the CPU time per
+call, while the bytes sent and received per call are the request and reply
+bodies as they went on the wire, which shows the effect of compression.
+
+    python -m benchmarks.bench_client
+    python -m benchmarks.bench_client --calls 2000 --threads 16 --latency 0.002 --payload 65536
+    python -m benchmarks.bench_client --ops get_docs block --max-overhead-ms 2
+    python -m benchmarks.bench_client --doc-size 8192 --compression gzip --compress-replies
+
+With ``--max-overhead-ms`` the command exits with status 1 when an
+operation exceeds that overhead, so that it can guard against regressions.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, process_time
+
+from glitter_sdk import GlitterClient
+from glitter_sdk.async_connection import aiohttp
+from glitter_sdk.compression import AVAILABLE_COMPRESSORS, COMPRESS_MIN_SIZE
+from tests.fake_node import FakeNode, FakeState
+
+SCHEMA = "bench"
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+    {"name": "title", "type": "string", "index": {"type": "text"}},
+    {"name": "body", "type": "string"},
+]
+DOCS = 200
+GET_DOCS_IDS = 10
+MODES = ('sync', 'threads', 'async')
+
+Result = namedtuple('Result', ('op', 'mode', 'calls', 'elapsed', 'throughput',
+                               'p50', 'p90', 'p99', 'overhead', 'cpu', 'sent',
+                               'received'))
+
+
+def _doc(i, doc_size):
+    return {"doi": "10.1000/%06d" % i, "title": "paper %d" % i,
+            "body": "b" * doc_size}
+
+
+def _operations(doc_size, height):
+    """Returns the benchmarked operations as ``op(db, chain, i)``
+    callables, valid for both the sync and the async client."""
+    ids = ["10.1000/%06d" % i for i in range(DOCS)]
+    return {
+        'put_doc': lambda db, chain, i: db.put_doc(SCHEMA, _doc(DOCS + i, doc_size)),
+        'get_docs': lambda db, chain, i: db.get_docs(
+            SCHEMA, [ids[(i + k) % DOCS] for k in range(GET_DOCS_IDS)]),
+        'search': lambda db, chain, i: db.search(SCHEMA, "paper", ["title"], limit=10),
+        'block': lambda db, chain, i: chain.block(1 + i % height),
+    }
+
+
+def percentile(samples, q):
+    """Returns the ``q`` percentile of sorted ``samples``."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+def _result(op, mode, latencies, elapsed, latency, cpu, sent, received):
+    latencies.sort()
+    calls = len(latencies)
+    p50 = percentile(latencies, 50)
+    return Result(op, mode, calls, elapsed, calls / elapsed,
+                  p50, percentile(latencies, 90), percentile(latencies, 99),
+                  max(p50 - latency, 0.0), cpu / calls, sent / calls,
+                  received / calls)
+
+
+def _wire_bytes(servers):
+    """Returns the body bytes sent to and received from the nodes."""
+    return (sum(s.bytes_received for s in servers),
+            sum(s.bytes_sent for s in servers))
+
+
+def _timed(op, db, chain, i):
+    start = perf_counter()
+    op(db, chain, i)
+    return perf_counter() - start
+
+
+def run_sync(client, op, calls):
+    start = perf_counter()
+    latencies = [_timed(op, client.db, client.chain, i) for i in range(calls)]
+    return latencies, perf_counter() - start
+
+
+def run_threads(client, op, calls, threads):
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(
+            lambda i: _timed(op, client.db, client.chain, i), range(calls)))
+    return latencies, perf_counter() - start
+
+
+def run_async(urls, op, calls, concurrency, client_options):
+    from glitter_sdk import AsyncGlitterClient
+
+    async def main():
+        async with AsyncGlitterClient(*urls, **client_options) as client:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def timed(i):
+                async with semaphore:
+                    start = perf_counter()
+                    await op(client.db, client.chain, i)
+                    return perf_counter() - start
+
+            await timed(0)  # opens the session outside of the measure
+            start = perf_counter()
+            latencies = await asyncio.gather(*(timed(i) for i in range(calls)))
+            return list(latencies), perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def setup_nodes(nodes=1, latency=0.0, payload=0, doc_size=256, height=1000,
+                compress_replies=False):
+    """Starts fake nodes sharing one state, holding ``DOCS`` documents."""
+    state = FakeState(height=height)
+    servers = [FakeNode(state, payload_size=payload,
+                        compress_replies=compress_replies).start()
+               for _ in range(nodes)]
+    client = GlitterClient(*[s.url for s in servers])
+    client.db.create_schema(SCHEMA, FIELDS)
+    for i in range(DOCS):
+        client.db.put_doc(SCHEMA, _doc(i, doc_size))
+    # The delay only applies to the measured calls.
+    for server in servers:
+        server.delay = latency
+    return servers
+
+
+def run(ops=None, modes=MODES, calls=500, threads=8, nodes=1, latency=0.0,
+        payload=0, doc_size=256, client_options=None, compress_replies=False):
+    """Runs the benchmarks and returns a list of :class:`Result`."""
+    client_options = client_options or {}
+    height = 1000
+    operations = _operations(doc_size, height)
+    servers = setup_nodes(nodes, latency, payload, doc_size, height,
+                          compress_replies)
+    urls = [s.url for s in servers]
+    results = []
+    try:
+        for name in ops or operations:
+            op = operations[name]
+            for mode in modes:
+                if mode == 'async' and aiohttp is None:
+                    continue
+                if mode != 'async':
+                    client = GlitterClient(*urls, **client_options)
+                    op(client.db, client.chain, 0)  # warm up the connection
+                sent, received = _wire_bytes(servers)
+                cpu = process_time()
+                if mode == 'sync':
+                    latencies, elapsed = run_sync(client, op, calls)
+                elif mode == 'threads':
+                    latencies, elapsed = run_threads(client, op, calls, threads)
+                else:
+                    # Includes the warm up call.
+                    latencies, elapsed = run_async(urls, op, calls, threads,
+                                                   client_options)
+                cpu = process_time() - cpu
+                wire = _wire_bytes(servers)
+                results.append(_result(name, mode, latencies, elapsed, latency,
+                                       cpu, wire[0] - sent, wire[1] - received))
+    finally:
+        for server in servers:
+            server.stop()
+    return results
+
+
+def format_results(results):
+    lines = ['{:<10} {:<8} {:>6} {:>10} {:>9} {:>9} {:>9} {:>12} {:>8} {:>9} {:>9}'.format(
+        'op', 'mode', 'calls', 'calls/s', 'p50 ms', 'p90 ms', 'p99 ms',
+        'overhead ms', 'cpu ms', 'sent B', 'recv B')]
+    for r in results:
+        lines.append('{:<10} {:<8} {:>6} {:>10.0f} {:>9.3f} {:>9.3f} {:>9.3f} {:>12.3f} {:>8.3f} {:>9.0f} {:>9.0f}'.format(
+            r.op, r.mode, r.calls, r.throughput, r.p50 * 1000, r.p90 * 1000,
+            r.p99 * 1000, r.overhead * 1000, r.cpu * 1000, r.sent,
+            r.received))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--ops', nargs='+', choices=sorted(_operations(0, 1)))
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8,
+                        help='threads, or concurrent tasks in async mode')
+    parser.add_argument('--nodes', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the fake nodes wait before replying')
+    parser.add_argument('--payload', type=int, default=0,
+                        help='padding bytes added to every reply')
+    parser.add_argument('--doc-size', type=int, default=256)
+    parser.add_argument('--compression', choices=AVAILABLE_COMPRESSORS,
+                        help='compress the request bodies')
+    parser.add_argument('--compress-min-size', type=int,
+                        default=COMPRESS_MIN_SIZE)
+    parser.add_argument('--compress-replies', action='store_true',
+                        help='have the nodes gzip their replies')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON lines')
+    parser.add_argument('--max-overhead-ms', type=float,
+                        help='fail when an overhead exceeds this value')
+    args = parser.parse_args(argv)
+
+    client_options = {}
+    if args.compression:
+        client_options = {'compression': args.compression,
+                          'compress_min_size': args.compress_min_size}
+    results = run(args.ops, args.modes, args.calls, args.threads, args.nodes,
+                  args.latency, args.payload, args.doc_size, client_options,
+                  args.compress_replies)
+    if args.json:
+        for r in results:
+            print(json.dumps(r._asdict()))
+    else:
+        print(format_results(results))
+    if args.max_overhead_ms is not None:
+        slow = [r for r in results if r.overhead * 1000 > args.max_overhead_ms]
+        for r in slow:
+            print('{} ({}) overhead {:.3f} ms exceeds {} ms'.format(
+                r.op, r.mode, r.overhead * 1000, args.max_overhead_ms),
+                file=sys.stderr)
+        return 1 if slow else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Failover benchmarks: faults injected into in-process fake nodes.
+
+Threads sharing one client read blocks from a set of fake nodes for
+``--duration`` seconds. Part way through the run, the first node (the one a
+priority picker prefers) is made to:
+
+- ``refuse``: stop listening and drop its open connections,
+- ``blackhole``: accept the requests and never answer them,
+- ``slow``: answer after ``--slow-delay`` seconds,
+- ``error``: answer every request with ``--error-status``.
+
+For each fault and picker the report gives the throughput and the p99
+latency of the calls before and after the fault, the calls that failed, the
+attempts wasted on the faulty node, the retries, and the time to failover:
+the time from the fault to the first run of ``FAILOVER_RUN`` consecutive
+calls that succeeded without touching the faulty node (empty when the
+client never failed over).
+
+    python -m benchmarks.bench_faults
+    python -m benchmarks.bench_faults --faults refuse blackhole --pickers priority latency
+    python -m benchmarks.bench_faults --timeout 2 --breaker-threshold 3 --hedge-percentile 95
+    python -m benchmarks.bench_faults --faults blackhole slow --attempt-timeout 0.1
+    python -m benchmarks.bench_faults --faults error --retry
+    python -m benchmarks.bench_faults --faults slow --concurrency-limit 8
+"""
+
+import argparse
+import json
+import sys
+import threading
+from collections import namedtuple
+from time import perf_counter, sleep
+
+from glitter_sdk import GlitterClient
+from glitter_sdk.hooks import RequestHooks
+from glitter_sdk.pool import (LatencyAwarePicker, PriorityPicker,
+                              RoundRobinPicker)
+from glitter_sdk.retry import RetryPolicy
+from tests.fake_node import FakeNode, FakeState
+
+from .bench_client import percentile
+
+FAULTS = ('refuse', 'blackhole', 'slow', 'error')
+PICKERS = {
+    'round_robin': RoundRobinPicker,
+    'priority': PriorityPicker,
+    'latency': LatencyAwarePicker,
+}
+FAILOVER_RUN = 20  # consecutive clean calls
+HEIGHT = 1000
+
+Report = namedtuple('Report', ('fault', 'picker', 'calls', 'throughput_before',
+                               'throughput_after', 'throughput_loss',
+                               'p99_before', 'p99_after', 'errors',
+                               'wasted_attempts', 'retries',
+                               'time_to_failover'))
+
+# One call of a worker: start and end in seconds since the start of the run,
+# whether it succeeded and whether one of its attempts went to the faulty
+# node.
+_Sample = namedtuple('_Sample', ('start', 'end', 'ok', 'touched'))
+
+
+class FaultRecorder(RequestHooks):
+    """Counts the attempts wasted on the faulty node and the retries once
+    the fault is injected."""
+
+    def __init__(self, node_url):
+        self.node_url = node_url
+        self.injected = False
+        self.wasted_attempts = 0
+        self.retries = 0
+        self.touched = set()  # ids of the calls sent to the faulty node
+        self.current = threading.local()
+        self._lock = threading.Lock()
+
+    def before_send(self, call, node):
+        # The first attempt of a call is sent from the thread of its caller.
+        self.current.call = call
+        if self.injected and node == self.node_url:
+            with self._lock:
+                self.touched.add(call.call_id)
+
+    def after_response(self, call, attempt):
+        if self.injected and attempt.node == self.node_url \
+                and not attempt.status.startswith('2'):
+            with self._lock:
+                self.wasted_attempts += 1
+
+    def on_retry(self, call, error):
+        if self.injected:
+            with self._lock:
+                self.retries += 1
+
+    def last_call(self):
+        return getattr(self.current, 'call', None)
+
+
+def inject(node, fault, slow_delay=0.5, error_status=503):
+    """Injects ``fault`` into the fake ``node``."""
+    if fault == 'refuse':
+        node.refuse()
+    elif fault == 'blackhole':
+        node.blackhole()
+    elif fault == 'slow':
+        node.slow(slow_delay)
+    elif fault == 'error':
+        node.error(error_status)
+    else:
+        raise ValueError('unknown fault {!r}'.format(fault))
+
+
+def _worker(chain, recorder, origin, deadline, samples, index):
+    i = index
+    while perf_counter() < deadline:
+        start = perf_counter()
+        try:
+            chain.block(1 + i % HEIGHT)
+        except Exception:
+            ok = False
+        else:
+            ok = True
+        end = perf_counter()
+        call = recorder.last_call()
+        touched = call is not None and call.call_id in recorder.touched
+        samples.append(_Sample(start - origin, end - origin, ok, touched))
+        i += 1
+
+
+def time_to_failover(samples, fault_time, run=FAILOVER_RUN):
+    """Returns the seconds from ``fault_time`` to the first of ``run``
+    consecutive clean calls, or `None`."""
+    clean = 0
+    first = None
+    for sample in sorted(s for s in samples if s.start >= fault_time):
+        if sample.ok and not sample.touched:
+            if clean == 0:
+                first = sample.start
+            clean += 1
+            if clean >= run:
+                return first - fault_time
+        else:
+            clean = 0
+    return None
+
+
+def _report(fault, picker, samples, recorder, fault_time, end_time):
+    before = sorted(s.end - s.start for s in samples
+                    if s.start < fault_time and s.ok)
+    after = [s for s in samples if s.start >= fault_time]
+    after_ok = sorted(s.end - s.start for s in after if s.ok)
+    throughput_before = len(before) / fault_time if fault_time else 0.0
+    throughput_after = len(after_ok) / max(end_time - fault_time, 1e-9)
+    loss = 1 - throughput_after / throughput_before \
+        if throughput_before else 0.0
+    return Report(fault, picker, len(samples), throughput_before,
+                  throughput_after, loss, percentile(before, 99),
+                  percentile(after_ok, 99), sum(not s.ok for s in after),
+                  recorder.wasted_attempts, recorder.retries,
+                  time_to_failover(samples, fault_time))
+
+
+def run_scenario(fault, picker='round_robin', nodes=3, threads=4, duration=2.0,
+                 fault_at=0.5, slow_delay=0.5, error_status=503,
+                 client_options=None):
+    """Runs one scenario and returns its :class:`Report`.
+
+    Args:
+        fault (str): one of ``FAULTS``, injected into the first node.
+        picker (str): one of ``PICKERS``.
+        fault_at (float): fraction of ``duration`` after which the fault is
+            injected.
+        client_options (dict): keyword arguments of the client, e.g.
+            ``timeout`` or ``breaker_threshold``.
+    """
+    client_options = dict(client_options or {})
+    client_options.setdefault('timeout', 1)
+    state = FakeState(height=HEIGHT)
+    servers = [FakeNode(state).start() for _ in range(nodes)]
+    recorder = FaultRecorder(servers[0].url)
+    hooks = list(client_options.pop('hooks', None) or ()) + [recorder]
+    client = GlitterClient(*[s.url for s in servers],
+                           picker_class=PICKERS[picker], hooks=hooks,
+                           **client_options)
+    samples = []
+    try:
+        client.chain.block(1)  # opens the connections
+        origin = perf_counter()
+        deadline = origin + duration
+        workers = [threading.Thread(target=_worker,
+                                    args=(client.chain, recorder, origin,
+                                          deadline, samples, n * HEIGHT // threads))
+                   for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        sleep(duration * fault_at)
+        fault_time = perf_counter() - origin
+        recorder.injected = True
+        inject(servers[0], fault, slow_delay, error_status)
+        for worker in workers:
+            worker.join()
+        end_time = perf_counter() - origin
+    finally:
+        for server in servers:
+            server.stop()
+    return _report(fault, picker, samples, recorder, fault_time, end_time)
+
+
+def run(faults=FAULTS, pickers=tuple(PICKERS), **kwargs):
+    """Runs every fault against every picker, returns a list of
+    :class:`Report`."""
+    return [run_scenario(fault, picker, **kwargs)
+            for fault in faults for picker in pickers]
+
+
+def format_reports(reports):
+    lines = ['{:<10} {:<12} {:>9} {:>9} {:>6} {:>9} {:>9} {:>7} {:>7} {:>8} {:>9}'.format(
+        'fault', 'picker', 'before/s', 'after/s', 'loss', 'p99 b ms',
+        'p99 a ms', 'errors', 'wasted', 'retries', 'failover')]
+    for r in reports:
+        failover = '-' if r.time_to_failover is None \
+            else '{:.3f}s'.format(r.time_to_failover)
+        lines.append('{:<10} {:<12} {:>9.0f} {:>9.0f} {:>5.0%} {:>9.1f} {:>9.1f} {:>7} {:>7} {:>8} {:>9}'.format(
+            r.fault, r.picker, r.throughput_before, r.throughput_after,
+            r.throughput_loss, r.p99_before * 1000, r.p99_after * 1000,
+            r.errors, r.wasted_attempts, r.retries, failover))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--faults', nargs='+', choices=FAULTS, default=FAULTS)
+    parser.add_argument('--pickers', nargs='+', choices=sorted(PICKERS),
+                        default=list(PICKERS))
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=2.0,
+                        help='seconds each scenario runs')
+    parser.add_argument('--fault-at', type=float, default=0.5,
+                        help='fraction of the duration before the fault')
+    parser.add_argument('--slow-delay', type=float, default=0.5)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--timeout', type=float, default=1,
+                        help='timeout of the client calls')
+    parser.add_argument('--attempt-timeout', type=float,
+                        help='timeout of each attempt of a call')
+    parser.add_argument('--retry', action='store_true',
+                        help='retry the reads answered with 429/5xx')
+    parser.add_argument('--rate-limit', type=float,
+                        help='requests per second sent to each node')
+    parser.add_argument('--concurrency-limit', type=int,
+                        help='initial adaptive limit of the requests in '
+                             'flight to each node')
+    parser.add_argument('--breaker-threshold', type=int)
+    parser.add_argument('--breaker-recovery', type=float)
+    parser.add_argument('--hedge-percentile', type=float)
+    parser.add_argument('--json', action='store_true',
+                        help='print the reports as JSON lines')
+    args = parser.parse_args(argv)
+
+    client_options = {'timeout': args.timeout}
+    if args.retry:
+        client_options['retry_policy'] = RetryPolicy()
+    if args.attempt_timeout is not None:
+        client_options['attempt_timeout'] = args.attempt_timeout
+    if args.rate_limit is not None:
+        client_options['rate_limit'] = args.rate_limit
+    if args.concurrency_limit is not None:
+        client_options['concurrency_limit'] = args.concurrency_limit
+    if args.breaker_threshold is not None:
+        client_options['breaker_threshold'] = args.breaker_threshold
+    if args.breaker_recovery is not None:
+        client_options['breaker_recovery_time'] = args.breaker_recovery
+    if args.hedge_percentile is not None:
+        client_options['hedge_percentile'] = args.hedge_percentile
+    reports = run(args.faults, args.pickers, nodes=args.nodes,
+                  threads=args.threads, duration=args.duration,
+                  fault_at=args.fault_at, slow_delay=args.slow_delay,
+                  error_status=args.error_status,
+                  client_options=client_options)
+    if args.json:
+        for r in reports:
+            print(json.dumps(r._asdict()))
+    else:
+        print(format_reports(reports))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cold-start benchmarks: import time and client creation.
+
+Each target is timed in ``--repeat`` fresh interpreters, the way a CLI tool
+or a serverless function starts:
+
+- ``package``: ``import glitter_sdk``,
+- ``client``: ``from glitter_sdk import GlitterClient``,
+- ``async_client``: ``from glitter_sdk import AsyncGlitterClient``,
+- ``client_init``: importing :class:`~glitter_sdk.GlitterClient` and
+  creating a client of three nodes.
+
+The report gives the median and best times, and which of the heavy
+modules (``HEAVY_MODULES``) each target loaded. The interpreter startup
+itself is not included.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --targets package client --repeat 20
+    python -m benchmarks.bench_import --targets package --max-ms 5
+
+With ``--max-ms`` the command exits with status 1 when the median of a
+target exceeds that time, so that it can guard against regressions.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+TARGETS = {
+    'package': 'import glitter_sdk',
+    'client': 'from glitter_sdk import GlitterClient',
+    'async_client': 'from glitter_sdk import AsyncGlitterClient',
+    'client_init': 'from glitter_sdk import GlitterClient\n'
+                   'GlitterClient("http://n0:26659", "http://n1:26659", '
+                   '"http://n2:26659")',
+}
+HEAVY_MODULES = ('requests', 'aiohttp', 'asyncio', 'orjson', 'zstandard')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Result = namedtuple('Result', ('target', 'median', 'best', 'modules'))
+
+# Run in a fresh interpreter: times the statement and reports the heavy
+# modules it loaded.
+_SCRIPT = '''
+import json, sys
+from time import perf_counter
+start = perf_counter()
+exec(compile({statement!r}, '<target>', 'exec'))
+elapsed = perf_counter() - start
+print(json.dumps({{'seconds': elapsed,
+                   'modules': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def measure(statement):
+    """Runs ``statement`` in a fresh interpreter, returns the seconds it
+    took and the heavy modules it loaded."""
+    script = _SCRIPT.format(statement=statement, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, '-c', script], cwd=ROOT,
+                         check=True, stdout=subprocess.PIPE,
+                         universal_newlines=True).stdout
+    res = json.loads(out.strip().splitlines()[-1])
+    return res['seconds'], res['modules']
+
+
+def run(targets=tuple(TARGETS), repeat=10):
+    """Times each target ``repeat`` times, returns a list of
+    :class:`Result`."""
+    results = []
+    for target in targets:
+        samples = [measure(TARGETS[target]) for _ in range(repeat)]
+        times = sorted(seconds for seconds, _ in samples)
+        results.append(Result(target, times[len(times) // 2], times[0],
+                              samples[-1][1]))
+    return results
+
+
+def format_results(results):
+    lines = ['{:<14} {:>10} {:>10}  {}'.format(
+        'target', 'median ms', 'best ms', 'heavy modules')]
+    for r in results:
+        lines.append('{:<14} {:>10.1f} {:>10.1f}  {}'.format(
+            r.target, r.median * 1000, r.best * 1000,
+            ' '.join(r.modules) or '-'))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS),
+                        default=list(TARGETS))
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='fresh interpreters per target')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON lines')
+    parser.add_argument('--max-ms', type=float,
+                        help='fail when a median exceeds this value')
+    args = parser.parse_args(argv)
+
+    results = run(args.targets, args.repeat)
+    if args.json:
+        for r in results:
+            print(json.dumps(r._asdict()))
+    else:
+        print(format_results(results))
+    if args.max_ms is not None:
+        slow = [r for r in results if r.median * 1000 > args.max_ms]
+        for r in slow:
+            print('{} takes {:.1f} ms, more than {} ms'.format(
+                r.target, r.median * 1000, args.max_ms), file=sys.stderr)
+        return 1 if slow else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
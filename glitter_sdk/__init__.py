@@ -2,11 +2,32 @@
 # SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
 # Code is Apache-2.0 and docs are CC-BY-4.0
 
-# from .driver import GlitterClient   # noqa
-from .driver import GlitterClient   # noqa
+import importlib
 
+# The clients are imported on first access, so that ``import glitter_sdk``
+# stays cheap. The HTTP libraries are loaded late too: requests by the first
+# request of a GlitterClient, aiohttp with AsyncGlitterClient, which never
+# loads requests.
+_LAZY = {
+    'GlitterClient': '.driver',
+    'AsyncGlitterClient': '.async_driver',
+}
+
+__all__ = list(_LAZY)
 
 __author__ = 'ted'
 __email__ = 'ted@glitterprotocol.io'
 __version__ = '0.1'
 __release__ = '0.1.0'
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
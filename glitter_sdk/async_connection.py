@@ -0,0 +1,205 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .compression import COMPRESS_MIN_SIZE
+from .connection import Connection, HttpResponse, wire_size
+from .exceptions import HTTP_EXCEPTIONS, TransportError, TimeoutError
+
+
+DEFAULT_LIMIT_PER_NODE = 100
+
+
+class AsyncConnection(Connection):
+    """An asyncio Connection object to make HTTP requests to a particular
+    node.
+
+    The backoff bookkeeping (:meth:`get_backoff_timedelta`,
+    :meth:`update_backoff_time`) is shared with
+    :class:`~glitter_sdk.connection.Connection`; only the I/O differs.
+    Requires the optional ``aiohttp`` dependency
+    (``pip install glitter_sdk[async]``).
+    """
+
+    def __init__(self, *, node_url, headers=None, breaker=None, codec=None,
+                 limit=DEFAULT_LIMIT_PER_NODE, metrics=None,
+                 compression=None, compress_min_size=COMPRESS_MIN_SIZE,
+                 rate_limiter=None, limiter=None):
+        """Initializes a :class:`~glitter_sdk.async_connection.AsyncConnection`
+        instance.
+
+        Args:
+            node_url (str):  Url of the node to connect to.
+            headers (dict): Optional headers to send with each request.
+            breaker (CircuitBreaker): Optional circuit breaker of the node.
+            codec: Optional JSON codec, or codec name, see
+                :func:`~glitter_sdk.codec.get_codec`.
+            limit (int): Maximal number of simultaneous sockets opened to
+                the node (``0`` means unlimited).
+            metrics (Metrics): Optional registry recording each request,
+                see :mod:`~glitter_sdk.metrics`.
+            compression: Optional compression of the request bodies, or
+                compression name, see
+                :func:`~glitter_sdk.compression.get_compressor`.
+            compress_min_size (int): Size in bytes from which the request
+                bodies are compressed.
+            rate_limiter (TokenBucket): Optional rate limit of the requests
+                sent to the node, see :mod:`~glitter_sdk.limiter`.
+            limiter (AsyncConcurrencyLimiter): Optional limit of the requests
+                in flight to the node.
+
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncConnection requires aiohttp, install it '
+                              'with `pip install glitter_sdk[async]`')
+        super().__init__(node_url=node_url, headers=headers, breaker=breaker,
+                         codec=codec, metrics=metrics,
+                         compression=compression,
+                         compress_min_size=compress_min_size,
+                         rate_limiter=rate_limiter, limiter=limiter)
+        self.limit = limit
+
+    async def request(self, method, *, path=None, json=None,
+                      params=None, headers=None, timeout=None,
+                      backoff_cap=None, deadline=None, record_health=True,
+                      **kwargs):
+        """Performs an HTTP request with the given parameters.
+
+        Same semantics as :meth:`Connection.request
+        <glitter_sdk.connection.Connection.request>`, except that waiting
+        for the backoff to expire does not block the event loop.
+
+        """
+        # A body that cannot be encoded is not the fault of the node, and
+        # is not recorded as an outcome of the request.
+        body, headers = self._encode(json, headers)
+        if deadline is not None:
+            timeout = deadline.remaining()
+        # Probes check the node regardless of its backoff.
+        backoff_timedelta = max(self.get_backoff_timedelta(), 0) \
+            if record_health else 0
+
+        if timeout is not None and timeout < backoff_timedelta:
+            raise TimeoutError
+
+        if backoff_timedelta > 0:
+            await asyncio.sleep(backoff_timedelta)
+
+        error = response = None
+        timeout = timeout if timeout is None else timeout - backoff_timedelta
+        token = None
+        if self.rate_limiter is not None or self.limiter is not None:
+            admitted = time.monotonic()
+            token = await self._admit(timeout)
+            if timeout is not None:
+                timeout -= time.monotonic() - admitted
+        try:
+            attempt_timeout = self._timeout(timeout, deadline)
+        except TimeoutError:
+            if token is not None:
+                self.limiter.release(token)
+            raise
+        with self._lock:
+            self.in_flight += 1
+        start = time.monotonic()
+        try:
+            response = await self._request(
+                method=method,
+                timeout=attempt_timeout,
+                url=self.node_url + path if path else self.node_url,
+                body=body,
+                params=params,
+                headers=headers,
+                **kwargs,
+            )
+        except Exception as err:
+            error = err
+            raise err
+        finally:
+            self._finish(method, path, start, token, response, error,
+                         backoff_cap, record_health)
+        return response
+
+    @staticmethod
+    def is_connection_error(error):
+        return isinstance(error, aiohttp.ClientConnectionError)
+
+    @staticmethod
+    def is_timeout(error):
+        return isinstance(error, asyncio.TimeoutError)
+
+    async def _admit(self, timeout):
+        start = time.monotonic()
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve(timeout)
+            if wait is None:
+                raise TimeoutError([])
+            if wait > 0:
+                await asyncio.sleep(wait)
+        if self.limiter is None:
+            return None
+        return await self.limiter.acquire(
+            None if timeout is None else timeout - (time.monotonic() - start))
+
+    @staticmethod
+    def _timeout(timeout, deadline):
+        # aiohttp reads a zero timeout as no timeout at all.
+        if deadline is not None:
+            timeout = deadline.attempt_timeout()
+        if timeout is not None and timeout <= 0:
+            raise TimeoutError([])
+        if deadline is None:
+            return aiohttp.ClientTimeout(total=timeout)
+        return aiohttp.ClientTimeout(total=timeout,
+                                     sock_connect=deadline.connect,
+                                     sock_read=deadline.read)
+
+    def _get_session(self):
+        # The aiohttp session is bound to the running event loop.
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.limit),
+            )
+        return self.session
+
+    async def _request(self, *, timeout=None, body=None, headers=None,
+                       **kwargs):
+        sent, sent_headers = self._compress(body, headers)
+        response, content = await self._send_body(timeout, sent,
+                                                   sent_headers, kwargs)
+        if self._reject_compression(response.status, body, sent):
+            sent = body
+            response, content = await self._send_body(timeout, body,
+                                                       headers, kwargs)
+        json = self._decode(content)
+        if not (200 <= response.status < 300):
+            exc_cls = HTTP_EXCEPTIONS.get(response.status, TransportError)
+            # The body is already read, text() only decodes it.
+            raise exc_cls(response.status, await response.text(), json,
+                          kwargs['url'], response.headers)
+        data = json if json is not None else await response.text()
+        return HttpResponse(response.status, response.headers, data,
+                            len(sent) if sent else 0,
+                            wire_size(response.headers, content))
+
+    async def _send_body(self, timeout, body, headers, kwargs):
+        session = self._get_session()
+        async with session.request(
+                timeout=timeout,
+                data=body, headers=headers, **kwargs) as response:
+            return response, await response.read()
+
+    async def close(self):
+        """Closes the underlying HTTP session, if any."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,342 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+import asyncio
+from itertools import islice
+
+from .async_transport import AsyncTransport
+from .driver import (GlitterClient, DataBase, Chain, Admin, DocResult,
+                     BLOCKCHAIN_MAX_HEADERS, BULK_CHUNK_SIZE, BULK_MAX_IN_FLIGHT,
+                     _ScanCursor, _doc_result, _merge_docs, _page_count, _rpc_page,
+                     _scan_block, _scan_headers, _scan_windows, _search_page,
+                     _shard_hits, _split_docs, _unique)
+from .exceptions import ResponseError
+from .loader import AsyncBatchLoader, BATCH_SIZE
+from .pool import RoundRobinPicker
+from .utils import chunked, latest_block_height
+
+
+class AsyncGlitterClient(GlitterClient):
+    """asyncio flavour of :class:`~driver.GlitterClient`.
+
+    Every method of :attr:`db`, :attr:`chain` and :attr:`admin` returns an
+    awaitable instead of blocking on the HTTP round-trip::
+
+        async with AsyncGlitterClient(url) as client:
+            res = await client.db.put_doc("demo", doc)
+
+    """
+
+    def __init__(self, *nodes, headers=None, transport_class=AsyncTransport,
+                 timeout=20, picker_class=RoundRobinPicker, schema_cache=None,
+                 block_store=None, doc_batch_window=None,
+                 doc_batch_size=BATCH_SIZE, **kwargs):
+        """Initialize a :class:`~async_driver.AsyncGlitterClient` instance.
+
+        Args:
+            *nodes:(list of (str or dict)): Glitter nodes to connect to.
+            headers (dict): Optional headers that will be passed with each request
+            transport_class: Optional asyncio transport class to use.
+            timeout (int): Optional timeout in seconds that will be passed to each request.
+            picker_class: Optional picker class choosing the node of each request.
+            schema_cache (:class:`~cache.AbstractCache`): Optional cache for schema reads.
+            block_store (:class:`~block_store.BlockStore`): Optional persistent store of
+                committed blocks and headers.
+            doc_batch_window (float): Enables the batching of ``get_doc`` calls, see
+                :class:`~driver.GlitterClient`.
+            doc_batch_size (int): Maximal number of ids per batched ``get_docs`` request.
+            kwargs: Optional keyword arguments passed to ``transport_class``.
+        """
+        super().__init__(*nodes, headers=headers,
+                         transport_class=transport_class, timeout=timeout,
+                         picker_class=picker_class, schema_cache=schema_cache,
+                         block_store=block_store,
+                         doc_batch_window=doc_batch_window,
+                         doc_batch_size=doc_batch_size, **kwargs)
+        self._db = AsyncDataBase(self)
+        self._chain = AsyncChain(self)
+        self._admin = AsyncAdmin(self)
+
+    async def close(self):
+        """Closes the HTTP sessions opened to the nodes."""
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncDataBase(DataBase):
+    """Awaitable version of :class:`~driver.DataBase`.
+    """
+
+    loader_class = AsyncBatchLoader
+
+    async def create_schema(self, schema_name, fields):
+        """See :meth:`DataBase.create_schema <driver.DataBase.create_schema>`.
+        """
+        response = await self._create_schema(schema_name, fields)
+        self._invalidate_schema(schema_name)
+        return response
+
+    async def list_schema(self):
+        """See :meth:`DataBase.list_schema <driver.DataBase.list_schema>`.
+        """
+        key = ('list_schema',)
+        return self._cached(key) or self._cache(key, await self._list_schema())
+
+    async def get_schema(self, schema_name):
+        """See :meth:`DataBase.get_schema <driver.DataBase.get_schema>`.
+        """
+        key = ('get_schema', schema_name)
+        return self._cached(key) or self._cache(key, await self._get_schema(schema_name))
+
+    async def put_docs(self, schema_name, docs, chunk_size=BULK_CHUNK_SIZE, max_in_flight=BULK_MAX_IN_FLIGHT):
+        """Put many documents to glitter concurrently.
+
+        Same semantics as :meth:`DataBase.put_docs <driver.DataBase.put_docs>`
+        with tasks instead of threads; ``docs`` may also be an async iterable.
+
+        Yields:
+            - :class:`~driver.DocResult`: one per document, as soon as the
+              document is done, in completion order.
+        """
+        results = asyncio.Queue()
+        pending = set()
+        try:
+            offset = 0
+            async for chunk in _achunked(docs, chunk_size):
+                while len(pending) >= max_in_flight:
+                    async for result in _adrain(results, pending):
+                        yield result
+                task = asyncio.ensure_future(self._put_chunk(schema_name, offset, chunk, results.put_nowait))
+                task.add_done_callback(results.put_nowait)
+                pending.add(task)
+                offset += len(chunk)
+            while pending:
+                async for result in _adrain(results, pending):
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _put_chunk(self, schema_name, offset, chunk, report):
+        for index, doc in enumerate(chunk, offset):
+            try:
+                response = await self.put_doc(schema_name, doc)
+            except Exception as err:  # e.g. a document that is not JSON serializable
+                report(DocResult(index, doc, None, None, err))
+            else:
+                report(_doc_result(index, doc, response))
+
+    async def get_doc(self, schema_name, primary_key):
+        """See :meth:`DataBase.get_doc <driver.DataBase.get_doc>`."""
+        if self.doc_loader is not None:
+            return await self.doc_loader.load(schema_name, primary_key)
+        return await super().get_doc(schema_name, primary_key)
+
+    async def _load_docs(self, schema_name, doc_ids):
+        return _split_docs(doc_ids, await self._get_docs(schema_name, doc_ids))
+
+    async def get_docs(self, schema_name, primary_key, shard_size=None, max_workers=BULK_MAX_IN_FLIGHT):
+        """Get documents from glitter by doc ids.
+
+        See :meth:`DataBase.get_docs <driver.DataBase.get_docs>`.
+        """
+        if shard_size is None or len(primary_key) <= shard_size:
+            return await self._get_docs(schema_name, primary_key)
+        doc_ids = _unique(primary_key)
+        responses = []
+        async for _, response in self._fetch_shards(schema_name, doc_ids, shard_size, max_workers):
+            responses.append(response)
+        return _merge_docs(doc_ids, responses)
+
+    async def iter_docs(self, schema_name, primary_key, shard_size=100, max_workers=BULK_MAX_IN_FLIGHT):
+        """Streaming version of :meth:`get_docs`.
+
+        See :meth:`DataBase.iter_docs <driver.DataBase.iter_docs>`.
+        """
+        async for shard, response in self._fetch_shards(schema_name, _unique(primary_key), shard_size, max_workers):
+            for hit in _shard_hits(shard, response):
+                yield hit
+
+    async def search_iter(self, index, query_word, query_field, filters=[], aggs_field=[], order_by="",
+                          page_size=10, prefetch=True):
+        """ Iterate over all the search hits, page after page.
+
+        See :meth:`DataBase.search_iter <driver.DataBase.search_iter>`.
+        """
+        def fetch(page):
+            return asyncio.ensure_future(self.search(
+                index, query_word, query_field, filters=filters, aggs_field=aggs_field,
+                order_by=order_by, limit=page_size, page=page))
+
+        page, seen = 1, 0
+        task = fetch(page)
+        try:
+            while task is not None:
+                items, more = _search_page(await task, page, page_size, seen)
+                seen += len(items)
+                page += 1
+                task = fetch(page) if more and prefetch else None
+                for item in items:
+                    yield item
+                if more and task is None:
+                    task = fetch(page)
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def _fetch_shards(self, schema_name, doc_ids, shard_size, max_workers):
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch(shard):
+            async with semaphore:
+                return shard, await self._get_docs(schema_name, shard)
+
+        tasks = [asyncio.ensure_future(fetch(shard)) for shard in chunked(doc_ids, shard_size)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class AsyncChain(Chain):
+    """Awaitable version of :class:`~driver.Chain`.
+    """
+
+    def tx_search_all(self, query, per_page=100, order_by="asc", prove=False, max_workers=BULK_MAX_IN_FLIGHT,
+                      ordered=True):
+        """ Iterate over all the transactions matching a query.
+
+        See :meth:`Chain.tx_search_all <driver.Chain.tx_search_all>`.
+        """
+        def fetch(page):
+            return self.tx_search(query, page=page, per_page=per_page, order_by=order_by, prove=prove)
+
+        return _apaginate(fetch, 'txs', per_page, max_workers, ordered)
+
+    def block_search_all(self, query, per_page=100, order_by="asc", max_workers=BULK_MAX_IN_FLIGHT, ordered=True):
+        """ Iterate over all the blocks matching a query.
+
+        See :meth:`Chain.block_search_all <driver.Chain.block_search_all>`.
+        """
+        def fetch(page):
+            return self.block_search(query, page=page, per_page=per_page, order_by=order_by)
+
+        return _apaginate(fetch, 'blocks', per_page, max_workers, ordered)
+
+    async def scan(self, min_height=1, max_height=None, window=BLOCKCHAIN_MAX_HEADERS, headers_only=False,
+                   max_workers=BULK_MAX_IN_FLIGHT, checkpoint=None, on_progress=None):
+        """ Iterate over the blocks of a height range, in ascending height order.
+
+        See :meth:`Chain.scan <driver.Chain.scan>`.
+        """
+        cursor = _ScanCursor(checkpoint, on_progress)
+        min_height = cursor.start(min_height)
+        if max_height is None:
+            status = await self.status()
+            max_height = latest_block_height(status)
+            if max_height is None:
+                raise ResponseError(status)
+        if headers_only:
+            window = min(window, BLOCKCHAIN_MAX_HEADERS)
+
+        async def fetch(bounds):
+            low, high = bounds
+            if headers_only:
+                return high, _scan_headers(await self.blockchain(low, high), low, high)
+            return high, [_scan_block(await self.block(height)) for height in range(low, high + 1)]
+
+        async for high, blocks in _amap_window(fetch, _scan_windows(min_height, max_height, window), max_workers):
+            for block in blocks:
+                yield block
+            cursor.advance(high, len(blocks))
+
+    async def block(self, height=None):
+        """See :meth:`Chain.block <driver.Chain.block>`."""
+        return self._stored('block', height) or self._store_block(await self._block(height))
+
+    async def blockchain(self, min_height=1, max_height=20):
+        """See :meth:`Chain.blockchain <driver.Chain.blockchain>`."""
+        key = '{}-{}'.format(min_height, max_height)
+        return self._stored('blockchain', key) or \
+            self._store_blockchain(key, max_height, await self._blockchain(min_height, max_height))
+
+    async def header(self, height=1):
+        """See :meth:`Chain.header <driver.Chain.header>`."""
+        return self._stored('header', height) or self._store('header', height, await self._header(height))
+
+    async def header_by_hash(self, header_hash):
+        """See :meth:`Chain.header_by_hash <driver.Chain.header_by_hash>`."""
+        return self._stored('header_by_hash', header_hash) or \
+            self._store('header_by_hash', header_hash, await self._header_by_hash(header_hash))
+
+
+class AsyncAdmin(Admin):
+    """Awaitable version of :class:`~driver.Admin`.
+    """
+
+
+async def _adrain(results, pending):
+    """asyncio version of :func:`~driver._drain`."""
+    while True:
+        item = await results.get()
+        if not isinstance(item, asyncio.Future):
+            yield item
+            continue
+        pending.discard(item)
+        if not item.cancelled():
+            item.result()
+        return
+
+
+async def _achunked(iterable, size):
+    if not hasattr(iterable, '__aiter__'):
+        for chunk in chunked(iterable, size):
+            yield chunk
+        return
+    chunk = []
+    async for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _amap_window(fn, args, max_workers, ordered=True):
+    args = iter(args)
+    window = [asyncio.ensure_future(fn(arg)) for arg in islice(args, 2 * max_workers)]
+    try:
+        while window:
+            if ordered:
+                task = window.pop(0)
+            else:
+                done, _ = await asyncio.wait(window, return_when=asyncio.FIRST_COMPLETED)
+                task = done.pop()
+                window.remove(task)
+            result = await task
+            for arg in islice(args, 1):
+                window.append(asyncio.ensure_future(fn(arg)))
+            yield result
+    finally:
+        for task in window:
+            task.cancel()
+
+
+async def _apaginate(fetch, items_key, per_page, max_workers, ordered):
+    items, total = _rpc_page(await fetch(1), items_key)
+    for item in items:
+        yield item
+    pages = range(2, _page_count(total, per_page) + 1)
+    async for response in _amap_window(fetch, pages, max_workers, ordered):
+        items, _ = _rpc_page(response, items_key)
+        for item in items:
+            yield item
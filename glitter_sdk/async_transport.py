@@ -0,0 +1,152 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+import asyncio
+from functools import partial
+from time import monotonic
+
+from .async_connection import AsyncConnection, DEFAULT_LIMIT_PER_NODE
+from .limiter import AsyncConcurrencyLimiter
+from .pool import RoundRobinPicker
+from .singleflight import AsyncSingleFlight, request_key
+from .transport import Transport, _Attempts
+
+
+class AsyncTransport(Transport):
+    """asyncio counterpart of :class:`~glitter_sdk.transport.Transport`.
+
+    """
+
+    connection_class = AsyncConnection
+    singleflight_class = AsyncSingleFlight
+    limiter_class = AsyncConcurrencyLimiter
+
+    def __init__(self, *nodes, timeout=None, picker_class=RoundRobinPicker,
+                 limit_per_node=DEFAULT_LIMIT_PER_NODE, **kwargs):
+        """Initializes an instance of
+        :class:`~glitter_sdk.async_transport.AsyncTransport`.
+
+        Args:
+            nodes: each node is a dictionary with the keys `endpoint` and
+                   `headers`
+            timeout (int): Optional timeout in seconds.
+            picker_class: Optional picker class used to choose the node of
+                each request.
+            limit_per_node (int): Maximal number of simultaneous sockets
+                opened to each node (``0`` means unlimited).
+            kwargs: Other options of
+                :class:`~glitter_sdk.transport.Transport`, e.g.
+                ``hedge_percentile`` or ``breaker_threshold``.
+
+        """
+        self.limit_per_node = limit_per_node
+        super().__init__(*nodes, timeout=timeout, picker_class=picker_class,
+                         **kwargs)
+
+    def _session_options(self):
+        return dict(limit=self.limit_per_node)
+
+    async def forward_request(self, method, path=None,
+                              json=None, params=None, headers=None,
+                              idempotent=None, deadline=None):
+        """Makes HTTP requests to the configured nodes.
+
+           Same retry, backoff and timeout semantics as
+           :meth:`Transport.forward_request
+           <glitter_sdk.transport.Transport.forward_request>`.
+
+        Args:
+            method (str): HTTP method name (e.g.: ``'GET'``).
+            path (str): Path to be appended to the base url of a node. E.g.:
+                ``'/transactions'``).
+            json (dict): Payload to be sent with the HTTP request.
+            params (dict)): Dictionary of URL (query) parameters.
+            headers (dict): Optional headers to pass to the request.
+            idempotent (bool): Whether the request only reads data and can
+                safely be sent more than once.
+            deadline (Deadline): Optional time budget of the call.
+
+        Returns:
+            dict: Decoded JSON body of the response.
+
+        """
+        deadline = self._deadline(deadline)
+        if self.singleflight is not None and self.is_read(method, idempotent):
+            return await self.singleflight.do(
+                request_key(method, path, params, json, headers),
+                partial(self._forward_request, method, path, json, params,
+                        headers, idempotent, deadline), deadline)
+        return await self._forward_request(method, path, json, params,
+                                           headers, idempotent, deadline)
+
+    async def _forward_request(self, method, path, json, params, headers,
+                               idempotent, deadline):
+        attempts = _Attempts(self, method, path, json, params, headers,
+                             idempotent, deadline)
+        while not deadline.expired():
+            connection = attempts.next_connection()
+            start = monotonic()
+            try:
+                if attempts.hedge:
+                    response = await self._hedged_request(
+                        connection, attempts.request, attempts.call)
+                else:
+                    response = await self._send(connection, attempts.request,
+                                                attempts.call)
+            except Exception as err:
+                delay = attempts.retry_delay(connection, err)
+                if delay:
+                    await asyncio.sleep(delay)
+                continue
+            return attempts.done(response, start)
+        attempts.expire()
+
+    async def _send(self, connection, request, call=None):
+        if call is None:
+            return await connection.request(**request)
+        attempt = self._before_send(connection, call)
+        response = error = None
+        try:
+            response = await connection.request(**request)
+            return response
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            self._after_response(connection, call, attempt, response, error)
+
+    async def _hedged_request(self, connection, request, call=None):
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._send(connection, request, call)
+
+        primary = asyncio.ensure_future(self._send(connection, request, call))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        second = self._hedge_connection(connection, call)
+        if second is None:
+            return await primary
+        pending = {primary,
+                   asyncio.ensure_future(self._send(second, request, call))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return task.result()
+                    except Exception as err:
+                        error = error or err
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self):
+        """Closes the HTTP sessions of all the connections."""
+        for connection in self.connection_pool.connections:
+            await connection.close()
@@ -0,0 +1,107 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+import json
+import sqlite3
+from threading import Lock
+
+
+DEFAULT_MAX_ENTRIES = 100000
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS entries ('
+    ' kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,'
+    ' PRIMARY KEY (kind, key))',
+    'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)',
+)
+
+
+class BlockStore:
+    """Persistent cache of immutable chain data (blocks, headers).
+
+    Entries live in a SQLite database so that they survive restarts. When
+    more than ``max_entries`` are stored, the oldest inserted entries are
+    evicted first; reads never write to the database.
+
+    The highest committed height seen in replies is kept as
+    :attr:`last_height`, ranges above it are never cached.
+
+    Args:
+        path (str): path of the SQLite database file, ``':memory:'`` keeps
+            the entries in memory only.
+        max_entries (int): maximal number of cached replies.
+    """
+
+    def __init__(self, path=':memory:', max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._count = self._db.execute(
+            'SELECT COUNT(*) FROM entries').fetchone()[0]
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE name = 'last_height'").fetchone()
+        self.last_height = row[0] if row else 0
+
+    def __len__(self):
+        return self._count
+
+    def get(self, kind, key):
+        """Returns the reply stored for ``(kind, key)``, or `None`."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value FROM entries WHERE kind = ? AND key = ?',
+                (kind, str(key))).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, kind, key, value):
+        """Stores the reply ``value`` for ``(kind, key)``."""
+        data = json.dumps(value)
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO entries (kind, key, value) '
+                'VALUES (?, ?, ?)', (kind, str(key), data))
+            self._count += cursor.rowcount
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._db.execute(
+                    'DELETE FROM entries WHERE rowid IN '
+                    '(SELECT rowid FROM entries ORDER BY rowid LIMIT ?)',
+                    (excess,))
+                self._count -= excess
+
+    def update_height(self, height):
+        """Raises :attr:`last_height` to ``height`` if it is higher."""
+        if height is None or height <= self.last_height:
+            return
+        with self._lock:
+            if height <= self.last_height:
+                return
+            self.last_height = height
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) "
+                "VALUES ('last_height', ?)", (height,))
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._db.execute('DELETE FROM entries')
+            self._count = 0
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,104 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_TTL = 60  # seconds
+
+
+class AbstractCache(metaclass=ABCMeta):
+    """Abstract class for client side caches of node replies.
+
+    Implementations count their ``hits`` and ``misses``.
+    """
+
+    hits = 0
+    misses = 0
+
+    @abstractmethod
+    def get(self, key):
+        """Returns the value cached for ``key``, or `None`.
+
+        Args:
+            key: hashable cache key.
+
+        """
+        pass    # pragma: no cover
+
+    @abstractmethod
+    def set(self, key, value):
+        """Caches ``value`` for ``key``.
+
+        Args:
+            key: hashable cache key.
+            value: value to cache, must not be `None`.
+
+        """
+        pass    # pragma: no cover
+
+    @abstractmethod
+    def invalidate(self, key=None):
+        """Drops ``key`` from the cache, or every key if `None`.
+
+        Args:
+            key: hashable cache key.
+
+        """
+        pass    # pragma: no cover
+
+    def stats(self):
+        """Returns the hit and miss counters."""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class TTLCache(AbstractCache):
+    """In-memory LRU cache whose entries expire after ``ttl`` seconds.
+
+    Args:
+        maxsize (int): maximal number of entries, the least recently used
+            entry is evicted first.
+        ttl (float): lifetime of an entry in seconds.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
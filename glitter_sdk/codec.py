@@ -0,0 +1,93 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""JSON codecs encoding the request bodies and decoding the replies.
+
+By default the fastest installed library is used: ``orjson``, then
+``ujson``, then the standard library ``json``.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+
+class JSONCodec:
+    """Codec backed by the standard library :mod:`json`.
+
+    :meth:`dumps` returns the UTF-8 encoded document, :meth:`loads` accepts
+    :obj:`bytes` or :obj:`str` and raises :exc:`ValueError` on invalid
+    input.
+    """
+
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec backed by ``orjson``. Documents ``orjson`` cannot encode (e.g.
+    integers wider than 64 bits) fall back to :mod:`json`."""
+
+    name = 'orjson'
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    """Codec backed by ``ujson``."""
+
+    name = 'ujson'
+
+    def dumps(self, obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+CODECS = {'orjson': OrjsonCodec, 'ujson': UjsonCodec, 'json': JSONCodec}
+AVAILABLE_CODECS = tuple(name for name, module in
+                         (('orjson', orjson), ('ujson', ujson), ('json', json))
+                         if module is not None)
+
+
+def get_codec(codec=None):
+    """Returns a codec instance.
+
+    Args:
+        codec: `None` for the fastest available codec, a codec name
+            (``'orjson'``, ``'ujson'`` or ``'json'``) or a codec instance,
+            returned as is.
+
+    Raises:
+        ValueError: if the codec is unknown or its library is not installed.
+    """
+    if codec is None:
+        codec = AVAILABLE_CODECS[0]
+    if not isinstance(codec, str):
+        return codec
+    if codec not in AVAILABLE_CODECS:
+        raise ValueError('JSON codec {!r} is not available, choose one of {}'
+                         .format(codec, ', '.join(AVAILABLE_CODECS)))
+    return CODECS[codec]()
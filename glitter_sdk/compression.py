@@ -0,0 +1,80 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Compression of the request bodies.
+
+Compressed replies are handled by the HTTP libraries: ``requests`` (urllib3)
+and aiohttp advertise the encodings they can decode in ``Accept-Encoding``
+(``gzip`` and ``deflate``, plus ``br`` and ``zstd`` when the matching
+packages are installed) and decompress the replies in C as they are read.
+
+Request bodies are sent uncompressed unless a compression is configured
+(``GlitterClient(url, compression='gzip')``), in which case the bodies of at
+least ``compress_min_size`` bytes are compressed and sent with a
+``Content-Encoding`` header. A node answering a compressed request with
+``415 Unsupported Media Type`` gets the request again uncompressed, and no
+more compressed bodies afterwards.
+"""
+
+import gzip
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+COMPRESS_MIN_SIZE = 1024  # bytes
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+class GzipCompressor:
+    """Compressor backed by the standard library :mod:`gzip`."""
+
+    encoding = 'gzip'
+
+    def __init__(self, level=GZIP_LEVEL):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, self.level, mtime=0)
+
+
+class ZstdCompressor:
+    """Compressor backed by ``zstandard``, faster than gzip at a similar
+    ratio."""
+
+    encoding = 'zstd'
+
+    def __init__(self, level=ZSTD_LEVEL):
+        self.level = level
+
+    def compress(self, data):
+        return zstandard.compress(data, self.level)
+
+
+COMPRESSORS = {'gzip': GzipCompressor, 'zstd': ZstdCompressor}
+AVAILABLE_COMPRESSORS = ('gzip',) + (('zstd',) if zstandard is not None
+                                     else ())
+
+
+def get_compressor(compression=None):
+    """Returns a compressor instance, or `None`.
+
+    Args:
+        compression: `None` to send uncompressed bodies, a compression name
+            (``'gzip'`` or ``'zstd'``) or a compressor instance, returned as
+            is.
+
+    Raises:
+        ValueError: if the compression is unknown or its library is not
+            installed.
+    """
+    if compression is None or not isinstance(compression, str):
+        return compression
+    if compression not in AVAILABLE_COMPRESSORS:
+        raise ValueError('compression {!r} is not available, choose one of {}'
+                         .format(compression, ', '.join(AVAILABLE_COMPRESSORS)))
+    return COMPRESSORS[compression]()
@@ -2,53 +2,115 @@
 # SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
 # Code is Apache-2.0 and docs are CC-BY-4.0
 
+import threading
 import time
 
 from collections import namedtuple
-from datetime import datetime, timedelta
-
-from requests import Session
-from requests.exceptions import ConnectionError
 
+from .codec import get_codec
+from .compression import COMPRESS_MIN_SIZE, get_compressor
 from .exceptions import HTTP_EXCEPTIONS, TransportError,TimeoutError
+from .health import CircuitBreaker, is_node_failure
+from .metrics import status_label
 
 
 BACKOFF_DELAY = 0.5  # seconds
+BACKOFF_MAX_EXPONENT = 32  # keeps the delay computation from overflowing
+LATENCY_EWMA_WEIGHT = 0.3  # weight of the newest sample in `latency`
+DEFAULT_POOLSIZE = 10  # host pools of a session, as in requests
+DEFAULT_POOL_MAXSIZE = 32  # sockets kept open to each node
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+HttpResponse = namedtuple('HttpResponse', ('status_code', 'headers', 'data',
+                                           'request_size', 'response_size'),
+                          defaults=(None, None))
+
 
-HttpResponse = namedtuple('HttpResponse', ('status_code', 'headers', 'data'))
+def wire_size(headers, content):
+    """Returns the size of a reply body as sent by the node, i.e. before it
+    was decompressed."""
+    length = headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else len(content)
 
 
 class Connection:
-    """A Connection object to make HTTP requests to a particular node."""
+    """A Connection object to make HTTP requests to a particular node.
 
-    def __init__(self, *, node_url, headers=None):
+    Connections are thread-safe: the backoff, latency and in-flight
+    bookkeeping is updated under a lock, and the HTTP session keeps a pool
+    of up to ``pool_maxsize`` sockets to the node, shared by the threads
+    sending requests through the connection.
+    """
+
+    def __init__(self, *, node_url, headers=None, breaker=None, codec=None,
+                 pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, metrics=None,
+                 compression=None, compress_min_size=COMPRESS_MIN_SIZE,
+                 rate_limiter=None, limiter=None):
         """Initializes a :class:`~GlitterClient_driver.connection.Connection`
         instance.
 
         Args:
             node_url (str):  Url of the node to connect to.
             headers (dict): Optional headers to send with each request.
+            breaker (CircuitBreaker): Optional circuit breaker of the node.
+            codec: Optional JSON codec, or codec name, see
+                :func:`~glitter_sdk.codec.get_codec`.
+            pool_connections (int): Number of host pools the HTTP session
+                caches.
+            pool_maxsize (int): Number of sockets kept open to the node.
+                Threads beyond it still get a socket, which is closed after
+                the request instead of being reused.
+            metrics (Metrics): Optional registry recording each request,
+                see :mod:`~glitter_sdk.metrics`.
+            compression: Optional compression of the request bodies, or
+                compression name, see
+                :func:`~glitter_sdk.compression.get_compressor`.
+            compress_min_size (int): Size in bytes from which the request
+                bodies are compressed.
+            rate_limiter (TokenBucket): Optional rate limit of the requests
+                sent to the node, see :mod:`~glitter_sdk.limiter`.
+            limiter (ConcurrencyLimiter): Optional limit of the requests in
+                flight to the node.
 
         """
         self.node_url = node_url
-        self.session = Session()
-        if headers:
-            self.session.headers.update(headers)
+        self.codec = get_codec(codec)
+        self.compressor = get_compressor(compression)
+        self.compress_min_size = compress_min_size
+        self.rate_limiter = rate_limiter
+        self.limiter = limiter
+        self.headers = dict(headers) if headers else {}
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        # Created on the first request, see _get_session.
+        self.session = None
 
+        self.metrics = metrics
+        self._lock = threading.Lock()
         self._retries = 0
         self.backoff_time = None
+        self.latency = None
+        self.in_flight = 0
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
 
     def request(self, method, *, path=None, json=None,
                 params=None, headers=None, timeout=None,
-                backoff_cap=None, **kwargs):
+                backoff_cap=None, deadline=None, record_health=True,
+                **kwargs):
         """Performs an HTTP request with the given parameters.
 
            Implements exponential backoff.
 
            If `ConnectionError` occurs, a timestamp equal to now +
            the default delay (`BACKOFF_DELAY`) is assigned to the object.
-           The timestamp is in UTC. Next time the function is called, it either
-           waits till the timestamp is passed or raises `TimeoutError`.
+           The timestamp is read from the monotonic clock
+           (:func:`time.monotonic`). Next time the function is called, it
+           either waits till the timestamp is passed or raises
+           `TimeoutError`. The pool only hands out a connection in backoff
+           when all the connections are, so this wait does not delay
+           requests that another node could serve.
 
            If `ConnectionError` occurs two or more times in a row,
            the retry count is incremented and the new timestamp is calculated
@@ -58,6 +120,23 @@ class Connection:
            If a request is successful, the backoff timestamp is removed,
            the retry count is back to zero.
 
+           The number of requests in progress (`in_flight`) and an
+           exponentially weighted moving average of the latency of
+           successful requests (`latency`) are kept up to date for the
+           pickers.
+
+           The outcome of the request is also recorded by the circuit
+           breaker of the connection (`breaker`): connection errors,
+           timeouts and 5xx answers count as failures. An attempt that ends
+           with neither a response nor an error (a cancelled task, a
+           `KeyboardInterrupt`) leaves the breaker and the backoff as they
+           are.
+
+           With a `rate_limiter` or a concurrency `limiter`, the request
+           then waits for its turn, or raises `TimeoutError` if it would
+           not get it in time. It also raises `TimeoutError`, without
+           sending anything, when these waits used up the time left.
+
         Args:
             method (str): HTTP method (e.g.: ``'GET'``).
             path (str): API endpoint path (e.g.: ``'/transactions'``).
@@ -67,10 +146,24 @@ class Connection:
             timeout (int): Optional timeout in seconds.
             backoff_cap (int): The maximal allowed backoff delay in seconds
                                to be assigned to a node.
+            deadline (Deadline): Optional time budget of the call, see
+                :mod:`~glitter_sdk.deadline`. Replaces ``timeout``.
+            record_health (bool): Whether the request waits for the
+                backoff of the node and its outcome updates the backoff and
+                the circuit breaker. Health probes do neither: they check
+                nodes in backoff too, and feed the breaker themselves once
+                the lag of the node is known.
             kwargs: Optional keyword arguments.
 
         """
-        backoff_timedelta = self.get_backoff_timedelta()
+        # A body that cannot be encoded is not the fault of the node, and
+        # is not recorded as an outcome of the request.
+        body, headers = self._encode(json, headers)
+        if deadline is not None:
+            timeout = deadline.remaining()
+        # Probes check the node regardless of its backoff.
+        backoff_timedelta = max(self.get_backoff_timedelta(), 0) \
+            if record_health else 0
 
         if timeout is not None and timeout < backoff_timedelta:
             raise TimeoutError
@@ -78,53 +171,227 @@ class Connection:
         if backoff_timedelta > 0:
             time.sleep(backoff_timedelta)
 
-        connExc = None
+        error = response = None
         timeout = timeout if timeout is None else timeout - backoff_timedelta
+        token = None
+        if self.rate_limiter is not None or self.limiter is not None:
+            admitted = time.monotonic()
+            token = self._admit(timeout)
+            if timeout is not None:
+                timeout -= time.monotonic() - admitted
+        try:
+            attempt_timeout = self._timeout(timeout, deadline)
+        except TimeoutError:
+            if token is not None:
+                self.limiter.release(token)
+            raise
+        with self._lock:
+            self.in_flight += 1
+        start = time.monotonic()
         try:
             response = self._request(
                 method=method,
-                timeout=timeout,
+                timeout=attempt_timeout,
                 url=self.node_url + path if path else self.node_url,
-                json=json,
+                body=body,
                 params=params,
                 headers=headers,
                 **kwargs,
             )
-        except ConnectionError as err:
-            connExc = err
+        except Exception as err:
+            error = err
             raise err
         finally:
-            self.update_backoff_time(success=connExc is None,
-                                     backoff_cap=backoff_cap)
+            self._finish(method, path, start, token, response, error,
+                         backoff_cap, record_health)
         return response
 
-    def get_backoff_timedelta(self):
-        if self.backoff_time is None:
+    def _finish(self, method, path, start, token, response, error,
+                backoff_cap, record_health):
+        """Records the outcome of an attempt started at ``start``."""
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self.in_flight -= 1
+        if response is not None:
+            self.update_latency(elapsed)
+        if token is not None:
+            self.limiter.release(token, elapsed if response is not None
+                                 else None, error)
+        # A cancelled attempt (neither a response nor an error) says
+        # nothing about the health of the node.
+        if record_health and (response is not None or error is not None):
+            self.update_backoff_time(
+                success=error is None or not self.is_connection_error(error),
+                backoff_cap=backoff_cap)
+            self.breaker.record(success=not is_node_failure(error))
+        if self.metrics is not None:
+            self._record(method, path, elapsed, response, error)
+
+    @staticmethod
+    def is_connection_error(error):
+        """Tells whether ``error`` means that the node could not be
+        reached, in which case the request may be sent to another node."""
+        # An error of requests implies requests was imported already.
+        from requests.exceptions import ConnectionError
+        return isinstance(error, ConnectionError)
+
+    @staticmethod
+    def is_timeout(error):
+        """Tells whether ``error`` means that an attempt ran out of time."""
+        from requests.exceptions import Timeout
+        return isinstance(error, Timeout)
+
+    def is_available(self, now=None):
+        """Tells whether the backoff of the connection has expired, its
+        circuit breaker lets requests through and its concurrency limiter,
+        if any, has a free slot."""
+        return self.get_backoff_timedelta(now) <= 0 \
+            and self.breaker.available(now) \
+            and (self.limiter is None or self.limiter.available())
+
+    def _admit(self, timeout):
+        """Waits for the rate and concurrency limits to let a request
+        through, returns the token of its concurrency slot, if any."""
+        start = time.monotonic()
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve(timeout)
+            if wait is None:
+                raise TimeoutError([])
+            if wait > 0:
+                time.sleep(wait)
+        if self.limiter is None:
+            return None
+        return self.limiter.acquire(
+            None if timeout is None else timeout - (time.monotonic() - start))
+
+    def get_backoff_timedelta(self, now=None):
+        backoff_time = self.backoff_time
+        if backoff_time is None:
             return 0
 
-        return (self.backoff_time - datetime.utcnow()).total_seconds()
+        return backoff_time - (time.monotonic() if now is None else now)
 
     def update_backoff_time(self, success, backoff_cap=None):
-        if success:
-            self._retries = 0
-            self.backoff_time = None
+        with self._lock:
+            if success:
+                self._retries = 0
+                self.backoff_time = None
+            else:
+                backoff_delta = BACKOFF_DELAY * 2 ** min(
+                    self._retries, BACKOFF_MAX_EXPONENT)
+                if backoff_cap is not None:
+                    backoff_delta = min(backoff_delta, backoff_cap)
+                self.backoff_time = time.monotonic() + backoff_delta
+                self._retries += 1
+        if not success and self.metrics is not None:
+            self.metrics.record_backoff(self.node_url)
+
+    def hold_off(self, delay):
+        """Puts the connection in backoff for at least ``delay`` seconds,
+        e.g. as asked by a ``Retry-After`` header."""
+        until = time.monotonic() + delay
+        with self._lock:
+            if self.backoff_time is None or self.backoff_time < until:
+                self.backoff_time = until
+
+    def update_latency(self, elapsed):
+        with self._lock:
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += LATENCY_EWMA_WEIGHT * (elapsed - self.latency)
+
+    @staticmethod
+    def _timeout(timeout, deadline):
+        """Returns the timeout given to the HTTP library for an attempt.
+
+        Raises:
+            TimeoutError: if no time is left, e.g. after a backoff or a rate
+                limit wait: requests rejects a zero timeout.
+        """
+        if deadline is not None:
+            timeout = deadline.attempt_timeouts()
+            if any(t is not None and t <= 0 for t in timeout):
+                raise TimeoutError([])
+        elif timeout is not None and timeout <= 0:
+            raise TimeoutError([])
+        return timeout
+
+    def _record(self, method, path, elapsed, response, error):
+        if response is None:
+            self.metrics.record_request(self.node_url, path, method,
+                                        status_label(error=error), elapsed)
         else:
-            utcnow = datetime.utcnow()
-            backoff_delta = BACKOFF_DELAY * 2 ** self._retries
-            if backoff_cap is not None:
-                backoff_delta = min(backoff_delta, backoff_cap)
-            self.backoff_time = utcnow + timedelta(seconds=backoff_delta)
-            self._retries += 1
-
-    def _request(self, **kwargs):
-        response = self.session.request(**kwargs)
-        text = response.text
+            self.metrics.record_request(self.node_url, path, method,
+                                        status_label(response), elapsed,
+                                        response.request_size,
+                                        response.response_size)
+
+    def _encode(self, json, headers):
+        """Serializes the ``json`` payload with the codec of the connection,
+        returns the body and the headers to send."""
+        if json is None:
+            return None, headers
+        return self.codec.dumps(json), dict(JSON_HEADERS, **(headers or {}))
+
+    def _compress(self, body, headers):
+        """Compresses a request body when it is large enough, returns the
+        body and the headers to send."""
+        compressor = self.compressor
+        if compressor is None or body is None \
+                or len(body) < self.compress_min_size:
+            return body, headers
+        return compressor.compress(body), dict(
+            headers, **{'Content-Encoding': compressor.encoding})
+
+    def _reject_compression(self, status_code, body, sent):
+        """Tells whether the node refused a compressed body, in which case
+        the next requests are sent uncompressed."""
+        if status_code != 415 or sent is body:
+            return False
+        self.compressor = None
+        return True
+
+    def _decode(self, content):
+        """Decodes a reply body once, straight from bytes. Returns `None`
+        if it is not JSON."""
         try:
-            json = response.json()
+            return self.codec.loads(content) if content else None
         except ValueError:
-            json = None
+            return None
+
+    def _get_session(self):
+        session = self.session
+        if session is None:
+            # requests is only imported by the first request, so that
+            # importing the package or creating a client stays cheap.
+            from requests import Session
+            from requests.adapters import HTTPAdapter
+            with self._lock:
+                if self.session is None:
+                    session = Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                          pool_maxsize=self.pool_maxsize)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update(self.headers)
+                    self.session = session
+                session = self.session
+        return session
+
+    def _request(self, *, body=None, headers=None, **kwargs):
+        sent, sent_headers = self._compress(body, headers)
+        session = self._get_session()
+        response = session.request(data=sent, headers=sent_headers, **kwargs)
+        if self._reject_compression(response.status_code, body, sent):
+            sent = body
+            response = session.request(data=body, headers=headers, **kwargs)
+        json = self._decode(response.content)
         if not (200 <= response.status_code < 300):
             exc_cls = HTTP_EXCEPTIONS.get(response.status_code, TransportError)
-            raise exc_cls(response.status_code, text, json, kwargs['url'])
-        data = json if json is not None else text
-        return HttpResponse(response.status_code, response.headers, data)
+            raise exc_cls(response.status_code, response.text, json,
+                          kwargs['url'], response.headers)
+        data = json if json is not None else response.text
+        return HttpResponse(response.status_code, response.headers, data,
+                            len(sent) if sent else 0,
+                            wire_size(response.headers, response.content))
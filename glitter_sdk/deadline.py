@@ -0,0 +1,110 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Time budgets of the calls sent to the nodes.
+
+A :class:`Deadline` bounds the total time of a call, backoff and retries
+included, and may also bound each attempt: the time to connect, the time
+between two reads of the reply and the whole attempt. An attempt that runs
+out of its own time is retried on another node, as long as the call is a
+read and the deadline is not expired, so that one hung node does not
+consume the whole budget.
+
+The asyncio client enforces the time left and ``attempt`` on the whole
+attempt. requests has no such total timeout, so the threaded client only
+applies them to the connection and to each read of the reply, separately:
+a node trickling its reply byte by byte can keep an attempt going past
+them.
+
+The deadline of a call is, in this order, the one given to
+:meth:`~glitter_sdk.transport.Transport.forward_request`, the current
+deadline (the innermost ``with Deadline(...)`` block), or a new one built
+from the timeouts of the client::
+
+    with Deadline(0.5, connect=0.05, attempt=0.2):
+        client.db.search("paper", "title", ["title"])
+        client.chain.block(42)  # shares the same 0.5s
+
+The current deadline follows the calls into the threads of the bulk methods
+(``put_docs``, ``get_docs``, ``scan``...) and into asyncio tasks. Batched
+:meth:`~glitter_sdk.driver.DataBase.get_doc` reads are sent with the
+timeouts of the client.
+"""
+
+import contextvars
+from time import monotonic
+
+
+_current = contextvars.ContextVar('glitter_deadline', default=None)
+
+
+def _min(value, cap):
+    if value is None:
+        return cap
+    return value if cap is None else min(value, cap)
+
+
+class Deadline:
+    """Time budget of a call, started when the deadline is created.
+
+    Args:
+        timeout (float): Seconds the call may take in total, `None` for no
+            limit.
+        connect (float): Optional seconds an attempt may take to connect to
+            a node.
+        read (float): Optional seconds an attempt may wait for each read of
+            the reply.
+        attempt (float): Optional seconds an attempt may take in total
+            (asyncio client), or may wait to connect and for each read
+            (threaded client).
+    """
+
+    def __init__(self, timeout=None, *, connect=None, read=None,
+                 attempt=None):
+        self.timeout = timeout
+        self.connect = connect
+        self.read = read
+        self.attempt = attempt
+        self.expires = None if timeout is None else monotonic() + timeout
+        self._tokens = []
+
+    def remaining(self):
+        """Returns the seconds left, `None` when there is no limit."""
+        if self.expires is None:
+            return None
+        return max(self.expires - monotonic(), 0)
+
+    def expired(self):
+        return self.expires is not None and monotonic() >= self.expires
+
+    def attempt_timeout(self):
+        """Returns the seconds the next attempt may take: the time left,
+        capped by ``attempt``."""
+        return _min(self.remaining(), self.attempt)
+
+    def attempt_timeouts(self):
+        """Returns the ``(connect, read)`` timeouts of the next attempt."""
+        cap = self.attempt_timeout()
+        return _min(self.connect, cap), _min(self.read, cap)
+
+    def __enter__(self):
+        outer = _current.get()
+        if outer is not None and outer.expires is not None:
+            # A nested deadline cannot extend the one of its caller.
+            self.expires = _min(self.expires, outer.expires)
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._tokens.pop())
+
+    def __repr__(self):
+        return '<Deadline remaining={} connect={} read={} attempt={}>'.format(
+            self.remaining(), self.connect, self.read, self.attempt)
+
+
+def current_deadline():
+    """Returns the deadline of the innermost ``with Deadline(...)`` block,
+    or `None`."""
+    return _current.get()
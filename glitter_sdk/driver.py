@@ -2,26 +2,78 @@
 # SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
 # Code is Apache-2.0 and docs are CC-BY-4.0
 
+import contextvars
+import os
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from itertools import islice
+from queue import Queue
+from time import monotonic
+
+from .exceptions import ResponseError
+from .loader import BatchLoader, BATCH_SIZE
+from .pool import RoundRobinPicker
 from .transport import Transport
-from .utils import normalize_nodes
+from .utils import chunked, latest_block_height, normalize_nodes
+
+BULK_CHUNK_SIZE = 10
+BULK_MAX_IN_FLIGHT = 8
+BLOCKCHAIN_MAX_HEADERS = 20  # most headers returned by /chain/blockchain
+
+DocResult = namedtuple('DocResult', ('index', 'doc', 'tx', 'response', 'error'))
+DocResult.__doc__ = """Outcome of putting a single document with :meth:`DataBase.put_docs`.
+
+``index`` is the position of ``doc`` in the input iterable, ``tx`` the
+transaction hash on success, ``response`` the node reply (if any) and
+``error`` the exception raised while sending the document (if any).
+"""
+
+ScanProgress = namedtuple('ScanProgress', ('height', 'blocks', 'elapsed', 'rate'))
+ScanProgress.__doc__ = """Progress of :meth:`Chain.scan`: the last height yielded, the number of
+blocks yielded so far, the elapsed seconds and the blocks per second."""
+
 
 class GlitterClient:
     """A :class: `~driver.GlitterClient` is python client  for glitter. It can be connect, create schema, put docs and search .
 
+    A client is thread-safe and meant to be shared: threads reuse the sockets kept open to each node, up
+    to ``pool_maxsize`` (see :class:`~transport.Transport`) per node.
     """
 
-    def __init__(self, *nodes, headers=None, transport_class=Transport, timeout=20):
+    def __init__(self, *nodes, headers=None, transport_class=Transport, timeout=20, picker_class=RoundRobinPicker,
+                 schema_cache=None, block_store=None, doc_batch_window=None, doc_batch_size=BATCH_SIZE,
+                 **kwargs):
         """Initialize a :class:`~driver.GlitterClient` driver instance.
 
         Args:
             *nodes:(list of (str or dict)): Glitter nodes to connect to.
             headers (dict): Optional headers that will be passed with each request
             transport_class: Optional transport class to use.
-            timeout (int): Optional timeout in seconds that will be passed to each request.
+            timeout (int): Optional timeout in seconds of each call, retries included. Finer budgets
+                (``connect_timeout``, ``read_timeout``, ``attempt_timeout``) are options of the transport,
+                and a :class:`~deadline.Deadline` can bound any call, see :mod:`~glitter_sdk.deadline`.
+            picker_class: Optional picker class choosing the node of each request,
+                e.g. :class:`~pool.RoundRobinPicker` (default) or :class:`~pool.LatencyAwarePicker`.
+            schema_cache (:class:`~cache.AbstractCache`): Optional cache for schema reads, e.g.
+                :class:`~cache.TTLCache`. ``create_schema`` invalidates the affected entries.
+            block_store (:class:`~block_store.BlockStore`): Optional persistent store of
+                committed blocks and headers.
+            doc_batch_window (float): Enables the batching of :meth:`DataBase.get_doc` calls: ids
+                requested within this many seconds of each other are fetched by a single ``get_docs``
+                request per schema. Useful when many threads read single documents.
+            doc_batch_size (int): Maximal number of ids per batched ``get_docs`` request.
+            kwargs: Optional keyword arguments passed to ``transport_class``, e.g.
+                ``hedge_percentile=95`` to enable hedged reads, ``codec='json'`` to choose the JSON library,
+                ``compression='gzip'`` to compress the request bodies or ``concurrency_limit=16`` to cap the
+                requests in flight to each node.
         """
         self._headers = headers
+        self._schema_cache = schema_cache
+        self._block_store = block_store
+        self.doc_batch_window = doc_batch_window
+        self.doc_batch_size = doc_batch_size
         self._nodes = normalize_nodes(*nodes, headers=headers)
-        self._transport = transport_class(*self._nodes, timeout=timeout)
+        self._transport = transport_class(*self._nodes, timeout=timeout, picker_class=picker_class, **kwargs)
         self._db = DataBase(self)
         self._chain = Chain(self)
         self._admin = Admin(self)
@@ -34,6 +86,18 @@ class GlitterClient:
         """
         return self._nodes
 
+    @property
+    def schema_cache(self):
+        """:class:`~cache.AbstractCache`: cache of schema reads, or `None`.
+        """
+        return self._schema_cache
+
+    @property
+    def block_store(self):
+        """:class:`~block_store.BlockStore`: store of committed chain data, or `None`.
+        """
+        return self._block_store
+
     @property
     def transport(self):
         """:class:`~driver.Transport`: Object responsible for forwarding requests to a :class:`~driver.Connection` instance (node).
@@ -92,8 +156,20 @@ class NamespacedDriver:
 
 class DataBase(NamespacedDriver):
     """Exposes the data of glitter db.
+
+    With ``doc_batch_window`` set on the client, concurrent :meth:`get_doc` calls are batched into
+    ``get_docs`` requests by :attr:`doc_loader`.
     """
 
+    loader_class = BatchLoader
+
+    def __init__(self, driver):
+        super().__init__(driver)
+        self.doc_loader = None
+        if getattr(driver, 'doc_batch_window', None) is not None:
+            self.doc_loader = self.loader_class(self._load_docs, window=driver.doc_batch_window,
+                                                max_batch=driver.doc_batch_size)
+
     def create_schema(self, schema_name, fields):
         """
 
@@ -104,6 +180,31 @@ class DataBase(NamespacedDriver):
         Returns:
             - :obj:`dic`: request result.
         """
+        response = self._create_schema(schema_name, fields)
+        self._invalidate_schema(schema_name)
+        return response
+
+    def list_schema(self):
+        """
+
+        Returns:
+            - :obj:`dic`: list all schema.
+        """
+        key = ('list_schema',)
+        return self._cached(key) or self._cache(key, self._list_schema())
+
+    def get_schema(self, schema_name):
+        """
+
+        Args:
+            - schema_name(str): the name of schema.
+        Returns:
+            - :obj:`dic`: result with document schema.
+        """
+        key = ('get_schema', schema_name)
+        return self._cached(key) or self._cache(key, self._get_schema(schema_name))
+
+    def _create_schema(self, schema_name, fields):
         path = '/create_schema'
         schema_type = "record"
         body = {
@@ -121,12 +222,7 @@ class DataBase(NamespacedDriver):
             json=body,
         )
 
-    def list_schema(self):
-        """
-
-        Returns:
-            - :obj:`dic`: list all schema.
-        """
+    def _list_schema(self):
         path = '/list_schema'
 
         return self.transport.forward_request(
@@ -134,14 +230,7 @@ class DataBase(NamespacedDriver):
             path=self.api_prefix + path,
         )
 
-    def get_schema(self, schema_name):
-        """
-
-        Args:
-            - schema_name(str): the name of schema.
-        Returns:
-            - :obj:`dic`: result with document schema.
-        """
+    def _get_schema(self, schema_name):
         path = '/show_schema'
 
         return self.transport.forward_request(
@@ -150,6 +239,25 @@ class DataBase(NamespacedDriver):
             params={"schema_name": schema_name}
         )
 
+    @property
+    def schema_cache(self):
+        return self.driver.schema_cache
+
+    def _cached(self, key):
+        if self.schema_cache is None:
+            return None
+        return self.schema_cache.get(key)
+
+    def _cache(self, key, response):
+        if self.schema_cache is not None and _is_ok(response):
+            self.schema_cache.set(key, response)
+        return response
+
+    def _invalidate_schema(self, schema_name):
+        if self.schema_cache is not None:
+            self.schema_cache.invalidate(('get_schema', schema_name))
+            self.schema_cache.invalidate(('list_schema',))
+
     def app_status(self):
         """
 
@@ -185,6 +293,52 @@ class DataBase(NamespacedDriver):
             json=body,
         )
 
+    def put_docs(self, schema_name, docs, chunk_size=BULK_CHUNK_SIZE, max_in_flight=BULK_MAX_IN_FLIGHT):
+        """Put many documents to glitter concurrently.
+
+        ``docs`` is consumed lazily and grouped into chunks of ``chunk_size``
+        documents. Each chunk is sent by a worker thread, document after
+        document, and at most ``max_in_flight`` chunks are in progress at any
+        time, so memory stays bounded for arbitrarily large inputs.
+
+        Args:
+            - schema_name(str): the name of schema.
+            - docs(iterable of :obj:`dic`): documents to put, may be a generator.
+            - chunk_size(int): number of documents per chunk.
+            - max_in_flight(int): maximal number of chunks sent concurrently.
+
+        Yields:
+            - :class:`DocResult`: one per document, as soon as the document is
+              done, in completion order. Errors are reported in
+              ``DocResult.error`` rather than raised.
+        """
+        results = Queue()
+        with _Executor(max_workers=max_in_flight) as executor:
+            pending = set()
+            try:
+                offset = 0
+                for chunk in chunked(docs, chunk_size):
+                    while len(pending) >= max_in_flight:
+                        yield from _drain(results, pending)
+                    future = executor.submit(self._put_chunk, schema_name, offset, chunk, results.put)
+                    future.add_done_callback(results.put)
+                    pending.add(future)
+                    offset += len(chunk)
+                while pending:
+                    yield from _drain(results, pending)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _put_chunk(self, schema_name, offset, chunk, report):
+        for index, doc in enumerate(chunk, offset):
+            try:
+                response = self.put_doc(schema_name, doc)
+            except Exception as err:  # e.g. a document that is not JSON serializable
+                report(DocResult(index, doc, None, None, err))
+            else:
+                report(_doc_result(index, doc, response))
+
     def get_doc(self, schema_name, primary_key):
         """Get documents from glitter by doc ids.
 
@@ -195,30 +349,82 @@ class DataBase(NamespacedDriver):
         Returns:
             :obj:`dic`: result with the document struct.
         """
+        if self.doc_loader is not None:
+            return self.doc_loader.load(schema_name, primary_key)
         path = '/get_docs'
         return self.transport.forward_request(
             method='POST',
             path=self.api_prefix + path,
             json={"schema_name": schema_name, "doc_ids": [primary_key]},
+            idempotent=True,
         )
 
-    def get_docs(self, schema_name, primary_key):
+    def _load_docs(self, schema_name, doc_ids):
+        return _split_docs(doc_ids, self._get_docs(schema_name, doc_ids))
+
+    def get_docs(self, schema_name, primary_key, shard_size=None, max_workers=BULK_MAX_IN_FLIGHT):
         """Get documents from glitter by doc ids.
 
+        With ``shard_size`` set, duplicated ids are dropped and the ids are split
+        into shards of at most ``shard_size`` ids, fetched in parallel from the
+        configured nodes and merged back in input order.
+
         Args:
             schema_name(str): the name of schema.
             primary_key(list): main key of documents,must be uniq.
+            shard_size(int): maximal number of ids per request, ``None`` sends
+                all ids in a single request.
+            max_workers(int): maximal number of shards fetched concurrently.
 
         Returns:
-            :obj:`dic`: result with the document struct.
+            :obj:`dic`: result with the document struct. If a shard fails, the
+            reply of the failing shard is returned instead.
+        """
+        if shard_size is None or len(primary_key) <= shard_size:
+            return self._get_docs(schema_name, primary_key)
+        doc_ids = _unique(primary_key)
+        return _merge_docs(doc_ids, (res for _, res in self._fetch_shards(
+            schema_name, doc_ids, shard_size, max_workers)))
+
+    def iter_docs(self, schema_name, primary_key, shard_size=100, max_workers=BULK_MAX_IN_FLIGHT):
+        """Streaming version of :meth:`get_docs`.
+
+        Args:
+            schema_name(str): the name of schema.
+            primary_key(list): main key of documents.
+            shard_size(int): maximal number of ids per request.
+            max_workers(int): maximal number of shards fetched concurrently.
+
+        Yields:
+            (doc_id, document) pairs as soon as their shard is fetched. Ids
+            that do not exist are skipped.
+
+        Raises:
+            :exc:`~.exceptions.ResponseError`: if a shard fails.
         """
+        for shard, response in self._fetch_shards(schema_name, _unique(primary_key), shard_size, max_workers):
+            yield from _shard_hits(shard, response)
+
+    def _get_docs(self, schema_name, doc_ids):
         path = '/get_docs'
         return self.transport.forward_request(
             method='POST',
             path=self.api_prefix + path,
-            json={"schema_name": schema_name, "doc_ids": primary_key},
+            json={"schema_name": schema_name, "doc_ids": doc_ids},
+            idempotent=True,
         )
 
+    def _fetch_shards(self, schema_name, doc_ids, shard_size, max_workers):
+        with _Executor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._get_docs, schema_name, shard): shard
+                       for shard in chunked(doc_ids, shard_size)}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
     def search(self, index, query_word, query_field, filters=[], aggs_field=[], order_by="", limit=10, page=1):
         """ search from glitter,with more args.
 
@@ -242,10 +448,247 @@ class DataBase(NamespacedDriver):
             path=self.api_prefix + path,
             json={"index": index, "query": query_word, "filters": filters, "query_field": query_field,
                   "aggs_field": aggs_field, "order_by": order_by, "limit": limit, "page": page},
+            idempotent=True,
         )
 
+    def search_iter(self, index, query_word, query_field, filters=[], aggs_field=[], order_by="", page_size=10,
+                    prefetch=True):
+        """ Iterate over all the search hits, page after page.
+
+        While the hits of a page are consumed, the next page is already requested in the background,
+        so at most two pages are held in memory.
+
+        Args:
+            index(str): index name.
+            query_word(str): query word, only applies to  query_field.
+            query_field(:obj: `list` of str): query field must be indexed in schema.
+            filters(:obj:`list` of :obj:`dic`): filter condition.
+            aggs_field(:obj: `list` of str): aggregate field ,which is define in schema
+            order_by(str): order field
+            page_size(int): number of hits per request.
+            prefetch(bool): request the next page while the current one is consumed.
+
+        Yields:
+            :obj:`dic`: the hits (``items``) of every page, in order.
+
+        Raises:
+            :exc:`~.exceptions.ResponseError`: if a page fails.
+        """
+        def fetch(page):
+            return self.search(index, query_word, query_field, filters=filters, aggs_field=aggs_field,
+                               order_by=order_by, limit=page_size, page=page)
+
+        with _Executor(max_workers=1) as executor:
+            page, seen = 1, 0
+            future = executor.submit(fetch, page)
+            try:
+                while future is not None:
+                    items, more = _search_page(future.result(), page, page_size, seen)
+                    seen += len(items)
+                    page += 1
+                    future = executor.submit(fetch, page) if more and prefetch else None
+                    yield from items
+                    if more and future is None:
+                        future = executor.submit(fetch, page)
+            finally:
+                if future is not None:
+                    future.cancel()
+
+
+class _Executor(ThreadPoolExecutor):
+    """Thread pool running each call in a copy of the context of the caller, so that the current
+    :class:`~deadline.Deadline` also bounds the requests sent from the pool."""
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _is_ok(response):
+    return isinstance(response, dict) and response.get('code') == 0
+
+
+def _search_page(response, page, page_size, seen):
+    """Returns the hits of a search reply and whether more pages follow."""
+    if not _is_ok(response):
+        raise ResponseError(response)
+    data = response.get('data') or {}
+    items = data.get('items') or []
+    meta = (data.get('meta') or {}).get('page') or {}
+    more = len(items) >= page_size
+    if meta.get('total_pages') is not None:
+        more = more and page < meta['total_pages']
+    if meta.get('total_results') is not None:
+        more = more and seen + len(items) < meta['total_results']
+    return items, more
+
+
+def _drain(results, pending):
+    """Yields the :class:`DocResult` reported by the chunk workers until one
+    of the ``pending`` chunks is done. A done chunk puts its future in
+    ``results`` after its last result."""
+    while True:
+        item = results.get()
+        if not isinstance(item, Future):
+            yield item
+            continue
+        pending.discard(item)
+        if not item.cancelled():
+            item.result()  # raises the unexpected errors of the worker
+        return
+
+
+def _doc_result(index, doc, response):
+    tx = response.get('tx') if _is_ok(response) else None
+    return DocResult(index, doc, tx, response, None)
+
+
+def _unique(doc_ids):
+    return list(dict.fromkeys(doc_ids))
+
+
+def _shard_hits(shard, response):
+    if not _is_ok(response):
+        raise ResponseError(response)
+    hits = (response.get('data') or {}).get('hits') or {}
+    return [(doc_id, hits[doc_id]) for doc_id in shard if doc_id in hits]
+
+
+def _merge_docs(doc_ids, responses):
+    hits = {}
+    for response in responses:
+        if not _is_ok(response):
+            return response
+        hits.update((response.get('data') or {}).get('hits') or {})
+    hits = {doc_id: hits[doc_id] for doc_id in doc_ids if doc_id in hits}
+    return {"code": 0, "message": "ok", "data": {"total": len(hits), "hits": hits}}
+
+
+def _split_docs(doc_ids, response):
+    """Splits a ``get_docs`` reply into one reply per id."""
+    return {doc_id: _merge_docs([doc_id], [response]) for doc_id in doc_ids}
+
+
+def _is_rpc_ok(response):
+    return isinstance(response, dict) and response.get('error') is None \
+        and bool(response.get('result'))
+
+
+def _block_height(response):
+    try:
+        return int(response['result']['block']['header']['height'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _last_height(response):
+    try:
+        return int(response['result']['last_height'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _rpc_page(response, items_key):
+    """Returns the items and the total count of a JSON-RPC search reply."""
+    if not _is_rpc_ok(response):
+        raise ResponseError(response)
+    result = response['result']
+    return result.get(items_key) or [], int(result.get('total_count') or 0)
+
+
+def _page_count(total, per_page):
+    return (total + per_page - 1) // per_page
+
+
+def _map_window(fn, args, max_workers, ordered=True):
+    """Calls ``fn`` on each of ``args`` from a thread pool and yields the results.
+
+    At most ``2 * max_workers`` calls are in flight or buffered at once, so ``args`` may be endless.
+    """
+    args = iter(args)
+    with _Executor(max_workers=max_workers) as executor:
+        window = deque(executor.submit(fn, arg) for arg in islice(args, 2 * max_workers))
+        try:
+            while window:
+                if ordered:
+                    future = window.popleft()
+                else:
+                    done, _ = wait(window, return_when=FIRST_COMPLETED)
+                    future = done.pop()
+                    window.remove(future)
+                result = future.result()
+                for arg in islice(args, 1):
+                    window.append(executor.submit(fn, arg))
+                yield result
+        finally:
+            for future in window:
+                future.cancel()
+
+
+def _paginate(fetch, items_key, per_page, max_workers, ordered):
+    items, total = _rpc_page(fetch(1), items_key)
+    yield from items
+    pages = range(2, _page_count(total, per_page) + 1)
+    for response in _map_window(fetch, pages, max_workers, ordered):
+        items, _ = _rpc_page(response, items_key)
+        yield from items
+
+
+def _scan_windows(min_height, max_height, size):
+    for low in range(min_height, max_height + 1, size):
+        yield low, min(low + size - 1, max_height)
+
+
+def _scan_headers(response, low, high):
+    if not _is_rpc_ok(response):
+        raise ResponseError(response)
+    metas = response['result'].get('block_metas') or []
+    metas = [meta for meta in metas if low <= int(meta['header']['height']) <= high]
+    return sorted(metas, key=lambda meta: int(meta['header']['height']))
+
+
+def _scan_block(response):
+    if not _is_rpc_ok(response):
+        raise ResponseError(response)
+    return response['result']
+
+
+class _ScanCursor:
+    """Checkpoint and progress bookkeeping shared by the sync and async scans."""
+
+    def __init__(self, checkpoint, on_progress):
+        self.checkpoint = checkpoint
+        self.on_progress = on_progress
+        self.blocks = 0
+        self.started = monotonic()
+
+    def start(self, min_height):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return min_height
+        with open(self.checkpoint) as f:
+            return max(min_height, int(f.read().strip() or 0) + 1)
+
+    def advance(self, height, blocks):
+        if self.checkpoint is not None:
+            tmp = self.checkpoint + '.tmp'
+            with open(tmp, 'w') as f:
+                f.write(str(height))
+            os.replace(tmp, self.checkpoint)
+        self.blocks += blocks
+        if self.on_progress is not None:
+            elapsed = monotonic() - self.started
+            rate = self.blocks / elapsed if elapsed > 0 else 0.0
+            self.on_progress(ScanProgress(height, self.blocks, elapsed, rate))
+
 
 class Chain(NamespacedDriver):
+    """Exposes the chain endpoints.
+
+    With a :class:`~block_store.BlockStore` configured on the client, the
+    immutable replies of :meth:`block`, :meth:`header`, :meth:`header_by_hash`
+    and :meth:`blockchain` are served from the store once fetched, for heights
+    at or below the last committed height.
+    """
+
     PATH = '/chain/'
 
     def status(self):
@@ -307,6 +750,102 @@ class Chain(NamespacedDriver):
             params={'query': query, 'page': page, 'per_page': per_page, 'order_by': order_by},
         )
 
+    def tx_search_all(self, query, per_page=100, order_by="asc", prove=False, max_workers=BULK_MAX_IN_FLIGHT,
+                      ordered=True):
+        """ Iterate over all the transactions matching a query.
+
+        The first page tells the ``total_count``, the remaining pages are then fetched concurrently.
+        Sorting ascending keeps the pages stable while new transactions are committed.
+
+        Args:
+            query(str): query words. (e.g: ``tx.height=1000, tx.hash='xxx', update_doc.token='test_token'``)
+            per_page(int): number of entries per page (max: ``100``).
+            order_by(str): Order in which transactions are sorted (``asc`` or ``desc``). Defaults to ``asc``.
+            prove(bool): Include proofs of the transactions inclusion in the block. Defaults to ``False``,
+                which keeps the replies small.
+            max_workers(int): maximal number of pages fetched concurrently.
+            ordered(bool): yield the transactions in order. Otherwise pages are yielded as soon as they
+                arrive, which is faster when some pages are slow.
+
+        Yields:
+            :obj:`json`: transaction info.
+
+        Raises:
+            :exc:`~.exceptions.ResponseError`: if a page fails.
+        """
+        def fetch(page):
+            return self.tx_search(query, page=page, per_page=per_page, order_by=order_by, prove=prove)
+
+        return _paginate(fetch, 'txs', per_page, max_workers, ordered)
+
+    def block_search_all(self, query, per_page=100, order_by="asc", max_workers=BULK_MAX_IN_FLIGHT, ordered=True):
+        """ Iterate over all the blocks matching a query.
+
+        See :meth:`tx_search_all` for the way pages are fetched.
+
+        Args:
+            query(str): query condition. (e.g: ``block.height > 1000 AND valset.changed > 0``)
+            per_page(int): number of entries per page (max: 100)
+            order_by(str): order in which blocks are sorted ("asc" or "desc"), by height. Defaults to ``asc``.
+            max_workers(int): maximal number of pages fetched concurrently.
+            ordered(bool): yield the blocks in order.
+
+        Yields:
+            :obj:`json`: block info.
+
+        Raises:
+            :exc:`~.exceptions.ResponseError`: if a page fails.
+        """
+        def fetch(page):
+            return self.block_search(query, page=page, per_page=per_page, order_by=order_by)
+
+        return _paginate(fetch, 'blocks', per_page, max_workers, ordered)
+
+    def scan(self, min_height=1, max_height=None, window=BLOCKCHAIN_MAX_HEADERS, headers_only=False,
+             max_workers=BULK_MAX_IN_FLIGHT, checkpoint=None, on_progress=None):
+        """ Iterate over the blocks of a height range, in ascending height order.
+
+        The range is split in windows of ``window`` heights which are fetched concurrently, each request
+        going to the next node of the pool. Windows are yielded in order, at most ``2 * max_workers`` of
+        them are fetched ahead of the consumer.
+
+        Args:
+            min_height(int): first height to scan.
+            max_height(int): last height to scan. Defaults to the latest height of the chain.
+            window(int): number of heights per window. Capped at ``20`` with ``headers_only``.
+            headers_only(bool): yield the block metas of :meth:`blockchain` (block id and header) instead
+                of the full blocks of :meth:`block`, one request per window instead of one per height.
+            max_workers(int): maximal number of windows fetched concurrently.
+            checkpoint(str): path of a file holding the last height consumed. The scan resumes after it,
+                and it is updated once every block of a window has been consumed.
+            on_progress(callable): called with a :class:`ScanProgress` after each window.
+
+        Yields:
+            :obj:`json`: the ``result`` of :meth:`block`, or a block meta with ``headers_only``.
+
+        Raises:
+            :exc:`~.exceptions.ResponseError`: if a request fails.
+        """
+        cursor = _ScanCursor(checkpoint, on_progress)
+        min_height = cursor.start(min_height)
+        if max_height is None:
+            status = self.status()
+            max_height = latest_block_height(status)
+            if max_height is None:
+                raise ResponseError(status)
+        if headers_only:
+            window = min(window, BLOCKCHAIN_MAX_HEADERS)
+
+        def fetch(bounds):
+            low, high = bounds
+            if headers_only:
+                return high, _scan_headers(self.blockchain(low, high), low, high)
+            return high, [_scan_block(self.block(height)) for height in range(low, high + 1)]
+
+        for high, blocks in _map_window(fetch, _scan_windows(min_height, max_height, window), max_workers):
+            yield from blocks
+            cursor.advance(high, len(blocks))
+
     def block(self, height=None):
         """ Get block at a specified height
 
@@ -317,6 +856,9 @@ class Chain(NamespacedDriver):
             :obj:`json`:height to return. If no height is provided, it will fetch the latest block.
 
         """
+        return self._stored('block', height) or self._store_block(self._block(height))
+
+    def _block(self, height):
         path = "/chain/block"
         params = {}
         if height is not None:
@@ -365,6 +907,11 @@ class Chain(NamespacedDriver):
             Block headers, returned in descending order (highest first).
         """
 
+        key = '{}-{}'.format(min_height, max_height)
+        return self._stored('blockchain', key) or \
+            self._store_blockchain(key, max_height, self._blockchain(min_height, max_height))
+
+    def _blockchain(self, min_height, max_height):
         path = "/chain/blockchain"
         return self.transport.forward_request(
             method='GET',
@@ -382,6 +929,9 @@ class Chain(NamespacedDriver):
             Header information.
 
         """
+        return self._stored('header', height) or self._store('header', height, self._header(height))
+
+    def _header(self, height):
         path = "/chain/header"
         return self.transport.forward_request(
             method='GET',
@@ -396,6 +946,10 @@ class Chain(NamespacedDriver):
             header_hash(str): header hash
         Returns:
         """
+        return self._stored('header_by_hash', header_hash) or \
+            self._store('header_by_hash', header_hash, self._header_by_hash(header_hash))
+
+    def _header_by_hash(self, header_hash):
         path = "/chain/header_by_hash"
         return self.transport.forward_request(
             method='GET',
@@ -403,6 +957,34 @@ class Chain(NamespacedDriver):
             params={"hash": header_hash},
         )
 
+    @property
+    def block_store(self):
+        return self.driver.block_store
+
+    def _stored(self, kind, key):
+        if self.block_store is None or key is None:
+            return None
+        return self.block_store.get(kind, key)
+
+    def _store(self, kind, key, response):
+        if self.block_store is not None and _is_rpc_ok(response):
+            self.block_store.put(kind, key, response)
+        return response
+
+    def _store_block(self, response):
+        if self.block_store is not None and _is_rpc_ok(response):
+            height = _block_height(response)
+            self.block_store.update_height(height)
+            self._store('block', height, response)
+        return response
+
+    def _store_blockchain(self, key, max_height, response):
+        if self.block_store is not None and _is_rpc_ok(response):
+            self.block_store.update_height(_last_height(response))
+            if max_height <= self.block_store.last_height:
+                self._store('blockchain', key, response)
+        return response
+
     def block_by_hash(self, *, header_hash):
         """ Get block by hash
 
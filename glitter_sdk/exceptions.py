@@ -36,6 +36,17 @@ class TimeoutError(GlitterClientException):
         return self.args[0]
 
 
+class ResponseError(GlitterClientException):
+    """Raised if a node answers with a non-zero ``code`` where the driver
+    cannot hand the reply back as is (e.g.: while streaming results).
+    """
+
+    @property
+    def response(self):
+        """Returns the reply of the node."""
+        return self.args[0]
+
+
 class TransportError(GlitterClientException):
     """Base exception for transport related errors.
 
@@ -60,6 +71,11 @@ class TransportError(GlitterClientException):
     def url(self):
         return self.args[3]
 
+    @property
+    def headers(self):
+        """Returns the headers of the reply, if any."""
+        return self.args[4] if len(self.args) > 4 else None
+
 
 class ConnectionError(TransportError):
     """Exception for errors occurring when connecting, and/or making a request
@@ -76,6 +92,10 @@ class NotFoundError(TransportError):
     """Exception for HTTP 404 errors."""
 
 
+class TooManyRequests(TransportError):
+    """Exception for HTTP 429 errors."""
+
+
 class ServiceUnavailable(TransportError):
     """Exception for HTTP 503 errors."""
 
@@ -87,6 +107,7 @@ class GatewayTimeout(TransportError):
 HTTP_EXCEPTIONS = {
     400: BadRequest,
     404: NotFoundError,
+    429: TooManyRequests,
     503: ServiceUnavailable,
     504: GatewayTimeout,
 }
@@ -0,0 +1,241 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Node health tracking: a circuit breaker per connection, and background
+checkers probing the nodes to open or close the breakers before user
+requests hit a failing or lagging node.
+"""
+
+import asyncio
+import sys
+import threading
+from collections import namedtuple
+from time import monotonic
+
+from .exceptions import TransportError
+from .utils import latest_block_height
+
+
+BREAKER_FAILURE_THRESHOLD = 5  # consecutive failures
+BREAKER_RECOVERY_TIME = 10  # seconds
+HEALTH_CHECK_INTERVAL = 5  # seconds
+HEALTH_CHECK_TIMEOUT = 2  # seconds
+HEALTH_MAX_LAG = 10  # blocks
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+NodeHealth = namedtuple('NodeHealth',
+                        ('latency', 'height', 'lag', 'error', 'checked_at'))
+
+
+def is_node_failure(error):
+    """Tells whether ``error`` denotes an unhealthy node: the node could not
+    be reached, did not answer in time or answered with a 5xx status. A
+    request the node rightfully rejected (4xx), or a bug of the caller,
+    e.g. a body that cannot be encoded, is not.
+    """
+    if error is None:
+        return False
+    if isinstance(error, TransportError):
+        status_code = error.status_code if error.args else None
+        return not isinstance(status_code, int) or status_code >= 500
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    # requests and aiohttp are only imported by the clients using them, and
+    # their errors can only be raised once they are.
+    requests = sys.modules.get('requests.exceptions')
+    if requests is not None and isinstance(
+            error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    aiohttp = sys.modules.get('aiohttp')
+    return aiohttp is not None and isinstance(error, aiohttp.ClientError)
+
+
+class CircuitBreaker:
+    """Circuit breaker of a single node.
+
+    The breaker is ``closed`` while the node works. After
+    ``failure_threshold`` consecutive failures, or when :meth:`trip` is
+    called, it opens and the pool stops routing requests to the node. Once
+    ``recovery_time`` seconds have passed it is ``half-open``: requests are
+    let through again, the first success closes it and a failure opens it
+    for another ``recovery_time``.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 recovery_time=BREAKER_RECOVERY_TIME):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self.get_state()
+
+    def get_state(self, now=None):
+        opened_at = self._opened_at
+        if opened_at is None:
+            return CLOSED
+        now = monotonic() if now is None else now
+        return HALF_OPEN if now - opened_at >= self.recovery_time else OPEN
+
+    def available(self, now=None):
+        """Tells whether requests may be sent to the node."""
+        return self.get_state(now) != OPEN
+
+    def record(self, success):
+        """Records the outcome of a request sent to the node."""
+        with self._lock:
+            if success:
+                self.failures = 0
+                self._opened_at = None
+                return
+            self.failures += 1
+            if self._opened_at is not None \
+                    or self.failures >= self.failure_threshold:
+                self._opened_at = monotonic()
+
+    def trip(self):
+        """Opens the breaker regardless of the failure count."""
+        with self._lock:
+            self._opened_at = monotonic()
+
+
+class HealthChecker:
+    """Probes every node of a :class:`~driver.GlitterClient` in a background
+    thread.
+
+    Each round calls the ``/chain/status`` endpoint of each node, records
+    the latency and the block height and feeds the circuit breaker of the
+    node: failures count like failed user requests, and nodes more than
+    ``max_lag`` blocks behind the highest node are ejected.
+
+    Args:
+        client (GlitterClient): client whose nodes are probed.
+        interval (float): seconds between two rounds.
+        timeout (float): timeout in seconds of each probe.
+        max_lag (int): number of blocks a node may lag behind.
+    """
+
+    def __init__(self, client, interval=HEALTH_CHECK_INTERVAL,
+                 timeout=HEALTH_CHECK_TIMEOUT, max_lag=HEALTH_MAX_LAG):
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.max_lag = max_lag
+        self.status = {}
+        self._stop = threading.Event()
+        self._runner = None
+
+    @property
+    def connections(self):
+        return self.client.transport.connection_pool.connections
+
+    @property
+    def path(self):
+        return self.client.api_prefix + '/chain/status'
+
+    def start(self):
+        """Starts probing in a daemon thread."""
+        self._stop.clear()
+        self._runner = threading.Thread(target=self._run, daemon=True,
+                                        name='glitter-health')
+        self._runner.start()
+        return self
+
+    def stop(self):
+        """Stops probing."""
+        self._stop.set()
+        if self._runner is not None:
+            self._runner.join()
+            self._runner = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def check(self):
+        """Runs one round of probes and returns the health of each node,
+        keyed by node url."""
+        probes = {}
+        for connection in self.connections:
+            probes[connection] = self._probe(connection)
+        return self._update(probes)
+
+    def _probe(self, connection):
+        start = monotonic()
+        try:
+            response = connection.request(method='GET', path=self.path,
+                                          timeout=self.timeout,
+                                          record_health=False)
+        except Exception as err:
+            return err, None, None
+        return None, monotonic() - start, latest_block_height(response.data)
+
+    def _update(self, probes):
+        best = max((height for _, _, height in probes.values()
+                    if height is not None), default=None)
+        now = monotonic()
+        for connection, (error, latency, height) in probes.items():
+            lag = None
+            if height is not None and best is not None:
+                lag = best - height
+            # A successful probe only closes the breaker of a node that
+            # does not lag.
+            if lag is not None and lag > self.max_lag:
+                connection.breaker.trip()
+            else:
+                connection.breaker.record(success=not is_node_failure(error))
+            self.status[connection.node_url] = NodeHealth(
+                latency, height, lag, error, now)
+        return dict(self.status)
+
+
+class AsyncHealthChecker(HealthChecker):
+    """asyncio version of :class:`HealthChecker`, probing the nodes of an
+    :class:`~async_driver.AsyncGlitterClient` from a task of the running
+    event loop.
+    """
+
+    def start(self):
+        """Starts probing in a task of the running event loop."""
+        self._stop.clear()
+        self._runner = asyncio.ensure_future(self._run())
+        return self
+
+    async def stop(self):
+        """Stops probing."""
+        self._stop.set()
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _run(self):
+        while not self._stop.is_set():
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    async def check(self):
+        probes = await asyncio.gather(
+            *(self._probe(conn) for conn in self.connections))
+        return self._update(dict(zip(self.connections, probes)))
+
+    async def _probe(self, connection):
+        start = monotonic()
+        try:
+            response = await connection.request(
+                method='GET', path=self.path, timeout=self.timeout,
+                record_health=False)
+        except Exception as err:
+            return err, None, None
+        return None, monotonic() - start, latest_block_height(response.data)
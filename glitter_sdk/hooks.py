@@ -0,0 +1,148 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Callbacks around the requests sent by the transport.
+
+Each :meth:`~glitter_sdk.transport.Transport.forward_request` is a logical
+:class:`Call` with a unique ``call_id``. It is sent in one or more attempts
+(retries after a connection error, hedged reads), and every attempt is
+reported to the hooks with the id of its call::
+
+    class Tracer(RequestHooks):
+        def after_response(self, call, attempt):
+            print(call.call_id, call.path, attempt.node, attempt.elapsed)
+
+    client = GlitterClient(url, hooks=[Tracer(), SlowCallSampler(0.5)])
+
+Exceptions raised by a hook are logged and otherwise ignored.
+"""
+
+import logging
+import threading
+from collections import deque, namedtuple
+from time import monotonic
+from uuid import uuid4
+
+from .metrics import status_label
+
+
+logger = logging.getLogger(__name__)
+
+SLOW_CALL_THRESHOLD = 1  # seconds
+SLOW_CALL_SAMPLES = 100
+
+Attempt = namedtuple('Attempt', ('node', 'number', 'elapsed', 'status',
+                                 'error', 'request_size', 'response_size'))
+Attempt.__doc__ = """Outcome of one attempt of a :class:`Call`.
+
+``number`` counts the attempts of the call from 1, ``status`` is the HTTP
+status code, ``timeout``, ``error`` or ``cancelled`` (the losing attempt of
+a hedged read), the sizes are `None` when the node did not answer.
+"""
+
+SlowCall = namedtuple('SlowCall', ('call_id', 'method', 'path', 'node',
+                                   'elapsed', 'status', 'request_size',
+                                   'response_size'))
+
+
+class Call:
+    """A logical request, from the call of ``forward_request`` to its
+    outcome, across all its attempts."""
+
+    __slots__ = ('call_id', 'method', 'path', 'params', 'started',
+                 'attempts', '_lock')
+
+    def __init__(self, method, path, params=None):
+        self.call_id = uuid4().hex
+        self.method = method
+        self.path = path
+        self.params = params
+        self.started = monotonic()
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def next_attempt(self):
+        with self._lock:
+            self.attempts += 1
+            return self.attempts
+
+    def __repr__(self):
+        return '<Call {} {} {}>'.format(self.call_id, self.method, self.path)
+
+
+class RequestHooks:
+    """Base class of request hooks, every callback does nothing by default.
+    """
+
+    def before_send(self, call, node):
+        """Called before an attempt of ``call`` is sent to ``node``."""
+
+    def after_response(self, call, attempt):
+        """Called with the :class:`Attempt` once an attempt is answered or
+        failed."""
+
+    def on_retry(self, call, error):
+        """Called when an attempt failed with a connection error or ran out
+        of time and the call is going to be retried."""
+
+    def on_node_switch(self, call, previous, node):
+        """Called when the next attempt of ``call`` goes to another node than
+        the previous one (retry or hedged read)."""
+
+
+class SlowCallSampler(RequestHooks):
+    """Keeps the attempts that took longer than ``threshold`` seconds.
+
+    Args:
+        threshold (float): latency in seconds above which an attempt is kept.
+        maxlen (int): number of samples kept, the oldest are dropped first.
+        callback: optional callable receiving each :class:`SlowCall`.
+    """
+
+    def __init__(self, threshold=SLOW_CALL_THRESHOLD, maxlen=SLOW_CALL_SAMPLES,
+                 callback=None):
+        self.threshold = threshold
+        self.samples = deque(maxlen=maxlen)
+        self.callback = callback
+
+    def after_response(self, call, attempt):
+        if attempt.elapsed < self.threshold:
+            return
+        sample = SlowCall(call.call_id, call.method, call.path, attempt.node,
+                          attempt.elapsed, attempt.status,
+                          attempt.request_size, attempt.response_size)
+        self.samples.append(sample)
+        if self.callback is not None:
+            self.callback(sample)
+
+
+class HookSet:
+    """Dispatches the events of the transport to a list of hooks."""
+
+    def __init__(self, hooks):
+        if isinstance(hooks, RequestHooks):
+            hooks = [hooks]
+        self.hooks = tuple(hooks)
+
+    def new_call(self, method, path, params=None):
+        return Call(method, path, params)
+
+    def emit(self, event, *args):
+        for hook in self.hooks:
+            callback = getattr(hook, event, None)
+            if callback is None:
+                continue
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception('%s hook of %r failed', event, hook)
+
+
+def attempt_result(node, number, elapsed, response=None, error=None):
+    """Builds the :class:`Attempt` of a connection request."""
+    if response is None:
+        return Attempt(node, number, elapsed, status_label(error=error),
+                       error, None, None)
+    return Attempt(node, number, elapsed, status_label(response), None,
+                   response.request_size, response.response_size)
@@ -0,0 +1,206 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Client-side rate and concurrency limits of each node.
+
+Both are disabled unless configured on the client, and then apply to every
+thread (or task) sharing it::
+
+    client = GlitterClient(*urls, rate_limit=200, concurrency_limit=16)
+
+- ``rate_limit``: a :class:`TokenBucket` per node lets at most
+  ``rate_limit`` requests per second through, with bursts of
+  ``rate_burst``. Requests over the rate wait for their turn.
+- ``concurrency_limit``: a :class:`ConcurrencyLimiter` per node caps the
+  requests in flight. The cap adapts to the node (AIMD): it is multiplied by
+  ``backoff_ratio`` when a request fails with a connection error, a timeout,
+  a 5xx or a 429 answer, or takes ``latency_tolerance`` times longer than
+  the recent average while the node is busy (half the cap in flight), and
+  grows by one every ``limit`` successful requests while the node is busy.
+  Requests over the cap wait for a slot, while the pool routes new requests
+  to the nodes that have one.
+
+Requests that cannot get through within the time left to their call raise
+:exc:`~glitter_sdk.exceptions.TimeoutError`.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from time import monotonic
+
+from .exceptions import TimeoutError, TransportError
+from .health import is_node_failure
+
+
+LIMIT_MIN = 1
+LIMIT_MAX = 256
+LIMIT_BACKOFF_RATIO = 0.7
+LIMIT_LATENCY_TOLERANCE = 2.0
+LIMIT_LATENCY_WEIGHT = 0.05  # weight of the newest sample in the average
+
+
+def is_overload(error):
+    """Tells whether ``error`` shows that a node is overloaded."""
+    if is_node_failure(error):
+        return True
+    return isinstance(error, TransportError) and bool(error.args) \
+        and error.status_code == 429
+
+
+class TokenBucket:
+    """Lets ``rate`` requests per second through, with bursts of ``burst``
+    requests (``rate`` by default, and at least one)."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.tokens = float(self.burst)
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """Takes a token and returns the seconds to wait before using it.
+
+        Returns `None`, without taking the token, when the wait would be
+        longer than ``max_wait``.
+        """
+        with self._lock:
+            now = monotonic()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+
+class ConcurrencyLimiter:
+    """Adaptive (AIMD) cap on the requests in flight to a node, for threads.
+
+    Args:
+        limit (int): Initial cap.
+        min_limit (int): Lowest cap.
+        max_limit (int): Highest cap.
+        backoff_ratio (float): Factor applied to the cap when the node is
+            overloaded.
+        latency_tolerance (float): Latency, relative to the recent average,
+            above which a successful request counts as an overload signal.
+            `None` to only react to errors.
+    """
+
+    def __init__(self, limit, min_limit=LIMIT_MIN, max_limit=LIMIT_MAX,
+                 backoff_ratio=LIMIT_BACKOFF_RATIO,
+                 latency_tolerance=LIMIT_LATENCY_TOLERANCE):
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.latency = None
+        self._started = 0  # requests admitted so far
+        self._last_decrease = 0  # value of _started at the last decrease
+        self._cond = threading.Condition()
+
+    def _has_room(self):
+        return self.in_flight < int(self.limit)
+
+    def _admit(self):
+        self.in_flight += 1
+        self._started += 1
+        return self._started
+
+    def available(self):
+        """Tells whether a slot is free."""
+        return self._has_room()
+
+    def try_acquire(self):
+        """Takes a slot if one is free, returns its token or `None`."""
+        with self._cond:
+            return self._admit() if self._has_room() else None
+
+    def acquire(self, timeout=None):
+        """Waits for a slot and returns its token, to give back to
+        :meth:`release`.
+
+        Raises:
+            TimeoutError: if no slot was free within ``timeout`` seconds.
+        """
+        with self._cond:
+            if not self._cond.wait_for(self._has_room, timeout):
+                raise TimeoutError([])
+            return self._admit()
+
+    def release(self, token, latency=None, error=None):
+        """Gives a slot back and adapts the cap to the outcome of its
+        request."""
+        with self._cond:
+            busy = self.in_flight >= self.limit / 2
+            self.in_flight -= 1
+            if is_overload(error) or busy and self._is_slow(latency, error):
+                # Requests sent before the last decrease already paid for
+                # the congestion they saw.
+                if token > self._last_decrease:
+                    self.limit = max(self.min_limit,
+                                     self.limit * self.backoff_ratio)
+                    self._last_decrease = self._started
+            elif error is None and latency is not None and busy:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if error is None and latency is not None:
+                self._update_latency(latency)
+            self._notify()
+
+    def _update_latency(self, latency):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LIMIT_LATENCY_WEIGHT * (latency - self.latency)
+
+    def _is_slow(self, latency, error):
+        return error is None and latency is not None \
+            and self.latency_tolerance is not None \
+            and self.latency is not None \
+            and latency > self.latency * self.latency_tolerance
+
+    def _notify(self):
+        self._cond.notify_all()
+
+
+class AsyncConcurrencyLimiter(ConcurrencyLimiter):
+    """asyncio version of :class:`ConcurrencyLimiter`, :meth:`acquire`
+    waits without blocking the event loop."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiters = deque()
+
+    async def acquire(self, timeout=None):
+        expires = None if timeout is None else monotonic() + timeout
+        while True:
+            token = self.try_acquire()
+            if token is not None:
+                return token
+            remaining = None if expires is None else expires - monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError([])
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                raise TimeoutError([]) from None
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def _notify(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
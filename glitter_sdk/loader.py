@@ -0,0 +1,165 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Micro-batching of single key reads (the "DataLoader" pattern).
+
+Keys requested within ``window`` seconds of each other, for the same group
+(e.g. the same schema), are fetched by a single call of ``batch_fn`` and the
+result of each key is handed back to its caller.
+"""
+
+import asyncio
+from concurrent.futures import Future
+from threading import Lock, Timer
+
+
+BATCH_WINDOW = 0.002  # seconds
+BATCH_SIZE = 100  # keys
+
+
+class _Batch:
+
+    def __init__(self, group):
+        self.group = group
+        self.waiters = {}  # key -> futures of the callers
+        self.timer = None
+
+    def __len__(self):
+        return len(self.waiters)
+
+    def add(self, key, future):
+        self.waiters.setdefault(key, []).append(future)
+
+    def resolve(self, results):
+        for key, futures in self.waiters.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(key))
+
+    def fail(self, error):
+        for futures in self.waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+
+
+class BatchLoader:
+    """Collects single key reads from any number of threads and fetches
+    them in batches.
+
+    A batch is sent ``window`` seconds after its first key was requested, or
+    as soon as it holds ``max_batch`` distinct keys.
+
+    Args:
+        batch_fn: ``batch_fn(group, keys)`` fetches a list of distinct keys
+            and returns a dict mapping each key to its result.
+        window (float): seconds to wait for more keys before sending a batch.
+        max_batch (int): maximal number of distinct keys per batch.
+    """
+
+    def __init__(self, batch_fn, window=BATCH_WINDOW, max_batch=BATCH_SIZE):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self.loads = 0
+        self.batches = 0
+        self._pending = {}  # group -> batch being filled
+        self._lock = Lock()
+
+    def load(self, group, key):
+        """Returns the result of ``key``, fetched along with the other keys
+        of its batch."""
+        return self.submit(group, key).result()
+
+    def submit(self, group, key):
+        """Adds ``key`` to the pending batch of ``group``.
+
+        Returns:
+            :class:`concurrent.futures.Future`: the future result of ``key``.
+        """
+        future = Future()
+        with self._lock:
+            self.loads += 1
+            batch = self._pending.get(group)
+            first = batch is None
+            if first:
+                batch = self._pending[group] = _Batch(group)
+            batch.add(key, future)
+            full = len(batch) >= self.max_batch
+            if full:
+                del self._pending[group]
+                self.batches += 1
+        if full:
+            self._dispatch(batch)
+        elif first:
+            batch.timer = Timer(self.window, self._flush, (batch,))
+            batch.timer.daemon = True
+            batch.timer.start()
+        return future
+
+    def flush(self):
+        """Sends every pending batch right away."""
+        with self._lock:
+            batches = list(self._pending.values())
+        for batch in batches:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self._lock:
+            if self._pending.get(batch.group) is not batch:
+                return
+            del self._pending[batch.group]
+            self.batches += 1
+        self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        try:
+            results = self.batch_fn(batch.group, list(batch.waiters))
+        except Exception as err:
+            batch.fail(err)
+        else:
+            batch.resolve(results)
+
+
+class AsyncBatchLoader(BatchLoader):
+    """asyncio version of :class:`BatchLoader`, ``batch_fn`` returns an
+    awaitable and batches are sent from tasks of the running event loop.
+    """
+
+    async def load(self, group, key):
+        return await self.submit(group, key)
+
+    def submit(self, group, key):
+        """Adds ``key`` to the pending batch of ``group``.
+
+        Returns:
+            :class:`asyncio.Future`: the future result of ``key``.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.loads += 1
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = _Batch(group)
+            batch.timer = loop.call_later(self.window, self._flush, batch)
+        batch.add(key, future)
+        if len(batch) >= self.max_batch:
+            self._flush(batch)
+        return future
+
+    def _flush(self, batch):
+        if self._pending.get(batch.group) is not batch:
+            return
+        del self._pending[batch.group]
+        batch.timer.cancel()
+        self.batches += 1
+        asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            results = await self.batch_fn(batch.group, list(batch.waiters))
+        except Exception as err:
+            batch.fail(err)
+        else:
+            batch.resolve(results)
@@ -0,0 +1,214 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""In-process metrics of the requests sent to the nodes.
+
+Metrics are disabled unless a :class:`Metrics` registry is given to the
+client (``GlitterClient(url, metrics=Metrics())``), in which case the
+transport and the connections record:
+
+- ``glitter_requests_total{node, endpoint, method, status}``: attempts sent
+  to each node, ``status`` is the HTTP status code, ``timeout`` or
+  ``error`` (connection errors and the like).
+- ``glitter_request_duration_seconds{node, endpoint}``: latency histogram.
+- ``glitter_request_size_bytes{node, endpoint}`` and
+  ``glitter_response_size_bytes{node, endpoint}``: payload size histograms.
+- ``glitter_retries_total{node, endpoint}``: attempts retried on another
+  node after a connection error or an attempt timeout.
+- ``glitter_backoffs_total{node}``: times a node was put in backoff.
+- ``glitter_timeouts_total{endpoint}``: requests that ran out of time.
+
+:meth:`Metrics.to_prometheus` renders them in the Prometheus text format.
+"""
+
+import asyncio
+import sys
+from bisect import bisect_left
+from threading import Lock
+
+from .exceptions import TransportError
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_HELP = {
+    'glitter_requests_total': 'Requests sent to the nodes.',
+    'glitter_request_duration_seconds': 'Latency of the requests.',
+    'glitter_request_size_bytes': 'Size of the request bodies.',
+    'glitter_response_size_bytes': 'Size of the response bodies.',
+    'glitter_retries_total': 'Requests retried after a failed attempt.',
+    'glitter_backoffs_total': 'Times a node was put in backoff.',
+    'glitter_timeouts_total': 'Requests that ran out of time.',
+}
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds (``buckets``)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Returns the ``(upper bound, count)`` pairs, the last bound is
+        ``+Inf``."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+def status_label(response=None, error=None):
+    """Returns the ``status`` label of an attempt, ``'cancelled'`` when it
+    ended with neither a response nor an error (e.g. its task was
+    cancelled)."""
+    if error is None:
+        return 'cancelled' if response is None else str(response.status_code)
+    if isinstance(error, TransportError) and error.args \
+            and isinstance(error.status_code, int):
+        return str(error.status_code)
+    if _is_timeout(error):
+        return 'timeout'
+    return 'error'
+
+
+def _is_timeout(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    # requests is not imported by the asyncio client, and a timeout of
+    # requests can only be raised once it is.
+    exceptions = sys.modules.get('requests.exceptions')
+    return exceptions is not None and isinstance(error, exceptions.Timeout)
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms.
+
+    Args:
+        latency_buckets: upper bounds in seconds of the latency histograms.
+        size_buckets: upper bounds in bytes of the payload size histograms.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS,
+                 size_buckets=SIZE_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._lock = Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Adds ``value`` to a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets, **labels):
+        """Adds a sample to a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counter(self, name, **labels):
+        """Returns the value of a counter, summed over the labels that are
+        not given."""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for (key, key_labels), value
+                       in self._counters.items()
+                       if key == name and wanted <= set(key_labels))
+
+    def histogram(self, name, **labels):
+        """Returns the histogram with exactly these labels, or `None`."""
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def reset(self):
+        """Drops every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # Events recorded by the transport and the connections.
+
+    def record_request(self, node, endpoint, method, status, elapsed,
+                       request_size=None, response_size=None):
+        self.inc('glitter_requests_total', node=node, endpoint=endpoint,
+                 method=method, status=status)
+        self.observe('glitter_request_duration_seconds', elapsed,
+                     self.latency_buckets, node=node, endpoint=endpoint)
+        if request_size is not None:
+            self.observe('glitter_request_size_bytes', request_size,
+                         self.size_buckets, node=node, endpoint=endpoint)
+        if response_size is not None:
+            self.observe('glitter_response_size_bytes', response_size,
+                         self.size_buckets, node=node, endpoint=endpoint)
+
+    def record_retry(self, node, endpoint):
+        self.inc('glitter_retries_total', node=node, endpoint=endpoint)
+
+    def record_backoff(self, node):
+        self.inc('glitter_backoffs_total', node=node)
+
+    def record_timeout(self, endpoint):
+        self.inc('glitter_timeouts_total', endpoint=endpoint)
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, (h.cumulative(), h.sum, h.count))
+                 for key, h in self._histograms.items()),
+                key=lambda item: item[0])
+        lines = []
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                lines.extend(_header(name, 'counter'))
+                last = name
+            lines.append('{}{} {}'.format(name, _labels(labels), value))
+        for (name, labels), (buckets, total, count) in histograms:
+            if name != last:
+                lines.extend(_header(name, 'histogram'))
+                last = name
+            for bound, cumulative in buckets:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_bucket{} {}'.format(
+                    name, _labels(labels + (('le', le),)), cumulative))
+            lines.append('{}_sum{} {}'.format(name, _labels(labels), total))
+            lines.append('{}_count{} {}'.format(name, _labels(labels), count))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+def _header(name, kind):
+    help_text = _HELP.get(name)
+    if help_text:
+        yield '# HELP {} {}'.format(name, help_text)
+    yield '# TYPE {} {}'.format(name, kind)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(key, _escape(value))
+                          for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
@@ -3,7 +3,9 @@
 # Code is Apache-2.0 and docs are CC-BY-4.0
 
 from abc import ABCMeta, abstractmethod
-from datetime import datetime
+from itertools import count
+from random import Random
+from time import monotonic
 
 
 class AbstractPicker(metaclass=ABCMeta):
@@ -23,18 +25,67 @@ class AbstractPicker(metaclass=ABCMeta):
         pass    # pragma: no cover
 
 
+class PriorityPicker(AbstractPicker):
+    """Picks a :class:`~GlitterClient_driver.connection.Connection`
+       instance from a list of connections, in order of preference.
+
+    """
+
+    def pick(self, connections):
+        """Picks the first connection.
+
+           As the pool only hands over connections that are not in
+           backoff, the first node is used for as long as it is healthy
+           and the next ones serve as fallbacks.
+
+        Args:
+            connections (:obj:list): List of
+                :class:`~GlitterClient_driver.connection.Connection` instances.
+
+        """
+        return connections[0]
+
+
 class RoundRobinPicker(AbstractPicker):
     """Picks a :class:`~GlitterClient_driver.connection.Connection`
        instance from a list of connections.
 
     """
 
+    def __init__(self):
+        self._counter = count()
+
     def pick(self, connections):
-        """Picks a connection with the earliest backoff time.
+        """Picks the connections one after the other.
 
-           As a result, the first connection is picked
-           for as long as it has no backoff time.
-           Otherwise, the connections are tried in a round robin fashion.
+        Args:
+            connections (:obj:list): List of
+                :class:`~GlitterClient_driver.connection.Connection` instances.
+
+        """
+        if len(connections) == 1:
+            return connections[0]
+
+        return connections[next(self._counter) % len(connections)]
+
+
+class LatencyAwarePicker(AbstractPicker):
+    """Picks a :class:`~GlitterClient_driver.connection.Connection`
+       instance from a list of connections, favouring fast and idle nodes.
+
+    """
+
+    def __init__(self):
+        self._random = Random()
+
+    def pick(self, connections):
+        """Picks the cheaper of two random connections ("power of two
+           choices").
+
+           The cost of a connection is the moving average of its latency
+           multiplied by the number of requests it is already serving plus
+           one. Connections without latency sample yet cost nothing, so
+           they get probed early.
 
         Args:
             connections (:obj:list): List of
@@ -44,12 +95,13 @@ class RoundRobinPicker(AbstractPicker):
         if len(connections) == 1:
             return connections[0]
 
-        def key(conn):
-            return (datetime.min
-                    if conn.backoff_time is None
-                    else conn.backoff_time)
+        first, second = self._random.sample(connections, 2)
+        return min(first, second, key=self.cost)
 
-        return min(*connections, key=key)
+    @staticmethod
+    def cost(conn):
+        latency = conn.latency if conn.latency is not None else 0
+        return latency * (conn.in_flight + 1)
 
 
 class Pool:
@@ -61,17 +113,40 @@ class Pool:
         Args:
             connections (list): List of
                 :class:`~GlitterClient_driver.connection.Connection` instances.
+            picker_class: Optional subclass of
+                :class:`~GlitterClient_driver.pool.AbstractPicker`.
 
         """
         self.connections = connections
         self.picker = picker_class()
 
-    def get_connection(self):
+    def get_connection(self, exclude=()):
         """Gets a :class:`~GlitterClient_driver.connection.Connection`
         instance from the pool.
 
+        Backoff and circuit breakers are eligibility filters: the picker
+        chooses among the connections whose backoff has expired and whose
+        breaker is not open. Only when no connection is eligible, the one
+        whose backoff expires first is returned (and :meth:`Connection.request
+        <GlitterClient_driver.connection.Connection.request>` waits for it).
+
+        Args:
+            exclude: Optional connections to avoid, e.g. the ones a request
+                was already sent to. They are only picked if no other
+                connection is left.
+
         Returns:
             A :class:`~GlitterClient_driver.connection.Connection` instance.
 
         """
-        return self.picker.pick(self.connections)
+        connections = self.connections
+        if exclude:
+            connections = [conn for conn in connections
+                           if conn not in exclude] or connections
+        now = monotonic()
+        available = [conn for conn in connections
+                     if conn.is_available(now)]
+        if not available:
+            return min(connections,
+                       key=lambda conn: conn.get_backoff_timedelta(now))
+        return self.picker.pick(available)
@@ -0,0 +1,150 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Retries of the calls answered with a retryable HTTP status.
+
+Connection errors are always retried by the transport. With a
+:class:`RetryPolicy` (``GlitterClient(url, retry_policy=RetryPolicy())``),
+idempotent calls answered with a retryable status (``429`` and ``502``,
+``503``, ``504`` by default) are retried too, on another node when there is
+one, after a jittered exponential delay. Idempotent calls are the reads
+(``GET``) and the requests marked ``idempotent`` by the driver
+(``get_docs``, ``search``); writes such as ``put_doc``, ``create_schema`` or
+``update_validator`` are never retried on a status, as the node may have
+applied them.
+
+A node answering with a ``Retry-After`` header is put in backoff for that
+long, so the next attempts go to the other nodes, or wait for it when no
+other node is left. A :class:`RetryBudget` shared by all the calls of the
+client caps the retries to a fraction of the calls, so that an overloaded
+cluster is not hit by a retry storm.
+"""
+
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic
+
+from .exceptions import TransportError
+
+
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+RETRY_MAX_RETRIES = 2  # per call
+RETRY_BASE_DELAY = 0.05  # seconds
+RETRY_MAX_DELAY = 2  # seconds
+RETRY_MAX_RETRY_AFTER = 30  # seconds
+RETRY_BUDGET_RATIO = 0.2  # retries per call
+RETRY_BUDGET_MIN_PER_SECOND = 10  # retries
+RETRY_BUDGET_CAPACITY = 100  # retries
+
+
+class RetryBudget:
+    """Token bucket limiting the retries of all the calls of a client.
+
+    Each call deposits ``ratio`` token and each retry withdraws one, so that
+    at most ``ratio`` retries per call are sent in the long run. The bucket
+    also refills by ``min_per_second`` tokens per second, so that a client
+    sending few calls can still retry them, and holds at most ``capacity``
+    tokens.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO,
+                 min_per_second=RETRY_BUDGET_MIN_PER_SECOND,
+                 capacity=RETRY_BUDGET_CAPACITY):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.rejected = 0
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens
+                          + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """Records a call."""
+        with self._lock:
+            self._refill(monotonic())
+            self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Takes the token of a retry, returns `False` when the budget is
+        exhausted."""
+        with self._lock:
+            self._refill(monotonic())
+            if self.tokens < 1:
+                self.rejected += 1
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """Decides which failed attempts of a call are retried, and when.
+
+    Args:
+        statuses: HTTP status codes retried.
+        max_retries (int): Retries of a call after a retryable status or an
+            attempt timeout.
+        base_delay (float): Delay in seconds before the first retry, doubled
+            at each retry. The delay actually waited is drawn uniformly
+            between zero and this value ("full jitter").
+        max_delay (float): Upper bound in seconds of the delay.
+        max_retry_after (float): Longest ``Retry-After`` honoured, in
+            seconds. A node asking for more is not retried.
+        budget (RetryBudget): Budget shared by the calls, a new
+            :class:`RetryBudget` by default, `False` for unlimited retries.
+    """
+
+    def __init__(self, statuses=RETRY_STATUSES, max_retries=RETRY_MAX_RETRIES,
+                 base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 max_retry_after=RETRY_MAX_RETRY_AFTER, budget=None):
+        self.statuses = frozenset(statuses)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget = RetryBudget() if budget is None else budget
+
+    def is_retryable(self, error):
+        """Tells whether ``error`` is an answer with a retryable status."""
+        return isinstance(error, TransportError) and bool(error.args) \
+            and error.status_code in self.statuses
+
+    def backoff(self, retries):
+        """Returns the jittered delay before the retry number ``retries``
+        (from 0)."""
+        return random.uniform(0, min(self.max_delay,
+                                     self.base_delay * 2 ** retries))
+
+    def allow(self, retries):
+        """Tells whether a call that was already retried ``retries`` times
+        may be retried again, and takes the token of the retry."""
+        if retries >= self.max_retries:
+            return False
+        return not self.budget or self.budget.withdraw()
+
+
+def retry_after(error, now=None):
+    """Returns the seconds to wait from the ``Retry-After`` header of an
+    error reply, or `None`."""
+    headers = getattr(error, 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc) if now is None else now
+    return max((date - now).total_seconds(), 0.0)
@@ -0,0 +1,122 @@
+# Copyright GlitterClient GmbH and GlitterClient contributors
+# SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
+# Code is Apache-2.0 and docs are CC-BY-4.0
+
+"""Coalescing of identical concurrent reads ("singleflight").
+
+While a read is in flight, callers issuing the very same read wait for its
+result instead of sending their own request. Every caller receives the same
+reply object, which must therefore be treated as read-only. A caller
+waits no longer than its own deadline allows, whatever the deadline of the
+caller that sent the request.
+"""
+
+import asyncio
+import json
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from threading import Lock
+
+from .exceptions import TimeoutError
+
+
+def request_key(method, path, params=None, body=None, headers=None):
+    """Returns a hashable key identifying a request: two requests with the
+    same key are interchangeable."""
+    return (method.upper(), path,
+            _normalize(params), _normalize(body), _normalize(headers))
+
+
+def _normalize(value):
+    if not value:
+        return None
+    try:
+        return json.dumps(value, sort_keys=True, separators=(',', ':'),
+                          default=str)
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, for threads.
+
+    Attributes:
+        coalesced (int): number of calls answered by another call's result.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, fn, deadline=None):
+        """Calls ``fn()``, unless a call for ``key`` is already in flight, in
+        which case its result is returned (or its exception raised).
+
+        Raises:
+            TimeoutError: if the ``deadline`` of the caller expires while it
+                waits for the call of another caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            try:
+                return call.result(timeout=_remaining(deadline))
+            except FutureTimeoutError:
+                raise TimeoutError([]) from None
+
+        try:
+            result = fn()
+        except BaseException as err:
+            self._forget(key)
+            call.set_exception(err)
+            raise
+        self._forget(key)
+        call.set_result(result)
+        return result
+
+    def _forget(self, key):
+        with self._lock:
+            del self._calls[key]
+
+
+class AsyncSingleFlight(SingleFlight):
+    """asyncio version of :class:`SingleFlight`, :meth:`do` awaits the
+    coroutine returned by ``fn()``.
+
+    The call runs in its own task, so cancelling the caller that started it
+    does not cancel the callers waiting for it.
+    """
+
+    async def do(self, key, fn, deadline=None):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._done(key, done))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task),
+                                          _remaining(deadline))
+        except asyncio.TimeoutError:
+            if task.done():
+                raise  # raised by the call itself
+            raise TimeoutError([]) from None
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Marks the exception as retrieved when every caller is gone.
+            task.exception()
+
+
+def _remaining(deadline):
+    return None if deadline is None else deadline.remaining()
@@ -2,45 +2,227 @@
 # SPDX-License-Identifier: (Apache-2.0 AND CC-BY-4.0)
 # Code is Apache-2.0 and docs are CC-BY-4.0
 
-from time import time
+from collections import deque
+from functools import partial
+from concurrent.futures import (ThreadPoolExecutor, FIRST_COMPLETED,
+                                TimeoutError as FutureTimeoutError, wait)
+from threading import Event, Lock
+from time import monotonic, sleep
 
-from requests.exceptions import ConnectionError
-
-from .connection import Connection
-from .exceptions import TimeoutError
-from .pool import Pool
+from .codec import get_codec
+from .compression import COMPRESS_MIN_SIZE
+from .connection import Connection, DEFAULT_POOLSIZE, DEFAULT_POOL_MAXSIZE
+from .deadline import Deadline, current_deadline
+from .exceptions import TimeoutError, TransportError
+from .health import (CircuitBreaker, BREAKER_FAILURE_THRESHOLD,
+                     BREAKER_RECOVERY_TIME)
+from .hooks import HookSet, attempt_result
+from .limiter import ConcurrencyLimiter, TokenBucket, LIMIT_MAX
+from .pool import Pool, RoundRobinPicker
+from .retry import RetryBudget, retry_after
+from .singleflight import SingleFlight, request_key
 
 
 NO_TIMEOUT_BACKOFF_CAP = 10  # seconds
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+HEDGE_MIN_DELAY = 0.005  # seconds
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 1000  # latency samples kept to compute the hedge delay
+HEDGE_REFRESH = 32  # samples between two computations of the hedge delay
+HEDGE_MAX_WORKERS = 32
+HEDGE_BUDGET = 10  # percent of the reads that may be hedged
+HEDGE_BUDGET_MIN_PER_SECOND = 1  # hedges
+HEDGE_BUDGET_CAPACITY = 10  # hedges
 
 
 class Transport:
     """Transport class.
 
+    A transport, and the client owning it, may be shared by any number of
+    threads.
     """
 
-    def __init__(self, *nodes, timeout=None):
+    connection_class = Connection
+    singleflight_class = SingleFlight
+    limiter_class = ConcurrencyLimiter
+
+    def __init__(self, *nodes, timeout=None, picker_class=RoundRobinPicker,
+                 hedge_percentile=None, hedge_min_delay=HEDGE_MIN_DELAY,
+                 hedge_max_workers=HEDGE_MAX_WORKERS,
+                 hedge_budget=HEDGE_BUDGET,
+                 breaker_threshold=BREAKER_FAILURE_THRESHOLD,
+                 breaker_recovery_time=BREAKER_RECOVERY_TIME, codec=None,
+                 pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, coalesce=False,
+                 metrics=None, hooks=None, compression=None,
+                 compress_min_size=COMPRESS_MIN_SIZE, connect_timeout=None,
+                 read_timeout=None, attempt_timeout=None, retry_policy=None,
+                 rate_limit=None, rate_burst=None, concurrency_limit=None,
+                 max_concurrency=LIMIT_MAX):
         """Initializes an instance of
         :class:`~GlitterClient_driver.transport.Transport`.
 
         Args:
             nodes: each node is a dictionary with the keys `endpoint` and
                    `headers`
-            timeout (int): Optional timeout in seconds.
+            timeout (int): Optional timeout in seconds of each call,
+                retries included.
+            picker_class: Optional picker class used to choose the node of
+                each request.
+            hedge_percentile (float): Enables hedged reads when set. A read
+                that has not been answered after this percentile (e.g.:
+                ``95``) of the recent read latencies is also sent to a
+                second node, and the first answer wins.
+            hedge_min_delay (float): Lower bound in seconds of the delay
+                before hedging a read.
+            hedge_max_workers (int): Number of threads sending hedged reads.
+                Reads are sent without hedging while they are all busy.
+            hedge_budget (float): Percentage of the reads that may be
+                hedged, plus one hedge per second, so that a slow cluster
+                is not sent twice its load. `None` for no limit.
+            breaker_threshold (int): Number of consecutive failures after
+                which a node is ejected from the pool.
+            breaker_recovery_time (float): Seconds after which an ejected
+                node is tried again.
+            codec: JSON codec, or codec name (``'orjson'``, ``'ujson'`` or
+                ``'json'``), shared by the connections. Defaults to the
+                fastest installed one, see
+                :func:`~glitter_sdk.codec.get_codec`.
+            pool_connections (int): Number of host pools cached by the HTTP
+                session of each node.
+            pool_maxsize (int): Number of sockets kept open to each node,
+                size it to the number of threads sharing the client.
+            coalesce (bool): Coalesce identical concurrent reads: while a
+                read is in flight, the same read (method, path, parameters,
+                body and headers) waits for its reply instead of being sent
+                again. Callers then share the reply object.
+            metrics (Metrics): Optional registry recording the requests,
+                retries, backoffs and timeouts, see
+                :mod:`~glitter_sdk.metrics`. Nothing is recorded by default.
+            hooks: Optional :class:`~glitter_sdk.hooks.RequestHooks`, or list
+                of hooks, called around every attempt, see
+                :mod:`~glitter_sdk.hooks`.
+            compression (str): Optional compression of the request bodies,
+                ``'gzip'`` or ``'zstd'``, see
+                :mod:`~glitter_sdk.compression`. Each node that refuses
+                compressed bodies is sent uncompressed ones afterwards.
+            compress_min_size (int): Size in bytes from which the request
+                bodies are compressed.
+            connect_timeout (float): Optional seconds an attempt may take to
+                connect to a node.
+            read_timeout (float): Optional seconds an attempt may wait for
+                each read of the reply.
+            attempt_timeout (float): Optional seconds an attempt may wait to
+                connect and for each read of the reply (requests has no
+                total timeout; the asyncio transport bounds the whole
+                attempt). A read whose attempt runs out of time is retried
+                on another node. See :mod:`~glitter_sdk.deadline`.
+            retry_policy (RetryPolicy): Optional policy retrying the reads
+                answered with a retryable status (e.g. ``429`` or ``503``)
+                and bounding the retries of the attempts that timed out,
+                see :mod:`~glitter_sdk.retry`.
+            rate_limit (float): Optional number of requests per second sent
+                to each node, see :mod:`~glitter_sdk.limiter`.
+            rate_burst (int): Number of requests a node may get at once
+                within ``rate_limit``, defaults to ``rate_limit``.
+            concurrency_limit (int): Enables the adaptive limit of the
+                requests in flight to each node, starting at this value.
+            max_concurrency (int): Highest value the adaptive limit may
+                reach.
 
         """
         self.nodes = nodes
         self.timeout = timeout
-        self.connection_pool = Pool([Connection(node_url=node['endpoint'],
-                                                headers=node['headers'])
-                                     for node in nodes])
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.attempt_timeout = attempt_timeout
+        self.retry_policy = retry_policy
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.concurrency_limit = concurrency_limit
+        self.max_concurrency = max_concurrency
+        self.breaker_threshold = breaker_threshold
+        self.breaker_recovery_time = breaker_recovery_time
+        self.codec = get_codec(codec)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.metrics = metrics
+        self.compression = compression
+        self.compress_min_size = compress_min_size
+        self.hooks = HookSet(hooks) if hooks else None
+        self.connection_pool = Pool([self._new_connection(node)
+                                     for node in nodes],
+                                    picker_class=picker_class)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_workers = hedge_max_workers
+        self.hedge_budget = hedge_budget
+        self._hedge_tokens = RetryBudget(
+            ratio=hedge_budget / 100,
+            min_per_second=HEDGE_BUDGET_MIN_PER_SECOND,
+            capacity=HEDGE_BUDGET_CAPACITY) if hedge_budget is not None \
+            else None
+        self._hedge_tasks = 0  # _send calls submitted to the executor
+        self._read_latencies = deque(maxlen=HEDGE_WINDOW)
+        self._hedge_delay = None
+        self._hedge_countdown = 0
+        self._hedge_executor = None
+        self._hedge_lock = Lock()
+        self._latency_lock = Lock()
+        self.singleflight = self.singleflight_class() if coalesce else None
+
+    def _new_connection(self, node):
+        return self.connection_class(node_url=node['endpoint'],
+                                     headers=node['headers'],
+                                     breaker=self._new_breaker(),
+                                     codec=self.codec,
+                                     metrics=self.metrics,
+                                     compression=self.compression,
+                                     compress_min_size=self.compress_min_size,
+                                     rate_limiter=self._new_rate_limiter(),
+                                     limiter=self._new_limiter(),
+                                     **self._session_options())
+
+    def _session_options(self):
+        """Returns the options of the HTTP session of a connection."""
+        return dict(pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize)
+
+    def _new_rate_limiter(self):
+        if self.rate_limit is None:
+            return None
+        return TokenBucket(self.rate_limit, self.rate_burst)
+
+    def _new_limiter(self):
+        if self.concurrency_limit is None:
+            return None
+        return self.limiter_class(self.concurrency_limit,
+                                  max_limit=self.max_concurrency)
+
+    def _new_breaker(self):
+        return CircuitBreaker(failure_threshold=self.breaker_threshold,
+                              recovery_time=self.breaker_recovery_time)
+
+    def new_deadline(self):
+        """Returns a :class:`~glitter_sdk.deadline.Deadline` made of the
+        timeouts of the transport, starting now."""
+        return Deadline(self.timeout, connect=self.connect_timeout,
+                        read=self.read_timeout, attempt=self.attempt_timeout)
+
+    def _deadline(self, deadline):
+        if deadline is None:
+            deadline = current_deadline()
+        return deadline if deadline is not None else self.new_deadline()
 
     def forward_request(self, method, path=None,
-                        json=None, params=None, headers=None):
+                        json=None, params=None, headers=None,
+                        idempotent=None, deadline=None):
         """Makes HTTP requests to the configured nodes.
 
            Retries connection errors
            (e.g. DNS failures, refused connection, etc).
+           With a ``retry_policy``, reads answered with a retryable status
+           are retried as well, on another node if possible.
            A user may choose to retry other errors
            by catching the corresponding
            exceptions and retrying `forward_request`.
@@ -49,7 +231,14 @@ class Transport:
            Backoff delays are expressed as timestamps stored on the object and
            they are not reset in between multiple function calls.
 
-           Times out when `self.timeout` is expired, if not `None`.
+           Times out when the deadline of the call is expired: by
+           default `self.timeout` seconds after the call, if not `None`.
+           Reads whose attempt runs out of its own time (see
+           ``attempt_timeout``) are retried as well.
+
+           Reads (``GET`` requests, or requests marked ``idempotent``) may
+           be hedged, see ``hedge_percentile``, and coalesced, see
+           ``coalesce``. Writes never are.
 
         Args:
             method (str): HTTP method name (e.g.: ``'GET'``).
@@ -58,37 +247,316 @@ class Transport:
             json (dict): Payload to be sent with the HTTP request.
             params (dict)): Dictionary of URL (query) parameters.
             headers (dict): Optional headers to pass to the request.
+            idempotent (bool): Whether the request only reads data and can
+                safely be sent more than once. Defaults to ``True`` for
+                ``GET`` requests and ``False`` otherwise.
+            deadline (Deadline): Optional time budget of the call, defaults
+                to the current deadline or to the timeouts of the transport,
+                see :mod:`~glitter_sdk.deadline`.
 
         Returns:
             dict: Result of :meth:`requests.models.Response.json`
 
         """
-        error_trace = []
-        timeout = self.timeout
-        backoff_cap = NO_TIMEOUT_BACKOFF_CAP if timeout is None \
-            else timeout / 2
-        while timeout is None or timeout > 0:
-            connection = self.connection_pool.get_connection()
-
-            start = time()
+        deadline = self._deadline(deadline)
+        if self.singleflight is not None and self.is_read(method, idempotent):
+            return self.singleflight.do(
+                request_key(method, path, params, json, headers),
+                partial(self._forward_request, method, path, json, params,
+                        headers, idempotent, deadline), deadline)
+        return self._forward_request(method, path, json, params, headers,
+                                     idempotent, deadline)
+
+    def _forward_request(self, method, path, json, params, headers,
+                         idempotent, deadline):
+        attempts = _Attempts(self, method, path, json, params, headers,
+                             idempotent, deadline)
+        while not deadline.expired():
+            connection = attempts.next_connection()
+            start = monotonic()
             try:
-                response = connection.request(
-                    method=method,
-                    path=path,
-                    params=params,
-                    json=json,
-                    headers=headers,
-                    timeout=timeout,
-                    backoff_cap=backoff_cap,
-                )
-            except ConnectionError as err:
-                error_trace.append(err)
+                if attempts.hedge:
+                    response = self._hedged_request(
+                        connection, attempts.request, attempts.call)
+                else:
+                    response = self._send(connection, attempts.request,
+                                          attempts.call)
+            except Exception as err:
+                delay = attempts.retry_delay(connection, err)
+                if delay:
+                    sleep(delay)
                 continue
-            else:
-                return response.data
-            finally:
-                elapsed = time() - start
-                if timeout is not None:
-                    timeout -= elapsed
-
-        raise TimeoutError(error_trace)
+            return attempts.done(response, start)
+        attempts.expire()
+
+    def _may_retry(self, retries):
+        return self.retry_policy is None or self.retry_policy.allow(retries)
+
+    def _retry_delay(self, error, connection, read, retries, deadline):
+        """Returns the seconds to wait before retrying a call answered with
+        an error status, or `None` if it must not be retried."""
+        policy = self.retry_policy
+        if policy is None or not policy.is_retryable(error):
+            return None
+        wait = retry_after(error)
+        if wait is not None:
+            if wait > policy.max_retry_after:
+                return None
+            connection.hold_off(wait)
+        if not read:
+            return None
+        delay = policy.backoff(retries)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay if policy.allow(retries) else None
+
+    def _retry(self, connection, path, call, error, error_trace):
+        error_trace.append(error)
+        if self.metrics is not None:
+            self.metrics.record_retry(connection.node_url, path)
+        if call is not None:
+            self.hooks.emit('on_retry', call, error)
+
+    @staticmethod
+    def is_read(method, idempotent=None):
+        """Tells whether a request only reads data."""
+        if idempotent is not None:
+            return idempotent
+        return method.upper() in READ_METHODS
+
+    def record_read_latency(self, elapsed):
+        """Adds a sample to the latencies the hedge delay derives from."""
+        if self.hedge_percentile is None:
+            return
+        with self._latency_lock:
+            self._read_latencies.append(elapsed)
+            self._hedge_countdown -= 1
+
+    def hedge_delay(self):
+        """Returns the delay in seconds after which a read is hedged, or
+        `None` while too few latencies have been recorded."""
+        if self._hedge_countdown <= 0:
+            with self._latency_lock:
+                samples = sorted(self._read_latencies)
+            if len(samples) < HEDGE_MIN_SAMPLES:
+                return None
+            index = int(len(samples) * self.hedge_percentile / 100)
+            self._hedge_delay = max(self.hedge_min_delay,
+                                    samples[min(index, len(samples) - 1)])
+            self._hedge_countdown = HEDGE_REFRESH
+        return self._hedge_delay
+
+    def _get_hedge_executor(self):
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=self.hedge_max_workers,
+                    thread_name_prefix='glitter-hedge')
+            return self._hedge_executor
+
+    def _before_send(self, connection, call):
+        """Emits the ``before_send`` hook of an attempt, returns what
+        :meth:`_after_response` needs."""
+        number = call.next_attempt()
+        self.hooks.emit('before_send', call, connection.node_url)
+        return number, monotonic()
+
+    def _after_response(self, connection, call, attempt, response, error):
+        number, start = attempt
+        self.hooks.emit('after_response', call, attempt_result(
+            connection.node_url, number, monotonic() - start, response,
+            error))
+
+    def _submit(self, connection, request, call=None, started=None):
+        """Runs :meth:`_send` in a hedging thread, returns its future or
+        `None` when all the threads are busy."""
+        with self._hedge_lock:
+            if self._hedge_tasks >= self.hedge_max_workers:
+                return None
+            self._hedge_tasks += 1
+        future = self._get_hedge_executor().submit(
+            self._send, connection, request, call, started)
+        future.add_done_callback(self._hedge_task_done)
+        return future
+
+    def _hedge_task_done(self, future):
+        with self._hedge_lock:
+            self._hedge_tasks -= 1
+
+    def _send(self, connection, request, call=None, started=None):
+        if started is not None:
+            started.set()
+        if call is None:
+            return connection.request(**request)
+        attempt = self._before_send(connection, call)
+        response = error = None
+        try:
+            response = connection.request(**request)
+            return response
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            self._after_response(connection, call, attempt, response, error)
+
+    def _hedge_connection(self, connection, call):
+        """Returns the connection a read sent through ``connection`` is
+        hedged to, or `None` if there is no other node to try or the hedge
+        budget is spent."""
+        second = self.connection_pool.get_connection(exclude=(connection,))
+        if second is connection:
+            return None
+        if self._hedge_tokens is not None \
+                and not self._hedge_tokens.withdraw():
+            return None
+        if call is not None:
+            self.hooks.emit('on_node_switch', call, connection.node_url,
+                            second.node_url)
+        return second
+
+    def _hedged_request(self, connection, request, call=None):
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._send(connection, request, call)
+
+        started = Event()
+        primary = self._submit(connection, request, call, started)
+        if primary is None:
+            return self._send(connection, request, call)
+        # The delay only runs once the primary request is sent.
+        started.wait()
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+
+        if self._hedge_tasks >= self.hedge_max_workers:
+            return primary.result()
+        second = self._hedge_connection(connection, call)
+        hedge = self._submit(second, request, call) \
+            if second is not None else None
+        if hedge is None:
+            return primary.result()
+        # The request that loses the race is left to complete in the
+        # background; its outcome only updates the connection state.
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as err:
+                    error = error or err
+        raise error
+
+
+class _Attempts:
+    """State of the attempts of a single call: the nodes that failed, the
+    errors met and the retries made.
+
+    :class:`Transport` and
+    :class:`~glitter_sdk.async_transport.AsyncTransport` take the same
+    retry decisions through it, only sending the attempts and waiting
+    between them differ.
+    """
+
+    def __init__(self, transport, method, path, json, params, headers,
+                 idempotent, deadline):
+        self.transport = transport
+        self.path = path
+        self.deadline = deadline
+        self.read = transport.is_read(method, idempotent)
+        self.hedge = self.read and transport.hedge_percentile is not None \
+            and len(transport.connection_pool.connections) > 1
+        if self.hedge and transport._hedge_tokens is not None:
+            transport._hedge_tokens.deposit()
+        self.request = dict(
+            method=method,
+            path=path,
+            params=params,
+            json=json,
+            headers=headers,
+            backoff_cap=NO_TIMEOUT_BACKOFF_CAP if deadline.timeout is None
+            else deadline.timeout / 2,
+            deadline=deadline,
+        )
+        self.call = transport.hooks.new_call(method, path, params) \
+            if transport.hooks is not None else None
+        self.error_trace = []
+        self.previous = None
+        self.failed = []  # nodes that timed out or refused an attempt
+        self.retries = 0  # after a status or a timeout, not a connection
+        policy = transport.retry_policy
+        if policy is not None and policy.budget:
+            policy.budget.deposit()
+
+    def next_connection(self):
+        """Returns the connection the next attempt is sent through."""
+        connection = self.transport.connection_pool.get_connection(
+            exclude=self.failed)
+        if self.call is not None and self.previous not in (None, connection):
+            self.transport.hooks.emit('on_node_switch', self.call,
+                                      self.previous.node_url,
+                                      connection.node_url)
+        self.previous = connection
+        return connection
+
+    def retry_delay(self, connection, error):
+        """Returns the seconds to wait before the next attempt, after the
+        attempt sent through ``connection`` failed with ``error``.
+
+        Raises:
+            error: if the call must not be retried.
+        """
+        transport = self.transport
+        if connection.is_connection_error(error):
+            self._retry(connection, error)
+            return 0
+        if isinstance(error, TimeoutError):
+            # The remaining time is shorter than the backoff of the node.
+            if transport.metrics is not None:
+                transport.metrics.record_timeout(self.path)
+            raise error
+        if connection.is_timeout(error):
+            if self.deadline.expired():
+                # The whole call ran out of time.
+                self.expire(error)
+            # Only the attempt ran out of time, another node may answer.
+            if not self.read or not transport._may_retry(self.retries):
+                raise error
+            self.retries += 1
+            self.failed.append(connection)
+            self._retry(connection, error)
+            return 0
+        if isinstance(error, TransportError):
+            delay = transport._retry_delay(error, connection, self.read,
+                                           self.retries, self.deadline)
+            if delay is None:
+                raise error
+            self.retries += 1
+            self.failed.append(connection)
+            self._retry(connection, error)
+            return delay
+        raise error
+
+    def _retry(self, connection, error):
+        self.transport._retry(connection, self.path, self.call, error,
+                              self.error_trace)
+
+    def done(self, response, start):
+        """Returns the data of the response to the attempt started at
+        ``start``."""
+        if self.read:
+            self.transport.record_read_latency(monotonic() - start)
+        return response.data
+
+    def expire(self, error=None):
+        """Raises the `TimeoutError` of a call whose deadline expired,
+        during the attempt that failed with ``error`` if any."""
+        if self.transport.metrics is not None:
+            self.transport.metrics.record_timeout(self.path)
+        if error is not None:
+            self.error_trace.append(error)
+        raise TimeoutError(self.error_trace) from error
@@ -99,3 +99,27 @@ def normalize_nodes(*nodes, headers=None):
     for node in nodes:
         normalized_nodes += (normalize_node(node, headers),)
     return normalized_nodes
+
+
+def chunked(iterable, size):
+    """Lazily splits ``iterable`` into lists of at most ``size`` items."""
+    if size < 1:
+        raise ValueError('chunk size must be positive, got {}'.format(size))
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def latest_block_height(status):
+    """Returns the latest block height of a ``/chain/status`` reply, or
+    `None` if the reply does not hold one."""
+    try:
+        result = status.get('result', status)
+        return int(result['sync_info']['latest_block_height'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
@@ -25,6 +25,18 @@ dev_require = [
     'pre-commit'
 ]
 
+async_require = [
+    'aiohttp>=3.7',
+]
+
+speedups_require = [
+    'orjson>=3.0',
+]
+
+zstd_require = [
+    'zstandard>=0.15',
+]
+
 docs_require = [
     'Sphinx~=4.0',
     'sphinx-autobuild',
@@ -41,14 +53,17 @@ setup(
     url='https://docs.glitterprotocol.io/',
     description=u'Glitter Protocol is a blockchain based database and index engine for developing and hosting web3 applications in decentralized storage networks.',
     long_description=readme + '\n\n' + changelog,
-    python_requires='>=3.5',
-    packages=find_packages(),
+    python_requires='>=3.7',
+    packages=find_packages(exclude=('benchmarks', 'benchmarks.*')),
     install_requires=['requests'],
     entry_points={},
     test_suite='tests',
     extras_require={
-        'test': tests_require,
-        'dev': dev_require + tests_require + docs_require,
+        'async': async_require,
+        'speedups': speedups_require,
+        'zstd': zstd_require,
+        'test': tests_require + async_require,
+        'dev': dev_require + tests_require + async_require + docs_require,
         'docs': docs_require,
     },
 )
@@ -0,0 +1,419 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process stand-in for a glitter node, used by the offline tests."""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from glitter_sdk.compression import (AVAILABLE_COMPRESSORS, get_compressor,
+                                     zstandard)
+
+
+def decompress(data, encoding):
+    """Decompresses a body sent with the ``Content-Encoding`` ``encoding``,
+    the way a node does."""
+    if not encoding or encoding == 'identity':
+        return data
+    if encoding == 'zstd':
+        return zstandard.decompress(data)
+    return gzip.decompress(data)
+
+
+def _ok(data=None, **extra):
+    res = {"code": 0, "message": "ok"}
+    if data is not None:
+        res["data"] = data
+    res.update(extra)
+    return res
+
+
+def _rpc(result):
+    return {"jsonrpc": "2.0", "id": -1, "result": result}
+
+
+def _unquote(value):
+    return value[1:-1] if value.startswith('"') and value.endswith('"') else value
+
+
+class FakeState:
+    """Documents, schemas and chain of a :class:`FakeNode`.
+
+    A single state can be shared by several nodes so that they behave like
+    replicas of the same network.
+    """
+
+    def __init__(self, height=100):
+        self.lock = threading.Lock()
+        self.schemas = {}
+        self.docs = {}
+        self.txs = []
+        self.height = height
+
+    def block_hash(self, height):
+        return hashlib.sha256(str(height).encode()).hexdigest().upper()
+
+    def header(self, height):
+        return {"chain_id": "fake", "height": str(height),
+                "last_block_id": {"hash": self.block_hash(height - 1)}}
+
+    def block(self, height):
+        return {"block_id": {"hash": self.block_hash(height)},
+                "block": {"header": self.header(height), "data": {"txs": []}}}
+
+
+REFUSE = 'refuse'
+BLACKHOLE = 'blackhole'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffer the response so that headers and body leave in one segment,
+    # otherwise Nagle's algorithm adds ~40ms to every keep-alive request.
+    wbufsize = -1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        node = self.server.node
+        if node.fault == REFUSE:
+            # Keep-alive connections opened before the node "died".
+            self.close_connection = True
+            return
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        node.count_bytes(received=len(raw))
+        encoding = self.headers.get('Content-Encoding')
+        if encoding and encoding not in node.request_encodings:
+            node.record(method, url.path, params, None, self.headers,
+                        self.client_address)
+            self._reply(415, {"code": 415, "message": "unsupported encoding"},
+                        {'Accept-Encoding': ', '.join(node.request_encodings)})
+            return
+        if encoding:
+            raw = decompress(raw, encoding)
+        body = json.loads(raw) if raw else None
+        node.record(method, url.path, params, body, self.headers,
+                    self.client_address)
+        if node.fault == BLACKHOLE:
+            node.healed.wait()
+            self.close_connection = True
+            return
+        if node.delay:
+            time.sleep(node.delay)
+
+        status, payload = node.handle(method, url.path, params, body)
+        if node.payload_size and isinstance(payload, dict):
+            payload = dict(payload, padding='x' * node.payload_size)
+        headers = None
+        if node.fail_status is not None and node.retry_after is not None:
+            headers = {'Retry-After': str(node.retry_after)}
+        self._reply(status, payload, headers)
+
+    def _reply(self, status, payload, headers=None):
+        node = self.server.node
+        data = json.dumps(payload).encode()
+        headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+        if node.compress_replies and len(data) >= node.compress_min_size \
+                and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = get_compressor('gzip').compress(data)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        node.count_bytes(sent=len(data))
+
+
+class FakeNode:
+    """A tiny HTTP server speaking enough of the glitter API for tests.
+
+    Faults can be injected while it runs, see :meth:`refuse`,
+    :meth:`blackhole`, :meth:`slow` and :meth:`error`; :meth:`heal` clears
+    them.
+
+    Args:
+        state (FakeState): Optional state shared with other nodes.
+        delay (float): Seconds to wait before answering each request.
+        fail_status (int): When set, every request is answered with this
+            HTTP status code.
+        payload_size (int): Number of padding bytes added to every reply.
+        compress_replies (bool): Gzip the replies of at least
+            ``compress_min_size`` bytes when the client accepts it.
+        request_encodings: Content encodings accepted for the request
+            bodies, others are answered with ``415``.
+
+    ``bytes_received`` and ``bytes_sent`` count the body bytes on the wire.
+    """
+
+    def __init__(self, state=None, delay=0, fail_status=None, payload_size=0,
+                 compress_replies=False, compress_min_size=1024,
+                 request_encodings=AVAILABLE_COMPRESSORS):
+        self.state = state if state is not None else FakeState()
+        self.delay = delay
+        self.fail_status = fail_status
+        self.payload_size = payload_size
+        self.retry_after = None
+        self.compress_replies = compress_replies
+        self.compress_min_size = compress_min_size
+        self.request_encodings = tuple(request_encodings)
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.requests = []
+        self.request_headers = []
+        self.clients = set()
+        self.fault = None
+        self.healed = threading.Event()
+        self._server = self._bind(0)
+        self._thread = None
+
+    def _bind(self, port):
+        server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        server.daemon_threads = True
+        server.node = self
+        return server
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def refuse(self):
+        """Stops listening, new connections are refused and open ones are
+        closed."""
+        self.fault = REFUSE
+        self.stop()
+
+    def blackhole(self):
+        """Accepts the requests but never answers them; they are dropped
+        when the node is healed or stopped."""
+        self.healed.clear()
+        self.fault = BLACKHOLE
+
+    def slow(self, delay):
+        """Waits ``delay`` seconds before answering each request."""
+        self.delay = delay
+
+    def error(self, status=503, retry_after=None):
+        """Answers every request with the HTTP ``status`` code, and a
+        ``Retry-After`` header when ``retry_after`` is given."""
+        self.fail_status = status
+        self.retry_after = retry_after
+
+    def heal(self):
+        """Clears the injected faults."""
+        if self.fault == REFUSE:
+            self._server = self._bind(self._server.server_address[1])
+            self.start()
+        self.fault = None
+        self.delay = 0
+        self.fail_status = None
+        self.retry_after = None
+        self.healed.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.healed.set()
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record(self, method, path, params, body, headers, client=None):
+        with self.state.lock:
+            self.requests.append((method, path, params, body))
+            self.request_headers.append(dict(headers))
+            self.clients.add(client)
+
+    def count(self, path):
+        """Returns the number of requests received on ``path``."""
+        with self.state.lock:
+            return len([r for r in self.requests if r[1] == path])
+
+    def count_bytes(self, received=0, sent=0):
+        with self.state.lock:
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+    def handle(self, method, path, params, body):
+        if self.fail_status is not None:
+            return self.fail_status, {"code": self.fail_status,
+                                      "message": "injected failure"}
+        if path.startswith('/v1'):
+            path = path[len('/v1'):]
+        handler = getattr(self, 'h_' + path.strip('/').replace('/', '_'),
+                          None)
+        if handler is None:
+            return 404, {"code": 404, "message": "not found"}
+        with self.state.lock:
+            return 200, handler(params, body or {})
+
+    # --- database -------------------------------------------------------
+
+    def h_create_schema(self, params, body):
+        name = body["schema_name"]
+        if name in self.state.schemas:
+            return {"code": 500,
+                    "message": "schema already exist: schema_name=" + name}
+        self.state.schemas[name] = body["data"]
+        self.state.docs[name] = {}
+        return _ok(tx=hashlib.sha256(name.encode()).hexdigest().upper())
+
+    def h_list_schema(self, params, body):
+        return _ok(dict(self.state.schemas))
+
+    def h_show_schema(self, params, body):
+        schema = self.state.schemas.get(params.get("schema_name"))
+        if schema is None:
+            return {"code": 505, "message": "SchemaNotExist"}
+        return _ok(schema)
+
+    def h_app_status(self, params, body):
+        return _ok({"schema_state": {
+            name: {"count": len(docs)}
+            for name, docs in self.state.docs.items()}})
+
+    def _primary(self, schema_name):
+        for field in self.state.schemas[schema_name]["fields"]:
+            if field.get("primary") == "true":
+                return field["name"]
+
+    def h_put_doc(self, params, body):
+        name = body["schema_name"]
+        if name not in self.state.schemas:
+            return {"code": 505, "message": "SchemaNotExist"}
+        doc = dict(body["doc_data"], _schema_name=name)
+        self.state.docs[name][doc[self._primary(name)]] = doc
+        tx = hashlib.sha256(json.dumps(doc, sort_keys=True).encode())
+        tx = tx.hexdigest().upper()
+        self.state.txs.append(tx)
+        return _ok(tx=tx)
+
+    def h_get_docs(self, params, body):
+        if body["schema_name"] not in self.state.schemas:
+            return {"code": 505, "message": "SchemaNotExist"}
+        docs = self.state.docs[body["schema_name"]]
+        hits = {k: docs[k] for k in body["doc_ids"] if k in docs}
+        return _ok({"total": len(hits), "hits": hits})
+
+    def h_search(self, params, body):
+        if body["index"] not in self.state.schemas:
+            return {"code": 505, "message": "SchemaNotExist"}
+        docs = self.state.docs[body["index"]]
+        word = (body.get("query") or "").lower()
+        fields = body.get("query_field") or []
+        matched = [d for _, d in sorted(docs.items())
+                   if not word or any(word in str(d.get(f, "")).lower()
+                                      for f in fields)]
+        limit, page = int(body.get("limit", 10)), int(body.get("page", 1))
+        items = matched[(page - 1) * limit:page * limit]
+        total_pages = (len(matched) + limit - 1) // limit
+        return _ok({"index": body["index"],
+                    "meta": {"page": {"current_page": page,
+                                      "total_pages": total_pages,
+                                      "total_results": len(matched),
+                                      "size": limit}},
+                    "items": [{"highlight": {}, "data": d} for d in items],
+                    "facet": {}})
+
+    # --- chain ----------------------------------------------------------
+
+    def h_chain_status(self, params, body):
+        return _rpc({"sync_info": {
+            "latest_block_height": str(self.state.height),
+            "latest_block_hash": self.state.block_hash(self.state.height),
+            "catching_up": False}})
+
+    def h_chain_health(self, params, body):
+        return _rpc({})
+
+    def h_chain_net_info(self, params, body):
+        return _rpc({"listening": True, "peers": []})
+
+    def h_chain_block(self, params, body):
+        height = int(params.get("height", self.state.height))
+        return _rpc(self.state.block(height))
+
+    def h_chain_header(self, params, body):
+        height = int(params.get("height", self.state.height))
+        return _rpc({"header": self.state.header(height)})
+
+    def h_chain_header_by_hash(self, params, body):
+        for height in range(1, self.state.height + 1):
+            if self.state.block_hash(height) == params.get("hash"):
+                return _rpc({"header": self.state.header(height)})
+        return _rpc({"header": None})
+
+    def h_chain_blockchain(self, params, body):
+        max_height = min(int(params["maxHeight"]), self.state.height)
+        min_height = max(int(params["minHeight"]), max_height - 19, 1)
+        metas = [{"block_id": {"hash": self.state.block_hash(h)},
+                  "header": self.state.header(h)}
+                 for h in range(max_height, min_height - 1, -1)]
+        return _rpc({"last_height": str(self.state.height),
+                     "block_metas": metas})
+
+    def _page(self, params, items):
+        page = int(params.get("page", 1))
+        per_page = min(int(params.get("per_page", 30)), 100)
+        if _unquote(params.get("order_by", '"desc"')) == "desc":
+            items = items[::-1]
+        return items[(page - 1) * per_page:page * per_page], len(items)
+
+    def h_chain_tx_search(self, params, body):
+        txs = [{"hash": tx, "height": str(i + 1), "index": 0}
+               for i, tx in enumerate(self.state.txs)]
+        txs, total = self._page(params, txs)
+        return _rpc({"txs": txs, "total_count": str(total)})
+
+    def h_chain_block_search(self, params, body):
+        blocks = [self.state.block(h)
+                  for h in range(1, self.state.height + 1)]
+        blocks, total = self._page(params, blocks)
+        return _rpc({"blocks": blocks, "total_count": str(total)})
+
+    def h_chain_validators(self, params, body):
+        return _rpc({"validators": [], "count": "0", "total": "0"})
+
+    # --- admin ----------------------------------------------------------
+
+    def h_admin_update_validator(self, params, body):
+        return _ok(tx="")
@@ -0,0 +1,181 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the asyncio client against an in-process node."""
+
+import asyncio
+import time
+import unittest
+
+from glitter_sdk import AsyncGlitterClient
+from glitter_sdk.exceptions import TimeoutError
+from tests.fake_node import FakeNode
+
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+    {"name": "title", "type": "string", "index": {"type": "text"}},
+]
+
+
+class AsyncGlitterClientTest(unittest.IsolatedAsyncioTestCase):
+    schema_name = "demo"
+
+    def setUp(self):
+        self.node = FakeNode().start()
+
+    def tearDown(self):
+        self.node.stop()
+
+    async def test_db_roundtrip(self):
+        async with AsyncGlitterClient(self.node.url) as client:
+            res = await client.db.create_schema(self.schema_name, FIELDS)
+            self.assertEqual(res['code'], 0)
+
+            docs = [{"doi": str(i), "title": "title %d" % i}
+                    for i in range(50)]
+            results = await asyncio.gather(
+                *(client.db.put_doc(self.schema_name, d) for d in docs))
+            self.assertTrue(all(r['code'] == 0 for r in results))
+
+            res = await client.db.get_doc(self.schema_name, "7")
+            self.assertEqual(res['data']['hits']['7']['title'], "title 7")
+
+            res = await client.db.search(self.schema_name, "title 1",
+                                         ["title"])
+            self.assertGreaterEqual(
+                res['data']['meta']['page']['total_results'], 1)
+
+    async def test_put_docs(self):
+        async def docs():
+            for i in range(35):
+                yield {"doi": str(i), "title": "title %d" % i}
+
+        async with AsyncGlitterClient(self.node.url) as client:
+            await client.db.create_schema(self.schema_name, FIELDS)
+            results = [r async for r in client.db.put_docs(
+                self.schema_name, docs(), chunk_size=4, max_in_flight=3)]
+            self.assertEqual(sorted(r.index for r in results),
+                             list(range(35)))
+            self.assertTrue(all(r.tx and r.error is None for r in results))
+
+    async def test_put_docs_yields_each_doc_when_done(self):
+        async with AsyncGlitterClient(self.node.url) as client:
+            await client.db.create_schema(self.schema_name, FIELDS)
+            self.node.delay = 0.05
+            docs = [{"doi": str(i), "title": "t"} for i in range(10)]
+            start = time.monotonic()
+            results = client.db.put_docs(self.schema_name, docs,
+                                         chunk_size=10, max_in_flight=1)
+            first = await results.__anext__()
+            self.assertLess(time.monotonic() - start, 0.3)
+            self.assertEqual(first.index, 0)
+            self.assertEqual(len([r async for r in results]), 9)
+
+    async def test_put_docs_reports_a_bad_doc(self):
+        docs = [{"doi": "1", "title": object()}, {"doi": "2", "title": "ok"}]
+        async with AsyncGlitterClient(self.node.url) as client:
+            await client.db.create_schema(self.schema_name, FIELDS)
+            results = sorted([r async for r in client.db.put_docs(
+                self.schema_name, docs)], key=lambda r: r.index)
+            self.assertIsInstance(results[0].error, TypeError)
+            self.assertIsNone(results[1].error)
+            self.assertIsNotNone(results[1].tx)
+
+    async def test_get_docs_sharded(self):
+        async with AsyncGlitterClient(self.node.url) as client:
+            await client.db.create_schema(self.schema_name, FIELDS)
+            docs = [{"doi": str(i), "title": "t"} for i in range(20)]
+            [r async for r in client.db.put_docs(self.schema_name, docs)]
+            keys = [str(i) for i in range(25, -1, -1)]
+            res = await client.db.get_docs(self.schema_name, keys,
+                                           shard_size=6, max_workers=2)
+            self.assertEqual(list(res['data']['hits']),
+                             [str(i) for i in range(19, -1, -1)])
+            streamed = [doc_id async for doc_id, _ in client.db.iter_docs(
+                self.schema_name, keys, shard_size=6)]
+            self.assertEqual(sorted(streamed), sorted(res['data']['hits']))
+
+    async def test_search_iter(self):
+        async with AsyncGlitterClient(self.node.url) as client:
+            await client.db.create_schema(self.schema_name, FIELDS)
+            docs = [{"doi": "%02d" % i, "title": "t"} for i in range(25)]
+            [r async for r in client.db.put_docs(self.schema_name, docs)]
+            hits = [h async for h in client.db.search_iter(
+                self.schema_name, "t", ["title"], page_size=7)]
+            self.assertEqual([h["data"]["doi"] for h in hits],
+                             ["%02d" % i for i in range(25)])
+
+    async def test_tx_search_all(self):
+        self.node.state.txs = ["TX%03d" % i for i in range(130)]
+        async with AsyncGlitterClient(self.node.url) as client:
+            txs = [tx async for tx in client.chain.tx_search_all(
+                "tx.height>0", per_page=20, max_workers=2)]
+            self.assertEqual([tx["hash"] for tx in txs],
+                             ["TX%03d" % i for i in range(130)])
+
+    async def test_scan(self):
+        async with AsyncGlitterClient(self.node.url) as client:
+            blocks = [b async for b in client.chain.scan(
+                3, 47, window=4, max_workers=2)]
+            self.assertEqual(
+                [int(b["block"]["header"]["height"]) for b in blocks],
+                list(range(3, 48)))
+            metas = [m async for m in client.chain.scan(headers_only=True)]
+            self.assertEqual(len(metas), self.node.state.height)
+
+    async def test_chain_and_admin(self):
+        async with AsyncGlitterClient(self.node.url) as client:
+            res = await client.chain.block(height=3)
+            self.assertEqual(res['result']['block']['header']['height'], '3')
+            res = await client.chain.status()
+            self.assertIn('sync_info', res['result'])
+            res = await client.admin.update_validator("key", 1)
+            self.assertEqual(res['code'], 0)
+
+    async def test_hedged_reads(self):
+        slow = FakeNode(self.node.state).start()
+        try:
+            async with AsyncGlitterClient(slow.url, self.node.url,
+                                          hedge_percentile=90) as client:
+                for _ in range(30):
+                    await client.chain.health()
+                slow.delay = 1
+                res = await asyncio.wait_for(client.chain.block(height=2),
+                                             timeout=0.8)
+                self.assertIn('block', res['result'])
+        finally:
+            slow.stop()
+
+    async def test_fails_over_dead_node(self):
+        dead = FakeNode()
+        dead_url = dead.url
+        dead.stop()
+        async with AsyncGlitterClient(dead_url, self.node.url) as client:
+            res = await client.chain.health()
+            self.assertEqual(res['result'], {})
+            dead_conn = client.transport.connection_pool.connections[0]
+            self.assertIsNotNone(dead_conn.backoff_time)
+
+    async def test_times_out_when_all_nodes_are_down(self):
+        dead = FakeNode()
+        dead_url = dead.url
+        dead.stop()
+        async with AsyncGlitterClient(dead_url, timeout=1) as client:
+            with self.assertRaises(TimeoutError):
+                await client.chain.health()
+
+
+if __name__ == '__main__':
+    unittest.main()
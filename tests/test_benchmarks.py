@@ -0,0 +1,105 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Smoke test of the benchmark suite."""
+
+import unittest
+
+import requests
+
+from benchmarks import bench_client, bench_faults, bench_import
+from tests.fake_node import FakeNode
+
+
+class BenchClientTest(unittest.TestCase):
+
+    def test_run(self):
+        results = bench_client.run(calls=5, threads=2, payload=100,
+                                   modes=('sync', 'threads'))
+        self.assertEqual([(r.op, r.mode) for r in results][:2],
+                         [('put_doc', 'sync'), ('put_doc', 'threads')])
+        self.assertEqual(len(results), 8)
+        for r in results:
+            self.assertEqual(r.calls, 5)
+            self.assertLessEqual(r.p50, r.p99)
+
+    def test_percentile(self):
+        samples = list(range(100))
+        self.assertEqual(bench_client.percentile(samples, 50), 50)
+        self.assertEqual(bench_client.percentile(samples, 99), 99)
+        self.assertEqual(bench_client.percentile([], 50), 0.0)
+
+
+class BenchImportTest(unittest.TestCase):
+
+    def test_backends_are_imported_lazily(self):
+        package, client, async_client = bench_import.run(
+            ('package', 'client_init', 'async_client'), repeat=1)
+        self.assertEqual(package.modules, [])
+        self.assertNotIn('requests', client.modules)
+        self.assertNotIn('aiohttp', client.modules)
+        self.assertIn('aiohttp', async_client.modules)
+        self.assertNotIn('requests', async_client.modules)
+
+
+class FaultInjectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = FakeNode().start()
+        self.url = self.node.url + '/v1/list_schema'
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_refuse_and_heal(self):
+        self.node.refuse()
+        with self.assertRaises(requests.ConnectionError):
+            requests.get(self.url, timeout=1)
+        self.node.heal()
+        self.assertEqual(requests.get(self.url, timeout=1).status_code, 200)
+
+    def test_blackhole(self):
+        self.node.blackhole()
+        with self.assertRaises(requests.Timeout):
+            requests.get(self.url, timeout=0.1)
+        self.node.heal()
+        self.assertEqual(requests.get(self.url, timeout=1).status_code, 200)
+
+    def test_error_and_slow(self):
+        self.node.error(503)
+        self.assertEqual(requests.get(self.url, timeout=1).status_code, 503)
+        self.node.heal()
+        self.node.slow(0.2)
+        with self.assertRaises(requests.Timeout):
+            requests.get(self.url, timeout=0.05)
+
+    def test_scenario(self):
+        report = bench_faults.run_scenario('refuse', 'priority', nodes=2,
+                                           threads=2, duration=0.4)
+        self.assertEqual((report.fault, report.picker), ('refuse', 'priority'))
+        self.assertEqual(report.errors, 0)
+        self.assertGreater(report.throughput_after, 0)
+        self.assertIsNotNone(report.time_to_failover)
+
+    def test_time_to_failover(self):
+        Sample = bench_faults._Sample
+        samples = [Sample(0.5, 0.6, False, True)] + \
+            [Sample(0.6 + i / 100, 0.7, True, False) for i in range(3)]
+        self.assertAlmostEqual(
+            bench_faults.time_to_failover(samples, 0.5, run=3), 0.1)
+        self.assertIsNone(bench_faults.time_to_failover(samples, 0.5, run=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the persistent store of chain data."""
+
+import os
+import tempfile
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.block_store import BlockStore
+from tests.fake_node import FakeNode
+
+
+class BlockStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = FakeNode().start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'blocks.db')
+
+    def tearDown(self):
+        self.node.stop()
+        self.tmp.cleanup()
+
+    def test_survives_restarts(self):
+        store = BlockStore(self.path)
+        client = GlitterClient(self.node.url, block_store=store)
+        first = client.chain.block(height=5)
+        client.chain.header(height=5)
+        client.chain.header_by_hash(self.node.state.block_hash(5))
+        store.close()
+
+        store = BlockStore(self.path)
+        client = GlitterClient(self.node.url, block_store=store)
+        self.assertEqual(client.chain.block(height=5), first)
+        client.chain.header(height=5)
+        client.chain.header_by_hash(self.node.state.block_hash(5))
+        self.assertEqual(self.node.count('/v1/chain/block'), 1)
+        self.assertEqual(self.node.count('/v1/chain/header'), 1)
+        self.assertEqual(self.node.count('/v1/chain/header_by_hash'), 1)
+        self.assertEqual(store.hits, 3)
+
+    def test_latest_block_is_stored_by_height(self):
+        store = BlockStore()
+        client = GlitterClient(self.node.url, block_store=store)
+        client.chain.block()
+        client.chain.block()
+        self.assertEqual(self.node.count('/v1/chain/block'), 2)
+        self.assertEqual(store.last_height, 100)
+        client.chain.block(height=100)
+        self.assertEqual(self.node.count('/v1/chain/block'), 2)
+
+    def test_blockchain_above_last_height_is_not_stored(self):
+        client = GlitterClient(self.node.url, block_store=BlockStore())
+        client.chain.blockchain(81, 100)
+        client.chain.blockchain(81, 100)
+        client.chain.blockchain(101, 120)
+        client.chain.blockchain(101, 120)
+        self.assertEqual(self.node.count('/v1/chain/blockchain'), 3)
+
+    def test_eviction(self):
+        store = BlockStore(max_entries=3)
+        for height in range(5):
+            store.put('block', height, {'result': height})
+        self.assertEqual(len(store), 3)
+        self.assertIsNone(store.get('block', 1))
+        self.assertEqual(store.get('block', 4), {'result': 4})
+
+
+class AsyncBlockStoreTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_blocks_are_stored(self):
+        node = FakeNode().start()
+        try:
+            async with AsyncGlitterClient(node.url,
+                                          block_store=BlockStore()) as client:
+                await client.chain.block(height=3)
+                res = await client.chain.block(height=3)
+                self.assertEqual(res['result']['block']['header']['height'],
+                                 '3')
+                self.assertEqual(node.count('/v1/chain/block'), 1)
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the client side caches."""
+
+import time
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.cache import TTLCache
+from tests.fake_node import FakeNode
+
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+]
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1})
+
+    def test_expiry_and_invalidation(self):
+        cache = TTLCache(ttl=0.05)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.invalidate('b')
+        self.assertIsNone(cache.get('b'))
+        time.sleep(0.05)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class SchemaCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = FakeNode().start()
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_schema_reads_are_cached(self):
+        client = GlitterClient(self.node.url, schema_cache=TTLCache())
+        client.db.create_schema("demo", FIELDS)
+        for _ in range(5):
+            self.assertEqual(client.db.get_schema("demo")["code"], 0)
+            client.db.list_schema()
+        self.assertEqual(self.node.count('/v1/show_schema'), 1)
+        self.assertEqual(self.node.count('/v1/list_schema'), 1)
+        self.assertEqual(client.schema_cache.hits, 8)
+
+        client.db.create_schema("other", FIELDS)
+        self.assertIn("other", client.db.list_schema()["data"])
+        self.assertEqual(self.node.count('/v1/list_schema'), 2)
+
+    def test_errors_are_not_cached(self):
+        client = GlitterClient(self.node.url, schema_cache=TTLCache())
+        self.assertNotEqual(client.db.get_schema("demo")["code"], 0)
+        client.db.create_schema("demo", FIELDS)
+        self.assertEqual(client.db.get_schema("demo")["code"], 0)
+
+    def test_no_cache_by_default(self):
+        client = GlitterClient(self.node.url)
+        client.db.list_schema()
+        client.db.list_schema()
+        self.assertEqual(self.node.count('/v1/list_schema'), 2)
+
+
+class AsyncSchemaCacheTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_schema_reads_are_cached(self):
+        node = FakeNode().start()
+        try:
+            async with AsyncGlitterClient(node.url,
+                                          schema_cache=TTLCache()) as client:
+                await client.db.create_schema("demo", FIELDS)
+                for _ in range(3):
+                    res = await client.db.get_schema("demo")
+                    self.assertEqual(res["code"], 0)
+                self.assertEqual(node.count('/v1/show_schema'), 1)
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the JSON codecs and the way connections use them."""
+
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.codec import AVAILABLE_CODECS, JSONCodec, get_codec
+from glitter_sdk.exceptions import TransportError
+from tests.fake_node import FakeNode
+
+DOC = {"title": "café", "n": [1, 2.5, None, True], "big": 2 ** 70}
+
+
+class CodecTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        for name in AVAILABLE_CODECS:
+            codec = get_codec(name)
+            data = codec.dumps(DOC)
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(codec.loads(data), DOC)
+            self.assertEqual(codec.loads(data.decode()), DOC)
+            with self.assertRaises(ValueError):
+                codec.loads(b"<html>")
+
+    def test_get_codec(self):
+        self.assertEqual(get_codec().name, AVAILABLE_CODECS[0])
+        codec = JSONCodec()
+        self.assertIs(get_codec(codec), codec)
+        with self.assertRaises(ValueError):
+            get_codec("yaml")
+
+
+class ConnectionCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = FakeNode().start()
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_bodies_are_encoded_by_the_codec(self):
+        for name in AVAILABLE_CODECS:
+            client = GlitterClient(self.node.url, codec=name)
+            conn = client.transport.connection_pool.connections[0]
+            self.assertEqual(conn.codec.name, name)
+            res = client.db.create_schema(
+                name, [{"name": "doi", "type": "string", "primary": "true"}])
+            self.assertEqual(res["code"], 0)
+            self.assertEqual(self.node.requests[-1][3]["schema_name"], name)
+            self.assertEqual(self.node.request_headers[-1]["Content-Type"],
+                             "application/json")
+
+    def test_error_replies_keep_the_text(self):
+        self.node.fail_status = 503
+        client = GlitterClient(self.node.url)
+        with self.assertRaises(TransportError) as ctx:
+            client.chain.health()
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertIn("injected failure", ctx.exception.error)
+        self.assertEqual(ctx.exception.info["code"], 503)
+
+
+class AsyncConnectionCodecTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_roundtrip(self):
+        node = FakeNode().start()
+        try:
+            async with AsyncGlitterClient(node.url, codec="json") as client:
+                await client.db.create_schema(
+                    "demo", [{"name": "doi", "type": "string"}])
+                res = await client.db.list_schema()
+                self.assertIn("demo", res["data"])
+                self.assertEqual(node.request_headers[0]["Content-Type"],
+                                 "application/json")
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the compression of the request bodies and of the replies."""
+
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.compression import (AVAILABLE_COMPRESSORS, GzipCompressor,
+                                     get_compressor)
+from glitter_sdk.metrics import Metrics
+from tests.fake_node import FakeNode, decompress
+
+FIELDS = [{"name": "doi", "type": "string", "primary": "true"},
+          {"name": "body", "type": "string"}]
+
+
+class CompressorTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        data = b'{"body": "' + b'x' * 4096 + b'"}'
+        for name in AVAILABLE_COMPRESSORS:
+            compressor = get_compressor(name)
+            compressed = compressor.compress(data)
+            self.assertLess(len(compressed), len(data))
+            self.assertEqual(decompress(compressed, compressor.encoding), data)
+        self.assertEqual(decompress(data, None), data)
+
+    def test_get_compressor(self):
+        self.assertIsNone(get_compressor())
+        compressor = GzipCompressor(level=1)
+        self.assertIs(get_compressor(compressor), compressor)
+        with self.assertRaises(ValueError):
+            get_compressor("lzma")
+
+
+class ConnectionCompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = FakeNode().start()
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_large_bodies_are_compressed(self):
+        client = GlitterClient(self.node.url, compression="gzip",
+                               compress_min_size=512)
+        client.db.create_schema("demo", FIELDS)
+        self.assertNotIn("Content-Encoding", self.node.request_headers[-1])
+        doc = {"doi": "1", "body": "b" * 4096}
+        self.assertEqual(client.db.put_doc("demo", doc)["code"], 0)
+        self.assertEqual(self.node.request_headers[-1]["Content-Encoding"],
+                         "gzip")
+        self.assertEqual(self.node.requests[-1][3]["doc_data"], doc)
+        self.assertLess(self.node.bytes_received, 1024)
+
+    def test_node_refusing_compression(self):
+        self.node.request_encodings = ()
+        client = GlitterClient(self.node.url, compression="gzip",
+                               compress_min_size=0)
+        self.assertEqual(client.db.create_schema("demo", FIELDS)["code"], 0)
+        self.assertEqual(
+            [h.get("Content-Encoding") for h in self.node.request_headers],
+            ["gzip", None])
+        conn = client.transport.connection_pool.connections[0]
+        self.assertIsNone(conn.compressor)
+        client.db.list_schema()
+        client.db.put_doc("demo", {"doi": "1", "body": "b" * 4096})
+        self.assertEqual(len(self.node.requests), 4)
+
+    def test_compressed_replies(self):
+        self.node.compress_replies = True
+        self.node.payload_size = 8192
+        metrics = Metrics()
+        client = GlitterClient(self.node.url, metrics=metrics)
+        res = client.db.list_schema()
+        self.assertEqual(res["padding"], "x" * 8192)
+        self.assertIn("gzip", self.node.request_headers[-1]["Accept-Encoding"])
+        sizes = metrics.histogram("glitter_response_size_bytes",
+                                  node=self.node.url,
+                                  endpoint="/v1/list_schema")
+        self.assertEqual(sizes.sum, self.node.bytes_sent)
+        self.assertLess(sizes.sum, 1024)
+
+
+class AsyncConnectionCompressionTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_compression(self):
+        node = FakeNode(compress_replies=True, payload_size=8192).start()
+        try:
+            async with AsyncGlitterClient(node.url, compression="gzip",
+                                          compress_min_size=0) as client:
+                await client.db.create_schema("demo", FIELDS)
+                res = await client.db.list_schema()
+                self.assertEqual(res["padding"], "x" * 8192)
+                self.assertEqual(node.request_headers[0]["Content-Encoding"],
+                                 "gzip")
+                self.assertEqual(node.requests[0][3]["schema_name"], "demo")
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
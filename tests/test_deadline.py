@@ -0,0 +1,155 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the deadlines of the calls and the per-attempt timeouts."""
+
+import time
+import unittest
+
+from requests.exceptions import Timeout
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.async_connection import AsyncConnection
+from glitter_sdk.connection import Connection
+from glitter_sdk.deadline import Deadline, current_deadline
+from glitter_sdk.driver import _Executor
+from glitter_sdk.exceptions import TimeoutError
+from glitter_sdk.pool import PriorityPicker
+from tests.fake_node import FakeNode, FakeState
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def test_budget(self):
+        deadline = Deadline(10, connect=0.5, read=20, attempt=2)
+        self.assertFalse(deadline.expired())
+        self.assertGreater(deadline.remaining(), 9)
+        self.assertEqual(deadline.attempt_timeout(), 2)
+        self.assertEqual(deadline.attempt_timeouts(), (0.5, 2))
+        self.assertTrue(Deadline(0).expired())
+        unbounded = Deadline()
+        self.assertIsNone(unbounded.remaining())
+        self.assertFalse(unbounded.expired())
+        self.assertEqual(unbounded.attempt_timeouts(), (None, None))
+
+    def test_current_deadline(self):
+        self.assertIsNone(current_deadline())
+        with Deadline(1) as outer:
+            self.assertIs(current_deadline(), outer)
+            with Deadline(60) as inner:
+                self.assertIs(current_deadline(), inner)
+                self.assertLessEqual(inner.remaining(), 1)
+            self.assertIs(current_deadline(), outer)
+            with _Executor(max_workers=1) as executor:
+                self.assertIs(executor.submit(current_deadline).result(),
+                              outer)
+        self.assertIsNone(current_deadline())
+
+    def test_connection_timeouts(self):
+        self.assertEqual(Connection._timeout(3, None), 3)
+        connect, read = Connection._timeout(3, Deadline(5, read=1))
+        self.assertAlmostEqual(connect, 5, places=2)
+        self.assertEqual(read, 1)
+
+    def test_no_time_left(self):
+        # The libraries reject (requests) or ignore (aiohttp) a zero timeout.
+        for connection_class in (Connection, AsyncConnection):
+            with self.assertRaises(TimeoutError):
+                connection_class._timeout(None, Deadline(0))
+            with self.assertRaises(TimeoutError):
+                connection_class._timeout(0, None)
+
+
+class HungNodeTest(unittest.TestCase):
+
+    def setUp(self):
+        state = FakeState()
+        self.hung = FakeNode(state).start()
+        self.healthy = FakeNode(state).start()
+        self.hung.blackhole()
+
+    def tearDown(self):
+        self.hung.stop()
+        self.healthy.stop()
+
+    def client(self, **kwargs):
+        return GlitterClient(self.hung.url, self.healthy.url,
+                             picker_class=PriorityPicker, **kwargs)
+
+    def test_reads_are_retried_when_the_attempt_times_out(self):
+        client = self.client(timeout=5, attempt_timeout=0.2)
+        start = time.monotonic()
+        client.chain.health()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(len(self.hung.requests), 1)
+        self.assertEqual(len(self.healthy.requests), 1)
+
+    def test_writes_are_not_retried(self):
+        client = self.client(timeout=5, attempt_timeout=0.2)
+        with self.assertRaises(Timeout):
+            client.db.put_doc("demo", {"doi": "1"})
+        self.assertEqual(self.healthy.requests, [])
+
+    def test_deadline_bounds_the_call(self):
+        client = self.client(timeout=20)
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError) as ctx:
+            with Deadline(0.2):
+                client.chain.health()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIsInstance(ctx.exception.__cause__, Timeout)
+
+    def test_explicit_deadline(self):
+        client = self.client(timeout=20)
+        res = client.transport.forward_request(
+            'GET', '/v1/chain/health', deadline=Deadline(5, attempt=0.2))
+        self.assertIsNotNone(res)
+
+
+class AsyncHungNodeTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reads_are_retried_when_the_attempt_times_out(self):
+        state = FakeState()
+        hung = FakeNode(state).start()
+        healthy = FakeNode(state).start()
+        hung.blackhole()
+        try:
+            async with AsyncGlitterClient(
+                    hung.url, healthy.url, picker_class=PriorityPicker,
+                    timeout=5) as client:
+                start = time.monotonic()
+                with Deadline(5, attempt=0.2):
+                    await client.chain.health()
+                self.assertLess(time.monotonic() - start, 1)
+                self.assertEqual(len(healthy.requests), 1)
+        finally:
+            hung.stop()
+            healthy.stop()
+
+    async def test_deadline_bounds_the_call(self):
+        hung = FakeNode().start()
+        hung.blackhole()
+        try:
+            async with AsyncGlitterClient(hung.url, timeout=20) as client:
+                start = time.monotonic()
+                with self.assertRaises(TimeoutError):
+                    with Deadline(0.2):
+                        await client.chain.health()
+                self.assertLess(time.monotonic() - start, 1)
+        finally:
+            hung.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
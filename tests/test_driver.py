@@ -0,0 +1,205 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the driver namespaces against in-process nodes."""
+
+import os
+import tempfile
+import time
+import unittest
+
+from glitter_sdk import GlitterClient
+from glitter_sdk.exceptions import ResponseError
+from tests.fake_node import FakeNode, FakeState
+
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+    {"name": "title", "type": "string", "index": {"type": "text"}},
+]
+
+
+class DataBaseTest(unittest.TestCase):
+    schema_name = "demo"
+
+    def setUp(self):
+        state = FakeState()
+        self.nodes = [FakeNode(state).start() for _ in range(3)]
+        self.client = GlitterClient(*[n.url for n in self.nodes])
+        self.client.db.create_schema(self.schema_name, FIELDS)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop()
+
+    def test_put_docs(self):
+        docs = ({"doi": str(i), "title": "title %d" % i} for i in range(95))
+        results = list(self.client.db.put_docs(self.schema_name, docs,
+                                               chunk_size=10,
+                                               max_in_flight=4))
+        self.assertEqual(sorted(r.index for r in results), list(range(95)))
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertIsNotNone(result.tx)
+            self.assertEqual(result.doc["doi"], str(result.index))
+        res = self.client.db.app_status()
+        self.assertEqual(res["data"]["schema_state"]["demo"]["count"], 95)
+
+    def test_put_docs_yields_each_doc_when_done(self):
+        for node in self.nodes:
+            node.delay = 0.05
+        docs = [{"doi": str(i), "title": "t"} for i in range(10)]
+        start = time.monotonic()
+        results = self.client.db.put_docs(self.schema_name, docs,
+                                          chunk_size=10, max_in_flight=1)
+        first = next(results)
+        # The chunk takes ten round-trips, its first document only one.
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual(first.index, 0)
+        self.assertEqual(len(list(results)), 9)
+
+    def test_put_docs_reports_errors_per_doc(self):
+        docs = [{"doi": "1", "title": "ok"}]
+        results = list(self.client.db.put_docs("missing", docs))
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0].tx)
+        self.assertEqual(results[0].response["code"], 505)
+
+        dead = FakeNode()
+        client = GlitterClient(dead.url, timeout=0.5)
+        dead.stop()
+        results = list(client.db.put_docs(self.schema_name, docs))
+        self.assertIsNotNone(results[0].error)
+
+    def test_put_docs_reports_a_bad_doc(self):
+        docs = [{"doi": "1", "title": object()}, {"doi": "2", "title": "ok"}]
+        results = sorted(self.client.db.put_docs(self.schema_name, docs),
+                         key=lambda r: r.index)
+        self.assertIsInstance(results[0].error, TypeError)
+        self.assertIsNone(results[1].error)
+        self.assertIsNotNone(results[1].tx)
+
+    def test_get_docs_sharded(self):
+        docs = [{"doi": str(i), "title": "title %d" % i} for i in range(40)]
+        list(self.client.db.put_docs(self.schema_name, docs))
+        keys = [str(i) for i in range(45, -1, -1)] + ["3", "3"]
+
+        single = self.client.db.get_docs(self.schema_name, keys)
+        res = self.client.db.get_docs(self.schema_name, keys, shard_size=7)
+        self.assertEqual(res["code"], 0)
+        self.assertEqual(res["data"]["total"], 40)
+        self.assertEqual(res["data"]["hits"], single["data"]["hits"])
+        self.assertEqual(list(res["data"]["hits"]),
+                         [str(i) for i in range(39, -1, -1)])
+        requests = sum(n.count('/v1/get_docs') for n in self.nodes)
+        self.assertEqual(requests, 1 + 7)
+
+        streamed = dict(self.client.db.iter_docs(self.schema_name, keys,
+                                                 shard_size=7))
+        self.assertEqual(streamed, res["data"]["hits"])
+
+        res = self.client.db.get_docs("missing", keys, shard_size=7)
+        self.assertNotEqual(res["code"], 0)
+        with self.assertRaises(ResponseError):
+            list(self.client.db.iter_docs("missing", keys, shard_size=7))
+
+    def test_search_iter(self):
+        docs = [{"doi": "%03d" % i, "title": "title %d" % i}
+                for i in range(53)]
+        list(self.client.db.put_docs(self.schema_name, docs))
+        hits = list(self.client.db.search_iter(self.schema_name, "title",
+                                               ["title"], page_size=10))
+        self.assertEqual([h["data"]["doi"] for h in hits],
+                         ["%03d" % i for i in range(53)])
+        searches = sum(n.count('/v1/search') for n in self.nodes)
+        self.assertEqual(searches, 6)
+
+        hits = self.client.db.search_iter(self.schema_name, "title",
+                                          ["title"], page_size=10)
+        self.assertEqual(next(hits)["data"]["doi"], "000")
+        hits.close()
+
+        self.assertEqual(list(self.client.db.search_iter(
+            self.schema_name, "nothing", ["title"], prefetch=False)), [])
+        with self.assertRaises(ResponseError):
+            list(self.client.db.search_iter("missing", "x", ["title"]))
+
+
+class ChainTest(unittest.TestCase):
+
+    def setUp(self):
+        state = FakeState(height=250)
+        state.txs = ["TX%03d" % i for i in range(230)]
+        self.nodes = [FakeNode(state).start() for _ in range(3)]
+        self.client = GlitterClient(*[n.url for n in self.nodes])
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop()
+
+    def test_tx_search_all(self):
+        txs = list(self.client.chain.tx_search_all("tx.height>0", per_page=20,
+                                                   max_workers=3))
+        self.assertEqual([tx["hash"] for tx in txs],
+                         ["TX%03d" % i for i in range(230)])
+        params = [r[2] for n in self.nodes for r in n.requests]
+        self.assertEqual(len(params), 12)
+        self.assertTrue(all(p["prove"] == "false" for p in params))
+
+        txs = self.client.chain.tx_search_all("tx.height>0", per_page=20,
+                                              ordered=False)
+        self.assertEqual(sorted(tx["hash"] for tx in txs),
+                         ["TX%03d" % i for i in range(230)])
+
+    def test_block_search_all(self):
+        blocks = list(self.client.chain.block_search_all(
+            "block.height>0", order_by="desc"))
+        heights = [int(b["block"]["header"]["height"]) for b in blocks]
+        self.assertEqual(heights, list(range(250, 0, -1)))
+
+    def test_scan(self):
+        progress = []
+        blocks = self.client.chain.scan(5, 64, window=7, max_workers=3,
+                                        on_progress=progress.append)
+        heights = [int(b["block"]["header"]["height"]) for b in blocks]
+        self.assertEqual(heights, list(range(5, 65)))
+        self.assertTrue(all(n.requests for n in self.nodes))
+        self.assertEqual([p.height for p in progress][-2:], [60, 64])
+        self.assertEqual(progress[-1].blocks, 60)
+
+        metas = list(self.client.chain.scan(headers_only=True, window=50))
+        heights = [int(m["header"]["height"]) for m in metas]
+        self.assertEqual(heights, list(range(1, 251)))
+
+    def test_scan_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "scan")
+            scan = self.client.chain.scan(1, 100, window=10, max_workers=2,
+                                          checkpoint=checkpoint)
+            for block in scan:
+                if block["block"]["header"]["height"] == "35":
+                    break
+            scan.close()
+            with open(checkpoint) as f:
+                self.assertEqual(f.read(), "30")
+
+            blocks = self.client.chain.scan(1, 100, checkpoint=checkpoint)
+            heights = [int(b["block"]["header"]["height"]) for b in blocks]
+            self.assertEqual(heights, list(range(31, 101)))
+            with open(checkpoint) as f:
+                self.assertEqual(f.read(), "100")
+
+
+if __name__ == '__main__':
+    unittest.main()
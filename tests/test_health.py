@@ -0,0 +1,172 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the circuit breakers and the health checkers."""
+
+import asyncio
+import time
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.exceptions import ServiceUnavailable
+from glitter_sdk.health import (AsyncHealthChecker, CircuitBreaker,
+                                HealthChecker, CLOSED, HALF_OPEN, OPEN)
+from tests.fake_node import FakeNode, FakeState
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_states(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_time=0.1)
+        breaker.record(success=False)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(success=False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.available())
+
+        time.sleep(0.1)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.record(success=False)
+        self.assertEqual(breaker.state, OPEN)
+
+        time.sleep(0.1)
+        breaker.record(success=True)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_server_errors_open_the_breaker(self):
+        bad = FakeNode(fail_status=503).start()
+        good = FakeNode().start()
+        try:
+            client = GlitterClient(bad.url, good.url, breaker_threshold=2)
+            for _ in range(2):
+                with self.assertRaises(ServiceUnavailable):
+                    client.chain.health()
+                client.chain.health()
+            bad_conn = client.transport.connection_pool.connections[0]
+            self.assertEqual(bad_conn.breaker.state, OPEN)
+
+            for _ in range(10):
+                client.chain.health()
+            self.assertEqual(len(bad.requests), 2)
+        finally:
+            bad.stop()
+            good.stop()
+
+    def test_unencodable_body_is_not_a_node_failure(self):
+        node = FakeNode().start()
+        try:
+            client = GlitterClient(node.url, breaker_threshold=2,
+                                   concurrency_limit=4)
+            connection = client.transport.connection_pool.connections[0]
+            for _ in range(3):
+                with self.assertRaises(TypeError):
+                    client.db.put_doc("demo", {"doi": object()})
+            self.assertEqual(connection.breaker.state, CLOSED)
+            self.assertIsNone(connection.backoff_time)
+            self.assertEqual(connection.limiter.limit, 4)
+            self.assertEqual(connection.limiter.in_flight, 0)
+            self.assertEqual(node.requests, [])
+        finally:
+            node.stop()
+
+
+class HealthCheckerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [FakeNode(FakeState(height=100)).start(),
+                      FakeNode(FakeState(height=50)).start()]
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop()
+
+    def test_lagging_node_is_ejected(self):
+        client = GlitterClient(*[n.url for n in self.nodes])
+        status = HealthChecker(client, max_lag=10).check()
+        self.assertEqual(status[self.nodes[0].url].lag, 0)
+        self.assertEqual(status[self.nodes[1].url].lag, 50)
+
+        lagging = client.transport.connection_pool.connections[1]
+        self.assertEqual(lagging.breaker.state, OPEN)
+        for _ in range(5):
+            client.chain.block()
+        self.assertEqual(self.nodes[1].count('/v1/chain/block'), 0)
+
+        self.nodes[1].state.height = 100
+        HealthChecker(client, max_lag=10).check()
+        lagging.breaker.recovery_time = 0
+        HealthChecker(client, max_lag=10).check()
+        self.assertEqual(lagging.breaker.state, CLOSED)
+
+    def test_probe_does_not_close_the_breaker_of_a_lagging_node(self):
+        client = GlitterClient(*[n.url for n in self.nodes])
+        checker = HealthChecker(client, max_lag=10)
+        checker.check()
+        lagging = client.transport.connection_pool.connections[1]
+        # The other probes of a round may take a while: until the round
+        # ends, the lagging node must stay out of rotation.
+        checker._probe(lagging)
+        self.assertEqual(lagging.breaker.state, OPEN)
+        checker.check()
+        self.assertEqual(lagging.breaker.state, OPEN)
+
+    def test_probe_ignores_the_backoff(self):
+        client = GlitterClient(self.nodes[0].url)
+        connection = client.transport.connection_pool.connections[0]
+        backoff_time = connection.backoff_time = time.monotonic() + 1024
+        health = HealthChecker(client, timeout=1).check()[connection.node_url]
+        self.assertIsNone(health.error)
+        self.assertEqual(health.height, 100)
+        self.assertEqual(connection.backoff_time, backoff_time)
+
+    def test_background_thread(self):
+        client = GlitterClient(*[n.url for n in self.nodes])
+        checker = HealthChecker(client, interval=0.01).start()
+        time.sleep(0.1)
+        checker.stop()
+        self.assertEqual(len(checker.status), 2)
+
+
+class AsyncHealthCheckerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_lagging_node_is_ejected(self):
+        nodes = [FakeNode(FakeState(height=100)).start(),
+                 FakeNode(FakeState(height=50)).start()]
+        try:
+            async with AsyncGlitterClient(*[n.url for n in nodes]) as client:
+                checker = AsyncHealthChecker(client, interval=0.01).start()
+                await checker.check()
+                await checker.stop()
+                lagging = client.transport.connection_pool.connections[1]
+                self.assertEqual(lagging.breaker.state, OPEN)
+        finally:
+            for node in nodes:
+                node.stop()
+
+    async def test_cancelled_request_is_not_recorded(self):
+        node = FakeNode(delay=0.5).start()
+        try:
+            async with AsyncGlitterClient(node.url) as client:
+                conn = client.transport.connection_pool.connections[0]
+                for _ in range(2):
+                    conn.breaker.record(success=False)
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(client.chain.health(), 0.1)
+                self.assertEqual(conn.breaker.failures, 2)
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the request lifecycle hooks."""
+
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.hooks import RequestHooks, SlowCallSampler
+from tests.fake_node import FakeNode
+
+
+class Recorder(RequestHooks):
+
+    def __init__(self):
+        self.events = []
+
+    def before_send(self, call, node):
+        self.events.append(('send', call.call_id, node))
+
+    def after_response(self, call, attempt):
+        self.events.append(('response', call.call_id, attempt.node,
+                            attempt.number, attempt.status))
+
+    def on_retry(self, call, error):
+        self.events.append(('retry', call.call_id))
+
+    def on_node_switch(self, call, previous, node):
+        self.events.append(('switch', call.call_id, previous, node))
+
+
+class Broken(RequestHooks):
+
+    def before_send(self, call, node):
+        raise RuntimeError("broken hook")
+
+
+class HooksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.live = FakeNode().start()
+        self.dead = FakeNode()
+        self.dead.stop()
+
+    def tearDown(self):
+        self.live.stop()
+
+    def test_retry_is_correlated_to_its_call(self):
+        recorder = Recorder()
+        client = GlitterClient(self.dead.url, self.live.url,
+                               hooks=[recorder, Broken()])
+        self.assertIn("result", client.chain.health())
+
+        call_ids = {event[1] for event in recorder.events}
+        self.assertEqual(len(call_ids), 1)
+        self.assertEqual([event[0] for event in recorder.events],
+                         ['send', 'response', 'retry', 'switch',
+                          'send', 'response'])
+        self.assertEqual(recorder.events[1][2:], (self.dead.url, 1, 'error'))
+        self.assertEqual(recorder.events[3][2:], (self.dead.url, self.live.url))
+        self.assertEqual(recorder.events[5][2:], (self.live.url, 2, '200'))
+
+        client.chain.health()
+        self.assertEqual(len({event[1] for event in recorder.events}), 2)
+
+    def test_slow_call_sampler(self):
+        slow = FakeNode(delay=0.05).start()
+        try:
+            seen = []
+            sampler = SlowCallSampler(threshold=0.04, callback=seen.append)
+            client = GlitterClient(slow.url, hooks=sampler)
+            client.db.create_schema("demo", [{"name": "doi", "type": "string"}])
+            self.assertEqual(len(sampler.samples), 1)
+            sample = sampler.samples[0]
+            self.assertEqual((sample.path, sample.node, sample.status),
+                             ('/v1/create_schema', slow.url, '200'))
+            self.assertGreater(sample.request_size, 0)
+            self.assertEqual(seen, [sample])
+
+            client = GlitterClient(self.live.url, hooks=sampler)
+            client.chain.health()
+            self.assertEqual(len(sampler.samples), 1)
+        finally:
+            slow.stop()
+
+
+class AsyncHooksTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_attempts_are_reported(self):
+        node = FakeNode().start()
+        recorder = Recorder()
+        try:
+            async with AsyncGlitterClient(node.url, hooks=recorder) as client:
+                await client.chain.health()
+            self.assertEqual([event[0] for event in recorder.events],
+                             ['send', 'response'])
+            self.assertEqual(recorder.events[1][4], '200')
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the per-node rate and concurrency limits."""
+
+import asyncio
+import time
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.exceptions import ServiceUnavailable, TimeoutError
+from glitter_sdk.limiter import (AsyncConcurrencyLimiter, ConcurrencyLimiter,
+                                 TokenBucket)
+from glitter_sdk.pool import PriorityPicker
+from tests.fake_node import FakeNode, FakeState
+
+
+def _overload():
+    return ServiceUnavailable(503, 'error', None, 'http://node', {})
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(10, burst=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertIsNone(bucket.reserve(max_wait=0.1))
+
+
+class ConcurrencyLimiterTest(unittest.TestCase):
+
+    def test_acquire_up_to_the_limit(self):
+        limiter = ConcurrencyLimiter(2)
+        first = limiter.acquire()
+        limiter.acquire()
+        self.assertFalse(limiter.available())
+        self.assertIsNone(limiter.try_acquire())
+        with self.assertRaises(TimeoutError):
+            limiter.acquire(timeout=0.01)
+        limiter.release(first)
+        self.assertTrue(limiter.available())
+
+    def test_decrease_once_per_congestion(self):
+        limiter = ConcurrencyLimiter(10, backoff_ratio=0.5)
+        tokens = [limiter.acquire() for _ in range(4)]
+        for token in tokens:
+            limiter.release(token, error=_overload())
+        # The requests in flight at the first failure saw the same congestion.
+        self.assertEqual(limiter.limit, 5)
+        limiter.release(limiter.acquire(), error=_overload())
+        self.assertEqual(limiter.limit, 2.5)
+        for _ in range(10):
+            limiter.release(limiter.acquire(), error=_overload())
+        self.assertEqual(limiter.limit, 1)
+
+    def test_increase_when_busy(self):
+        limiter = ConcurrencyLimiter(2, max_limit=3)
+        limiter.release(limiter.acquire(), latency=0.01)
+        self.assertEqual(limiter.limit, 2.5)
+        held = limiter.acquire()
+        for _ in range(10):
+            limiter.release(limiter.acquire(), latency=0.01)
+        self.assertEqual(limiter.limit, 3)
+        limiter.release(held)
+        idle = ConcurrencyLimiter(10)
+        idle.release(idle.acquire(), latency=0.01)
+        self.assertEqual(idle.limit, 10)
+
+    def test_decrease_on_latency(self):
+        limiter = ConcurrencyLimiter(1, min_limit=0.5, backoff_ratio=0.5)
+        limiter.release(limiter.acquire(), latency=0.01)
+        limit = limiter.limit
+        limiter.release(limiter.acquire(), latency=1)
+        self.assertEqual(limiter.limit, limit / 2)
+
+
+class TransportLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        state = FakeState()
+        self.first = FakeNode(state).start()
+        self.second = FakeNode(state).start()
+
+    def tearDown(self):
+        self.first.stop()
+        self.second.stop()
+
+    def test_rate_limit(self):
+        client = GlitterClient(self.first.url, rate_limit=20, rate_burst=1)
+        start = time.monotonic()
+        for _ in range(4):
+            client.chain.health()
+        self.assertGreater(time.monotonic() - start, 0.12)
+
+    def test_saturated_node_is_skipped(self):
+        client = GlitterClient(self.first.url, self.second.url,
+                               picker_class=PriorityPicker,
+                               concurrency_limit=1)
+        limiter = client.transport.connection_pool.connections[0].limiter
+        token = limiter.acquire()
+        client.chain.health()
+        self.assertEqual(self.first.requests, [])
+        self.assertEqual(len(self.second.requests), 1)
+        limiter.release(token)
+        client.chain.health()
+        self.assertEqual(len(self.first.requests), 1)
+
+
+class AsyncConcurrencyLimiterTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_waiters_are_woken_up(self):
+        limiter = AsyncConcurrencyLimiter(1)
+        token = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        limiter.release(token)
+        self.assertIsNotNone(await asyncio.wait_for(waiter, 1))
+        with self.assertRaises(TimeoutError):
+            await limiter.acquire(timeout=0.01)
+
+    async def test_client(self):
+        state = FakeState()
+        node = FakeNode(state).start()
+        try:
+            async with AsyncGlitterClient(node.url,
+                                          concurrency_limit=2) as client:
+                await asyncio.gather(*[client.chain.health()
+                                       for _ in range(6)])
+                limiter = client.transport.connection_pool.connections[0] \
+                    .limiter
+                self.assertEqual(limiter.in_flight, 0)
+                self.assertEqual(len(node.requests), 6)
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
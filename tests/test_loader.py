@@ -0,0 +1,116 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the micro-batching of get_doc calls."""
+
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.loader import BatchLoader
+from tests.fake_node import FakeNode
+
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+]
+
+
+def get_docs_calls(node):
+    return [r[3]["doc_ids"] for r in node.requests if r[1] == '/v1/get_docs']
+
+
+class BatchLoaderTest(unittest.TestCase):
+
+    def test_batches_by_group_and_size(self):
+        calls = []
+
+        def batch_fn(group, keys):
+            calls.append((group, keys))
+            return {key: group + key for key in keys}
+
+        loader = BatchLoader(batch_fn, window=60, max_batch=3)
+        futures = [loader.submit("a", k) for k in ("1", "2", "1", "3")]
+        other = loader.submit("b", "1")
+        self.assertEqual([f.result() for f in futures], ["a1", "a2", "a1", "a3"])
+        self.assertFalse(other.done())
+        loader.flush()
+        self.assertEqual(other.result(), "b1")
+        self.assertEqual(calls, [("a", ["1", "2", "3"]), ("b", ["1"])])
+
+    def test_errors_reach_every_caller(self):
+        def batch_fn(group, keys):
+            raise RuntimeError("boom")
+
+        loader = BatchLoader(batch_fn, window=0.001)
+        futures = [loader.submit("a", k) for k in "xyz"]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result()
+
+
+class DocBatchingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = FakeNode().start()
+        client = GlitterClient(self.node.url)
+        client.db.create_schema("demo", FIELDS)
+        for i in range(20):
+            client.db.put_doc("demo", {"doi": str(i)})
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_concurrent_get_doc_are_batched(self):
+        client = GlitterClient(self.node.url, doc_batch_window=0.05)
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            replies = list(executor.map(
+                lambda i: client.db.get_doc("demo", str(i)), range(21)))
+        for i, reply in enumerate(replies[:20]):
+            self.assertEqual(list(reply["data"]["hits"]), [str(i)])
+        self.assertEqual(replies[20]["data"]["total"], 0)
+        calls = get_docs_calls(self.node)
+        self.assertLess(len(calls), 21)
+        self.assertEqual(sorted(k for ids in calls for k in ids),
+                         sorted(str(i) for i in range(21)))
+
+    def test_missing_schema_reply_is_shared(self):
+        client = GlitterClient(self.node.url, doc_batch_window=0.01)
+        reply = client.db.get_doc("missing", "1")
+        self.assertNotEqual(reply["code"], 0)
+
+
+class AsyncDocBatchingTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_get_doc_are_batched(self):
+        node = FakeNode().start()
+        try:
+            async with AsyncGlitterClient(node.url, doc_batch_window=0.01,
+                                          doc_batch_size=4) as client:
+                await client.db.create_schema("demo", FIELDS)
+                for i in range(10):
+                    await client.db.put_doc("demo", {"doi": str(i)})
+                replies = await asyncio.gather(
+                    *(client.db.get_doc("demo", str(i)) for i in range(10)))
+                for i, reply in enumerate(replies):
+                    self.assertIn(str(i), reply["data"]["hits"])
+                self.assertEqual([len(ids) for ids in get_docs_calls(node)],
+                                 [4, 4, 2])
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
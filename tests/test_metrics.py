@@ -0,0 +1,146 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the metrics registry and the instrumentation of the transport."""
+
+import asyncio
+import unittest
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.exceptions import ServiceUnavailable, TimeoutError
+from glitter_sdk.metrics import Histogram, Metrics
+from tests.fake_node import FakeNode
+
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+]
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_histogram(self):
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 7):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(),
+                         [(1, 2), (5, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.sum, 11.5)
+
+    def test_prometheus_text(self):
+        metrics = Metrics(latency_buckets=(0.1,))
+        metrics.record_request('http://a', '/v1/x', 'GET', '200', 0.05,
+                               response_size=10)
+        metrics.record_backoff('http://"b"')
+        text = metrics.to_prometheus()
+        self.assertIn('# TYPE glitter_requests_total counter', text)
+        self.assertIn('glitter_requests_total{endpoint="/v1/x",method="GET",'
+                      'node="http://a",status="200"} 1', text)
+        self.assertIn('glitter_backoffs_total{node="http://\\"b\\""} 1', text)
+        self.assertIn('glitter_request_duration_seconds_bucket{'
+                      'endpoint="/v1/x",node="http://a",le="+Inf"} 1', text)
+        self.assertIn('glitter_response_size_bytes_sum{endpoint="/v1/x",'
+                      'node="http://a"} 10', text)
+        self.assertEqual(metrics.counter('glitter_requests_total'), 1)
+        metrics.reset()
+        self.assertEqual(metrics.to_prometheus(), '')
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.live = FakeNode().start()
+        self.dead = FakeNode()
+        self.dead.stop()
+
+    def tearDown(self):
+        self.live.stop()
+
+    def test_requests_retries_and_backoffs(self):
+        metrics = Metrics()
+        client = GlitterClient(self.dead.url, self.live.url, metrics=metrics)
+        client.db.create_schema("demo", FIELDS)
+        for _ in range(4):
+            client.chain.health()
+
+        live, dead = self.live.url, self.dead.url
+        self.assertEqual(metrics.counter('glitter_requests_total', node=live,
+                                         status='200'), 5)
+        self.assertEqual(metrics.counter('glitter_requests_total', node=dead,
+                                         status='error'), 1)
+        self.assertEqual(metrics.counter('glitter_retries_total', node=dead),
+                         1)
+        self.assertEqual(metrics.counter('glitter_backoffs_total', node=dead),
+                         1)
+        sizes = metrics.histogram('glitter_request_size_bytes', node=live,
+                                  endpoint='/v1/create_schema')
+        self.assertEqual(sizes.count, 1)
+        self.assertGreater(sizes.sum, 0)
+        latency = metrics.histogram('glitter_request_duration_seconds',
+                                    node=live, endpoint='/v1/chain/health')
+        self.assertEqual(latency.count, 4)
+
+    def test_error_status_and_timeouts(self):
+        metrics = Metrics()
+        self.live.fail_status = 503
+        client = GlitterClient(self.live.url, metrics=metrics)
+        with self.assertRaises(ServiceUnavailable):
+            client.chain.health()
+        self.assertEqual(metrics.counter('glitter_requests_total',
+                                         status='503'), 1)
+
+        client = GlitterClient(self.dead.url, timeout=0.2, metrics=metrics)
+        with self.assertRaises(TimeoutError):
+            client.chain.health()
+        self.assertEqual(metrics.counter('glitter_timeouts_total',
+                                         endpoint='/v1/chain/health'), 1)
+
+    def test_disabled_by_default(self):
+        client = GlitterClient(self.live.url)
+        client.chain.health()
+        self.assertIsNone(client.transport.metrics)
+
+
+class AsyncInstrumentationTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_requests_are_recorded(self):
+        node = FakeNode().start()
+        metrics = Metrics()
+        try:
+            async with AsyncGlitterClient(node.url, metrics=metrics) as client:
+                await client.chain.health()
+                await client.db.list_schema()
+            self.assertEqual(metrics.counter('glitter_requests_total',
+                                             status='200'), 2)
+            self.assertIsNotNone(metrics.histogram(
+                'glitter_response_size_bytes', node=node.url,
+                endpoint='/v1/list_schema'))
+        finally:
+            node.stop()
+
+    async def test_cancelled_requests(self):
+        node = FakeNode(delay=0.5).start()
+        metrics = Metrics()
+        try:
+            async with AsyncGlitterClient(node.url, metrics=metrics) as client:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(client.chain.health(), 0.1)
+            self.assertEqual(metrics.counter('glitter_requests_total',
+                                             status='cancelled'), 1)
+        finally:
+            node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the connection pickers."""
+
+import unittest
+from collections import Counter
+from time import monotonic
+
+from glitter_sdk.connection import Connection
+from glitter_sdk.pool import (LatencyAwarePicker, Pool, PriorityPicker,
+                              RoundRobinPicker)
+
+
+def make_connections(n):
+    return [Connection(node_url='http://node%d:26659' % i) for i in range(n)]
+
+
+class PickerTest(unittest.TestCase):
+
+    def test_round_robin_spreads_requests(self):
+        conns = make_connections(3)
+        pool = Pool(conns, picker_class=RoundRobinPicker)
+        picked = Counter(pool.get_connection() for _ in range(300))
+        self.assertEqual(set(picked.values()), {100})
+
+    def test_round_robin_skips_backoff(self):
+        conns = make_connections(3)
+        conns[1].backoff_time = monotonic() + 5
+        pool = Pool(conns, picker_class=RoundRobinPicker)
+        picked = Counter(pool.get_connection() for _ in range(30))
+        self.assertNotIn(conns[1], picked)
+
+        for conn in conns:
+            conn.backoff_time = monotonic() + 5
+        conns[2].backoff_time = monotonic() + 1
+        self.assertIs(pool.get_connection(), conns[2])
+
+    def test_expired_backoff_is_eligible(self):
+        conns = make_connections(2)
+        conns[0].backoff_time = monotonic() - 1
+        conns[1].backoff_time = monotonic() + 5
+        pool = Pool(conns, picker_class=RoundRobinPicker)
+        self.assertEqual({pool.get_connection() for _ in range(4)},
+                         {conns[0]})
+
+    def test_priority_picks_first_healthy(self):
+        conns = make_connections(3)
+        pool = Pool(conns, picker_class=PriorityPicker)
+        self.assertIs(pool.get_connection(), conns[0])
+        conns[0].backoff_time = monotonic() + 5
+        self.assertIs(pool.get_connection(), conns[1])
+
+    def test_latency_aware_prefers_fast_idle_nodes(self):
+        conns = make_connections(2)
+        conns[0].latency, conns[1].latency = 0.5, 0.01
+        pool = Pool(conns, picker_class=LatencyAwarePicker)
+        self.assertIs(pool.get_connection(), conns[1])
+        conns[1].in_flight = 100
+        self.assertIs(pool.get_connection(), conns[0])
+
+    def test_latency_aware_probes_unknown_nodes(self):
+        conns = make_connections(4)
+        for conn in conns[1:]:
+            conn.latency = 0.1
+        pool = Pool(conns, picker_class=LatencyAwarePicker)
+        picked = Counter(pool.get_connection() for _ in range(200))
+        self.assertGreater(picked[conns[0]], 50)
+
+    def test_latency_ewma(self):
+        conn = make_connections(1)[0]
+        conn.update_latency(1.0)
+        self.assertEqual(conn.latency, 1.0)
+        conn.update_latency(0.0)
+        self.assertAlmostEqual(conn.latency, 0.7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the retry policy of the calls answered with an error status."""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.exceptions import (BadRequest, ServiceUnavailable,
+                                    TooManyRequests)
+from glitter_sdk.pool import PriorityPicker
+from glitter_sdk.retry import RetryBudget, RetryPolicy, retry_after
+from tests.fake_node import FakeNode, FakeState
+
+
+def _error(cls, status, headers=None):
+    return cls(status, 'error', None, 'http://node', headers or {})
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def test_retryable_statuses(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_retryable(_error(ServiceUnavailable, 503)))
+        self.assertTrue(policy.is_retryable(_error(TooManyRequests, 429)))
+        self.assertFalse(policy.is_retryable(_error(BadRequest, 400)))
+        self.assertFalse(policy.is_retryable(ValueError()))
+
+    def test_backoff_and_max_retries(self):
+        policy = RetryPolicy(max_retries=2, base_delay=0.1, max_delay=0.3,
+                             budget=False)
+        for retries in range(5):
+            self.assertLessEqual(policy.backoff(retries),
+                                 min(0.3, 0.1 * 2 ** retries))
+        self.assertTrue(policy.allow(0))
+        self.assertTrue(policy.allow(1))
+        self.assertFalse(policy.allow(2))
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        self.assertEqual(budget.rejected, 1)
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_retry_after(self):
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        date = format_datetime(now + timedelta(seconds=30), usegmt=True)
+        self.assertEqual(retry_after(_error(TooManyRequests, 429,
+                                            {'Retry-After': '7'})), 7)
+        self.assertEqual(retry_after(_error(TooManyRequests, 429,
+                                            {'Retry-After': date}), now), 30)
+        self.assertIsNone(retry_after(_error(TooManyRequests, 429,
+                                             {'Retry-After': 'soon'})))
+        self.assertIsNone(retry_after(_error(ServiceUnavailable, 503)))
+
+
+class TransportRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        state = FakeState()
+        self.busy = FakeNode(state).start()
+        self.healthy = FakeNode(state).start()
+        self.busy.error(503)
+
+    def tearDown(self):
+        self.busy.stop()
+        self.healthy.stop()
+
+    def client(self, **kwargs):
+        return GlitterClient(self.busy.url, self.healthy.url,
+                             picker_class=PriorityPicker, **kwargs)
+
+    def test_no_policy(self):
+        with self.assertRaises(ServiceUnavailable):
+            self.client().chain.health()
+
+    def test_reads_are_retried_on_another_node(self):
+        client = self.client(retry_policy=RetryPolicy(base_delay=0))
+        client.chain.health()
+        self.assertEqual(len(self.busy.requests), 1)
+        self.assertEqual(len(self.healthy.requests), 1)
+        client.db.get_docs("demo", ["1"])  # a POST marked idempotent
+        self.assertEqual(len(self.busy.requests), 2)
+        self.assertEqual(len(self.healthy.requests), 2)
+
+    def test_writes_are_not_retried(self):
+        client = self.client(retry_policy=RetryPolicy(base_delay=0))
+        with self.assertRaises(ServiceUnavailable):
+            client.db.create_schema("demo", [{"name": "doi"}])
+        self.assertEqual(self.healthy.requests, [])
+
+    def test_retry_after_puts_the_node_in_backoff(self):
+        self.busy.error(429, retry_after=30)
+        client = self.client(retry_policy=RetryPolicy(base_delay=0))
+        client.chain.health()
+        client.chain.health()
+        self.assertEqual(len(self.busy.requests), 1)
+        self.assertEqual(len(self.healthy.requests), 2)
+        busy = client.transport.connection_pool.connections[0]
+        self.assertGreater(busy.get_backoff_timedelta(), 25)
+
+    def test_budget_exhausted(self):
+        budget = RetryBudget(ratio=0, min_per_second=0, capacity=0)
+        client = self.client(retry_policy=RetryPolicy(base_delay=0,
+                                                      budget=budget))
+        with self.assertRaises(ServiceUnavailable):
+            client.chain.health()
+        self.assertEqual(budget.rejected, 1)
+
+
+class AsyncTransportRetryTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reads_are_retried_on_another_node(self):
+        state = FakeState()
+        busy = FakeNode(state, fail_status=503).start()
+        healthy = FakeNode(state).start()
+        try:
+            async with AsyncGlitterClient(
+                    busy.url, healthy.url, picker_class=PriorityPicker,
+                    retry_policy=RetryPolicy(base_delay=0)) as client:
+                await client.chain.health()
+                self.assertEqual(len(busy.requests), 1)
+                self.assertEqual(len(healthy.requests), 1)
+        finally:
+            busy.stop()
+            healthy.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
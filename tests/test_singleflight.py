@@ -0,0 +1,155 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the coalescing of identical concurrent reads."""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from glitter_sdk import AsyncGlitterClient, GlitterClient
+from glitter_sdk.deadline import Deadline
+from glitter_sdk.exceptions import TimeoutError
+from glitter_sdk.singleflight import (AsyncSingleFlight, SingleFlight,
+                                      request_key)
+from tests.fake_node import FakeNode
+
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+]
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_request_key(self):
+        self.assertEqual(request_key('get', '/a', {'x': 1, 'y': 2}),
+                         request_key('GET', '/a', {'y': 2, 'x': 1}))
+        self.assertNotEqual(request_key('GET', '/a', {'x': 1}),
+                            request_key('GET', '/a', {'x': 2}))
+        self.assertNotEqual(request_key('POST', '/a', body={'x': 1}),
+                            request_key('POST', '/a', body={'x': 1},
+                                        headers={'access_token': 't'}))
+
+    def test_followers_share_the_leader_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait()
+            return {"n": len(calls)}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(flight.do, "key", fn) for _ in range(8)]
+            while flight.coalesced < 7:
+                time.sleep(0.001)
+            release.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(calls, [1])
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(len(flight), 0)
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+        with self.assertRaises(KeyError):
+            flight.do("key", lambda: {}["missing"])
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+
+    def test_followers_honour_their_deadline(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            leader = executor.submit(flight.do, "key", release.wait)
+            while not len(flight):
+                time.sleep(0.001)
+            start = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                flight.do("key", release.wait, Deadline(0.1))
+            self.assertLess(time.monotonic() - start, 0.5)
+            release.set()
+            self.assertTrue(leader.result())
+
+
+class CoalescingTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node = FakeNode(delay=0.1).start()
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_identical_reads_are_coalesced(self):
+        client = GlitterClient(self.node.url, coalesce=True)
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(lambda _: client.chain.status(),
+                                        range(10)))
+        self.assertTrue(all(r["result"] for r in results))
+        self.assertLess(self.node.count('/v1/chain/status'), 10)
+        self.assertGreater(client.transport.singleflight.coalesced, 0)
+
+    def test_writes_and_distinct_reads_are_not_coalesced(self):
+        client = GlitterClient(self.node.url, coalesce=True)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda h: client.chain.header(h), range(1, 5)))
+            list(executor.map(
+                lambda _: client.db.create_schema("demo", FIELDS), range(4)))
+        self.assertEqual(self.node.count('/v1/chain/header'), 4)
+        self.assertEqual(self.node.count('/v1/create_schema'), 4)
+
+    def test_disabled_by_default(self):
+        client = GlitterClient(self.node.url)
+        self.assertIsNone(client.transport.singleflight)
+
+
+class AsyncCoalescingTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_identical_reads_are_coalesced(self):
+        node = FakeNode(delay=0.05).start()
+        try:
+            async with AsyncGlitterClient(node.url, coalesce=True) as client:
+                results = await asyncio.gather(
+                    *(client.chain.status() for _ in range(10)))
+                self.assertTrue(all(r is results[0] for r in results))
+                self.assertEqual(node.count('/v1/chain/status'), 1)
+
+                # Cancelling the caller that started the read does not
+                # cancel the others.
+                first = asyncio.ensure_future(client.chain.net_info())
+                await asyncio.sleep(0)
+                second = asyncio.ensure_future(client.chain.net_info())
+                await asyncio.sleep(0)
+                first.cancel()
+                self.assertTrue((await second)["result"]["listening"])
+        finally:
+            node.stop()
+
+    async def test_followers_honour_their_deadline(self):
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+        leader = asyncio.ensure_future(flight.do("key", release.wait))
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            await flight.do("key", release.wait, Deadline(0.1))
+        self.assertLess(time.monotonic() - start, 0.5)
+        release.set()
+        self.assertTrue(await leader)
+
+
+if __name__ == '__main__':
+    unittest.main()
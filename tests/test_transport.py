@@ -0,0 +1,189 @@
+# Copyright 2022-present glitter, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the transport against in-process nodes."""
+
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from glitter_sdk import GlitterClient
+from glitter_sdk.pool import LatencyAwarePicker
+from glitter_sdk.transport import HEDGE_BUDGET_CAPACITY
+from tests.fake_node import FakeNode, FakeState
+
+FIELDS = [
+    {"name": "doi", "type": "string", "primary": "true",
+     "index": {"type": "keyword"}},
+]
+
+
+class BackoffTest(unittest.TestCase):
+
+    def test_dead_node_does_not_stall_requests(self):
+        live = FakeNode().start()
+        dead = FakeNode()
+        dead.stop()
+        try:
+            client = GlitterClient(dead.url, live.url)
+            start = time.monotonic()
+            for _ in range(20):
+                client.chain.health()
+            # Without the eligibility filter each request routed to the
+            # dead node would sleep through its backoff first.
+            self.assertLess(time.monotonic() - start, 0.5)
+            dead_conn = client.transport.connection_pool.connections[0]
+            self.assertGreater(dead_conn.get_backoff_timedelta(), 0)
+        finally:
+            live.stop()
+
+    def test_sleeps_when_all_nodes_are_backed_off(self):
+        node = FakeNode().start()
+        try:
+            client = GlitterClient(node.url)
+            conn = client.transport.connection_pool.connections[0]
+            conn.update_backoff_time(success=False)
+            start = time.monotonic()
+            client.chain.health()
+            self.assertGreaterEqual(time.monotonic() - start, 0.4)
+            self.assertIsNone(conn.backoff_time)
+        finally:
+            node.stop()
+
+
+class HedgingTest(unittest.TestCase):
+
+    def setUp(self):
+        state = FakeState()
+        self.nodes = [FakeNode(state).start() for _ in range(2)]
+        self.client = GlitterClient(*[n.url for n in self.nodes],
+                                    hedge_percentile=90, hedge_min_delay=0.02)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop()
+
+    def test_slow_node_is_hedged(self):
+        for _ in range(30):
+            self.client.chain.health()
+        self.nodes[0].delay = 1
+
+        start = time.time()
+        for _ in range(4):
+            self.client.chain.block(height=1)
+        self.assertLess(time.time() - start, 1.5)
+        served = [n.count('/v1/chain/block') for n in self.nodes]
+        self.assertEqual(served[1], 4)
+
+    def test_hedges_are_budgeted(self):
+        client = GlitterClient(*[n.url for n in self.nodes],
+                               hedge_percentile=50, hedge_min_delay=0.02,
+                               hedge_max_workers=8, hedge_budget=0)
+        for _ in range(30):
+            client.chain.health()
+        for node in self.nodes:
+            node.delay = 0.1
+        before = sum(len(n.requests) for n in self.nodes)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(lambda _: client.chain.health(), range(64)))
+        sent = sum(len(n.requests) for n in self.nodes) - before
+        # Every read is slower than the hedge delay, but only the initial
+        # tokens of the budget (and its refill) allow hedging.
+        self.assertLessEqual(sent, 64 + HEDGE_BUDGET_CAPACITY + 2)
+
+    def test_writes_are_not_hedged(self):
+        self.client.db.create_schema("demo", FIELDS)
+        for _ in range(30):
+            self.client.chain.health()
+        self.nodes[0].delay = self.nodes[1].delay = 0.2
+
+        self.client.db.put_doc("demo", {"doi": "1"})
+        self.client.db.put_doc("demo", {"doi": "2"})
+        puts = sum(n.count('/v1/put_doc') for n in self.nodes)
+        self.assertEqual(puts, 2)
+
+    def test_no_hedging_by_default(self):
+        client = GlitterClient(*[n.url for n in self.nodes])
+        for _ in range(30):
+            client.chain.health()
+        self.assertIsNone(client.transport.hedge_delay())
+
+
+class ThreadSafetyTest(unittest.TestCase):
+
+    def test_backoff_state_under_contention(self):
+        client = GlitterClient("http://127.0.0.1:1")
+        conn = client.transport.connection_pool.connections[0]
+
+        def fail(_):
+            for _ in range(1000):
+                conn.update_backoff_time(success=False, backoff_cap=1)
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(fail, range(16)))
+        self.assertEqual(conn._retries, 16000)
+
+    def test_session_is_created_once(self):
+        node = FakeNode().start()
+        try:
+            client = GlitterClient(node.url)
+            conn = client.transport.connection_pool.connections[0]
+            self.assertIsNone(conn.session)
+            sessions = set()
+
+            def work(_):
+                client.chain.health()
+                sessions.add(id(conn.session))
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(work, range(32)))
+            self.assertEqual(len(sessions), 1)
+        finally:
+            node.stop()
+
+    def test_shared_client_stress(self):
+        state = FakeState()
+        nodes = [FakeNode(state).start() for _ in range(2)]
+        try:
+            client = GlitterClient(*[n.url for n in nodes], pool_maxsize=16,
+                                   picker_class=LatencyAwarePicker,
+                                   hedge_percentile=99)
+            client.db.create_schema("demo", FIELDS)
+
+            def work(worker):
+                for i in range(20):
+                    doi = "%d-%d" % (worker, i)
+                    res = client.db.put_doc("demo", {"doi": doi})
+                    assert res["code"] == 0, res
+                    res = client.db.get_doc("demo", doi)
+                    assert res["data"]["hits"][doi]["doi"] == doi, res
+                    client.chain.health()
+
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                list(executor.map(work, range(16)))
+
+            self.assertEqual(len(state.docs["demo"]), 320)
+            for node, conn in zip(nodes, client.transport.connection_pool.connections):
+                self.assertEqual(conn.in_flight, 0)
+                self.assertIsNone(conn.backoff_time)
+                # Sockets are pooled: at most pool_maxsize per node, plus
+                # the ones of the hedging threads.
+                self.assertLessEqual(len(node.clients), 16 + 32)
+        finally:
+            for node in nodes:
+                node.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()